@@ -0,0 +1,201 @@
+# 静态文件与响应压缩
+# PrecompressedStaticFiles：按 Accept-Encoding 返回预先生成的 .br/.gz 文件，基于内容哈希的强 ETag，
+#   If-None-Match 命中时返回 304，支持单段 Range 请求（大文件断点续传/分段读取）。
+# DynamicGZipMiddleware：只压缩超过阈值的动态响应（接口返回的 GeoJSON 等），静态文件路径不经过它。
+import mimetypes
+import stat
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response, StreamingResponse
+from config.config import ConfigManager
+from utils.content_hash import file_hash
+from utils.precompress import ENCODINGS, fresh_variant
+
+mimetypes.add_type("application/geo+json", ".geojson")
+
+_CHUNK_SIZE = 64 * 1024
+
+
+def _accepted_encodings(accept_encoding: Optional[str]) -> Dict[str, float]:
+    """解析 Accept-Encoding，返回 编码 -> q 值（q=0 表示拒绝）"""
+    accepted = {}
+    for item in (accept_encoding or "").split(","):
+        parts = [p.strip() for p in item.split(";")]
+        if not parts[0]:
+            continue
+        q = 1.0
+        for param in parts[1:]:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        accepted[parts[0].lower()] = q
+    return accepted
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 使用弱比较：忽略 W/ 前缀"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return etag in (t[2:] if t.startswith("W/") else t for t in tags)
+
+
+def _parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析单段 Range（bytes=start-end / bytes=start- / bytes=-suffix）
+
+    Returns:
+        (start, end) 闭区间；多段或格式无效时返回 None（按规范忽略 Range，返回完整内容）
+
+    Raises:
+        ValueError: 范围无法满足（起点超出文件大小）
+    """
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    start_s, sep, end_s = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        first = int(start_s) if start_s else None
+        last = int(end_s) if end_s else None
+    except ValueError:
+        return None
+    if first is None:
+        if last is None:
+            return None
+        # 后缀范围：最后 last 个字节，超过文件大小时返回整个文件
+        if last == 0 or size == 0:
+            raise ValueError(range_header)
+        return max(size - last, 0), size - 1
+    if last is not None and last < first:
+        return None
+    if first >= size:
+        raise ValueError(range_header)
+    return first, size - 1 if last is None else min(last, size - 1)
+
+
+def _iter_file(path: Path, start: int, length: int):
+    with path.open("rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    支持预压缩、ETag 校验和 Range 请求的静态文件服务
+
+    目录、html 模式、不存在的文件等情况沿用 StaticFiles 的默认处理。
+    """
+
+    async def get_response(self, path: str, scope) -> Response:
+        if scope["method"] not in ("GET", "HEAD"):
+            return await super().get_response(path, scope)
+        full_path, stat_result = await run_in_threadpool(self.lookup_path, path)
+        if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+            return await super().get_response(path, scope)
+        # 首次请求时需要读取整个文件计算哈希，放到线程池中执行
+        return await run_in_threadpool(
+            self._file_response, Path(full_path), stat_result, scope
+        )
+
+    def _file_response(self, full_path: Path, stat_result, scope) -> Response:
+        request_headers = Headers(scope=scope)
+        digest = file_hash(full_path)
+        identity_etag = f'"{digest}"'
+        media_type = mimetypes.guess_type(full_path.name)[0] or "application/octet-stream"
+        headers = {
+            "Vary": "Accept-Encoding",
+            "Accept-Ranges": "bytes",
+            "Cache-Control": ConfigManager.get("compression.cache_control", "no-cache"),
+        }
+        head_only = scope["method"] == "HEAD"
+
+        # 内容协商：按客户端 q 值与服务端优先顺序选择已生成且未过期的压缩版本；
+        # 分段请求始终针对原始内容
+        range_header = request_headers.get("range")
+        accepted = _accepted_encodings(request_headers.get("accept-encoding"))
+        file_path, etag, encoding = full_path, identity_etag, None
+        candidates = sorted(
+            (e for e, _ in ENCODINGS if accepted.get(e, 0) > 0),
+            key=lambda e: -accepted[e],
+        )
+        for candidate in () if range_header else candidates:
+            variant = fresh_variant(full_path, candidate)
+            if variant is not None:
+                file_path, encoding = variant, candidate
+                # 不同编码的表示使用不同的强 ETag
+                etag = f'"{digest}-{candidate}"'
+                break
+
+        # RFC 9110：先判断 If-None-Match，命中时即使带 Range 也返回 304
+        headers["ETag"] = etag
+        if _etag_matches(request_headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+
+        # 分段请求返回原始内容的字节范围；If-Range 与当前 ETag 不一致时返回完整内容
+        if_range = request_headers.get("if-range")
+        if range_header and (if_range is None or if_range == identity_etag):
+            size = stat_result.st_size
+            try:
+                byte_range = _parse_range(range_header, size)
+            except ValueError:
+                return Response(
+                    status_code=416,
+                    headers={**headers, "Content-Range": f"bytes */{size}"},
+                )
+            if byte_range is not None:
+                start, end = byte_range
+                length = end - start + 1
+                headers.update(
+                    {
+                        "Content-Range": f"bytes {start}-{end}/{size}",
+                        "Content-Length": str(length),
+                    }
+                )
+                if head_only:
+                    return Response(status_code=206, headers=headers, media_type=media_type)
+                return StreamingResponse(
+                    _iter_file(full_path, start, length),
+                    status_code=206,
+                    headers=headers,
+                    media_type=media_type,
+                )
+
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        return FileResponse(
+            file_path,
+            stat_result=file_path.stat() if encoding else stat_result,
+            headers=headers,
+            media_type=media_type,
+        )
+
+
+class DynamicGZipMiddleware(GZipMiddleware):
+    """只压缩动态响应：exclude_prefixes 下的静态文件已有预压缩版本，其分段响应也不能再次压缩"""
+
+    def __init__(
+        self, app, minimum_size: int = 1024, compresslevel: int = 6, exclude_prefixes=()
+    ):
+        super().__init__(app, minimum_size=minimum_size, compresslevel=compresslevel)
+        self.exclude_prefixes = tuple(exclude_prefixes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith(self.exclude_prefixes):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
@@ -1,22 +1,26 @@
-import os
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from typing import Optional
+from fastapi import APIRouter, UploadFile, File, Header, HTTPException
+from starlette.concurrency import run_in_threadpool
 from pathlib import Path
 import shutil
 from config.config import ConfigManager
-from service.zip_to_shp import ShapefileService
+from service.job_scheduler import SchedulerBusyError, get_scheduler
 from utils.file_handler import get_unique_filename
 from utils.logger import get_logger
-from utils.tempfile import mkd_temp, mkd_tempdir
+from utils.profiler import header_enabled
+from utils.tempfile import mkd_temp, mkd_tempdir, release_tempdir
 
 logger = get_logger("upload_router")
 router = APIRouter()
 
 upload_dir = ConfigManager.get("UPLOAD_DIR", "data/uploads")
-service = ShapefileService(Path(upload_dir))
 
 
 @router.post("/upload")
-async def upload_zip(file: UploadFile = File(...)):
+async def upload_zip(
+    file: UploadFile = File(...),
+    x_profile: Optional[str] = Header(None),
+):
     if not file.filename.endswith(".zip"):
         raise HTTPException(status_code=400, detail="仅支持上传ZIP文件")
 
@@ -25,24 +29,38 @@ async def upload_zip(file: UploadFile = File(...)):
     # 在临时目录中创建实际的文件名
     temp_path = Path(temp_dir) / file.filename
     logger.debug(f"保存上传文件到临时路径: {temp_path}")
-    with open(temp_path, "wb") as f:
-        shutil.copyfileobj(file.file, f)
+
+    def save_upload():
+        with open(temp_path, "wb") as f:
+            shutil.copyfileobj(file.file, f)
+
+    # 大文件写盘不阻塞事件循环
+    await run_in_threadpool(save_upload)
 
     try:
-        result = service.process_zip(temp_path)
-        return {
+        # 在调度器的进程池中处理，超出内存预算时排队，队列已满时返回 503
+        # 请求头 X-Profile: 1 时对本次处理进行内存分析
+        result = await get_scheduler().process_zip(
+            Path(upload_dir), temp_path, profile=header_enabled(x_profile)
+        )
+        response = {
             "status": "success",
             "label": result["label"],
             "geojson": result["geojson"],
             "local_path": result["shp_path"],
         }
+        if result.get("profile_report"):
+            response["profile_report"] = result["profile_report"]
+        return response
+    except SchedulerBusyError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        # 处理完成后立即删除临时目录及其内容，释放磁盘空间
-        try:
-            if temp_dir and os.path.exists(temp_dir):
-                shutil.rmtree(temp_dir)
-        except Exception:
-            # 清理失败不影响主流程，退出时 atexit 仍会尝试清理
-            pass
+        # 处理完成后立即删除临时目录及其内容并停止追踪，释放磁盘空间
+        # 清理失败不影响主流程，退出时 atexit 仍会尝试清理
+        release_tempdir(temp_dir)
@@ -0,0 +1,135 @@
+# 基准测试用的合成数据生成器
+# 同一 (数量, 种子) 总是生成完全相同的数据，便于不同版本之间对比性能
+import math
+from pathlib import Path
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+CRS = "EPSG:3857"
+# 数据原点（EPSG:3857 下华北平原附近）
+ORIGIN = (12_950_000.0, 4_300_000.0)
+CROPS = np.array(["wheat", "corn", "rice", "soybean", "cotton"])
+ROAD_CLASSES = np.array(["primary", "secondary", "rural"])
+
+
+def parse_size(size: str) -> int:
+    """将 1k / 100k / 1m 形式的规模转换为要素数"""
+    size = str(size).strip().lower()
+    factor = {"k": 1_000, "m": 1_000_000}.get(size[-1], 1)
+    return int(float(size[:-1] if factor > 1 else size) * factor)
+
+
+def make_parcels(n: int, seed: int = 0, cell: float = 100.0) -> gpd.GeoDataFrame:
+    """
+    生成互不重叠的地块面：在抖动的规则网格上取前 n 个格子，相邻地块共享顶点（覆盖拓扑）
+
+    属性：parcel_id、county（按网格分块的县编号）、crop（随机作物类型）。
+    编号字段不命名为 FID：union / 变化检测会为两期添加 FID_1、FID_2，同名的 FID 字段加后缀后与之冲突
+    """
+    rng = np.random.default_rng(seed)
+    side = math.ceil(math.sqrt(n))
+    # 网格顶点整体抖动，幅度小于格子一半，保证地块有效且不重叠
+    xs, ys = np.meshgrid(np.arange(side + 1) * cell, np.arange(side + 1) * cell)
+    vertices = np.stack([xs, ys], axis=-1) + rng.uniform(
+        -0.3 * cell, 0.3 * cell, size=(side + 1, side + 1, 2)
+    )
+    vertices += ORIGIN
+
+    idx = np.arange(n)
+    row, col = idx // side, idx % side
+    rings = np.stack(
+        [
+            vertices[row, col],
+            vertices[row, col + 1],
+            vertices[row + 1, col + 1],
+            vertices[row + 1, col],
+            vertices[row, col],
+        ],
+        axis=1,
+    )
+    blocks = max(side // 8, 1)
+    county = (row // blocks) * 8 + col // blocks
+    return gpd.GeoDataFrame(
+        {
+            "parcel_id": idx + 1,
+            "county": np.char.add("C", county.astype(str)),
+            "crop": CROPS[rng.integers(0, len(CROPS), n)],
+        },
+        geometry=shapely.polygons(rings),
+        crs=CRS,
+    )
+
+
+def make_roads(n: int, seed: int = 0, vertices: int = 6) -> gpd.GeoDataFrame:
+    """生成随机游走的道路折线，每条 vertices 个顶点"""
+    rng = np.random.default_rng(seed)
+    extent = math.sqrt(n) * 100.0
+    start = rng.uniform(0, extent, size=(n, 1, 2)) + ORIGIN
+    steps = rng.normal(0, 80.0, size=(n, vertices - 1, 2))
+    coords = np.concatenate([start, start + np.cumsum(steps, axis=1)], axis=1)
+    return gpd.GeoDataFrame(
+        {
+            "road_id": np.arange(n) + 1,
+            "class": ROAD_CLASSES[rng.integers(0, len(ROAD_CLASSES), n)],
+        },
+        geometry=shapely.linestrings(coords),
+        crs=CRS,
+    )
+
+
+def make_points(n: int, seed: int = 0) -> gpd.GeoDataFrame:
+    """生成均匀分布的点，附带随机数值属性"""
+    rng = np.random.default_rng(seed)
+    extent = math.sqrt(n) * 100.0
+    xy = rng.uniform(0, extent, size=(n, 2)) + ORIGIN
+    return gpd.GeoDataFrame(
+        {"point_id": np.arange(n) + 1, "value": rng.gamma(2.0, 10.0, n).round(3)},
+        geometry=shapely.points(xy),
+        crs=CRS,
+    )
+
+
+def make_next_epoch(
+    parcels: gpd.GeoDataFrame, seed: int = 0, change_ratio: float = 0.1
+) -> gpd.GeoDataFrame:
+    """
+    由一期地块生成下一期：按 change_ratio 的比例分别删除、收缩和新增地块，其余保持不变
+    """
+    rng = np.random.default_rng(seed + 1)
+    n = len(parcels)
+    fate = rng.random(n)
+    lost = fate < change_ratio / 3
+    shrunk = (fate >= change_ratio / 3) & (fate < change_ratio * 2 / 3)
+
+    geoms = parcels.geometry.to_numpy().copy()
+    geoms[shrunk] = shapely.buffer(geoms[shrunk], -15.0)
+    kept = parcels[~lost].copy()
+    kept["geometry"] = geoms[~lost]
+
+    # 新增地块：在删除的地块位置放置较小的新地块
+    added_geoms = shapely.buffer(shapely.centroid(parcels.geometry.to_numpy()[lost]), 30.0)
+    added = gpd.GeoDataFrame(
+        {
+            "county": parcels["county"].to_numpy()[lost],
+            "crop": CROPS[rng.integers(0, len(CROPS), int(lost.sum()))],
+        },
+        geometry=added_geoms,
+        crs=parcels.crs,
+    )
+    result = gpd.GeoDataFrame(
+        pd.concat([kept.drop(columns="parcel_id"), added], ignore_index=True),
+        crs=parcels.crs,
+    )
+    result.insert(0, "parcel_id", np.arange(len(result)) + 1)
+    return result
+
+
+def write_layer(gdf: gpd.GeoDataFrame, path: Path) -> Path:
+    """写出 shapefile（已存在时跳过，生成结果是确定的）"""
+    path = Path(path)
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        gdf.to_file(path, encoding="utf-8")
+    return path
@@ -0,0 +1,148 @@
+# 日志开销基准测试
+#
+# 用法（在项目根目录执行）：
+#   python -m benchmarks.logging_overhead
+#   python -m benchmarks.logging_overhead --threads 8 --records 20000
+#
+# 对比两种写日志方式在多线程并发写日志时的调用方耗时：
+#   sync  - 原 get_logger 的方式：每个 logger 直接挂控制台和文件 handler，在调用线程中同步写盘
+#   queue - 当前 utils.logger：记录放入队列，由后台线程统一写出
+# 并测量级别未开启时 f-string 与 %-格式参数的开销差异。控制台输出重定向到空设备。
+import argparse
+import contextlib
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+_FORMAT = "[%(asctime)s] %(levelname)s - %(name)s - %(message)s"
+
+
+def _sync_logger(log_dir: str, devnull) -> logging.Logger:
+    """按原 get_logger 的方式创建同步写盘的 logger"""
+    logger = logging.getLogger("bench_sync")
+    logger.handlers.clear()
+    logger.setLevel(logging.DEBUG)
+    formatter = logging.Formatter(_FORMAT, datefmt="%Y-%m-%d %H:%M:%S")
+    console_handler = logging.StreamHandler(devnull)
+    console_handler.setFormatter(formatter)
+    file_handler = logging.FileHandler(os.path.join(log_dir, "sync.log"), encoding="utf-8")
+    file_handler.setFormatter(formatter)
+    logger.addHandler(console_handler)
+    logger.addHandler(file_handler)
+    logger.propagate = False
+    return logger
+
+
+def _queue_logger(log_dir: str, devnull) -> logging.Logger:
+    from utils import logger as log_module
+
+    logger = log_module.get_logger("bench_queue", log_dir=log_dir, log_filename="queue.log")
+    # 控制台 handler 在创建时绑定 sys.stderr
+    with contextlib.redirect_stderr(devnull):
+        log_module.configure_logging()
+    logger.setLevel(logging.DEBUG)
+    return logger
+
+
+def _flush_queue():
+    """等待后台线程写完队列中的记录"""
+    from utils import logger as log_module
+
+    listener = log_module._listener
+    if listener is not None:
+        listener.stop()
+        listener.start()
+
+
+def _hammer(logger: logging.Logger, threads: int, records: int) -> dict:
+    """多个线程并发写日志，返回调用方耗时分布"""
+    latencies = [[] for _ in range(threads)]
+    barrier = threading.Barrier(threads)
+
+    def worker(k: int):
+        barrier.wait()
+        out = latencies[k]
+        for i in range(records):
+            start = time.perf_counter()
+            logger.info("正在读取第%s个图层: %s", i + 1, "parcels.shp")
+            out.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(k,)) for k in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    caller_s = time.perf_counter() - start
+    _flush_queue()
+    total_s = time.perf_counter() - start
+
+    flat = sorted(x for out in latencies for x in out)
+    n = len(flat)
+    return {
+        "records": n,
+        "caller_s": round(caller_s, 3),
+        "total_s": round(total_s, 3),
+        "p50_us": round(flat[n // 2] * 1e6, 1),
+        "p99_us": round(flat[int(n * 0.99)] * 1e6, 1),
+        "max_us": round(flat[-1] * 1e6, 1),
+    }
+
+
+def _disabled_cost(records: int) -> dict:
+    """DEBUG 未开启时，f-string 与 %-格式参数每条记录的耗时（纳秒）"""
+    logger = logging.getLogger("bench_disabled")
+    logger.setLevel(logging.INFO)
+    path, i = "data/uploads/vectors/parcels.shp", 7
+
+    def f_string():
+        for _ in range(records):
+            logger.debug(f"正在读取第{i + 1}个图层: {path}")
+
+    def lazy():
+        for _ in range(records):
+            logger.debug("正在读取第%s个图层: %s", i + 1, path)
+
+    result = {}
+    for name, func in (("fstring_ns", f_string), ("lazy_ns", lazy)):
+        timings = []
+        for _ in range(5):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        result[name] = round(statistics.median(timings) / records * 1e9, 1)
+    return result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="日志开销基准测试")
+    parser.add_argument("--threads", type=int, default=4, help="并发写日志的线程数")
+    parser.add_argument("--records", type=int, default=10000, help="每个线程写的记录数")
+    opts = parser.parse_args(argv)
+
+    log_dir = tempfile.mkdtemp(prefix="bench_logging_")
+    with open(os.devnull, "w", encoding="utf-8") as devnull:
+        report = {
+            "threads": opts.threads,
+            "records_per_thread": opts.records,
+            "sync": _hammer(_sync_logger(log_dir, devnull), opts.threads, opts.records),
+            "queue": _hammer(_queue_logger(log_dir, devnull), opts.threads, opts.records),
+            "disabled_debug": _disabled_cost(opts.records * opts.threads),
+        }
+        _flush_queue()
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+# 前端载荷基准测试
+#
+# 用法（在项目根目录执行）：
+#   python -m benchmarks.payload_size
+#   python -m benchmarks.payload_size --sizes 10k,100k --quantization 100000 --repeat 5
+#
+# 对相邻地块组成的覆盖数据（generators.make_parcels，转为 EPSG:4326 后输出）比较三种编码：
+#   geojson_full    - 原 gdf.to_json()，完整 float64 坐标
+#   geojson_rounded - to_geojson(encoding="geojson")，坐标按 output.precision 保留小数位
+#   topojson        - to_geojson(encoding="topojson")，公共边界只存一次，坐标量化并差分编码
+# 记录载荷字节数、gzip 后字节数、服务端编码耗时，以及前端解析耗时：
+# 有 node 时用 V8（与 Chrome 相同的引擎）执行 JSON.parse，TopoJSON 另加解码为 GeoJSON 要素的耗时；
+# 没有 node 时退回 Python json.loads，结果中以 parser 字段注明。
+import argparse
+import gzip
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+CONFIG_PATH = ROOT / "config" / "config.yaml"
+
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+# 浏览器端解析：JSON.parse，TopoJSON 再按弧段还原为 GeoJSON 要素（与 topojson-client 的 feature() 等价）
+_PARSE_JS = r"""
+const fs = require("fs");
+const [file, kind, repeat] = process.argv.slice(2);
+const text = fs.readFileSync(file, "utf8");
+
+function decode(topo) {
+  const [sx, sy] = topo.transform.scale;
+  const [tx, ty] = topo.transform.translate;
+  const arcs = topo.arcs.map((arc) => {
+    let x = 0, y = 0;
+    return arc.map(([dx, dy]) => [(x += dx) * sx + tx, (y += dy) * sy + ty]);
+  });
+  const line = (refs) => {
+    const out = [];
+    refs.forEach((i, k) => {
+      const a = i < 0 ? arcs[~i].slice().reverse() : arcs[i];
+      for (let j = k ? 1 : 0; j < a.length; j++) out.push(a[j]);
+    });
+    return out;
+  };
+  const point = ([x, y]) => [x * sx + tx, y * sy + ty];
+  const geometry = (g) => {
+    switch (g.type) {
+      case "Polygon": return { type: g.type, coordinates: g.arcs.map(line) };
+      case "MultiPolygon": return { type: g.type, coordinates: g.arcs.map((p) => p.map(line)) };
+      case "LineString": return { type: g.type, coordinates: line(g.arcs) };
+      case "MultiLineString": return { type: g.type, coordinates: g.arcs.map(line) };
+      case "Point": return { type: g.type, coordinates: point(g.coordinates) };
+      case "MultiPoint": return { type: g.type, coordinates: g.coordinates.map(point) };
+      case "GeometryCollection": return { type: g.type, geometries: g.geometries.map(geometry) };
+      default: return null;
+    }
+  };
+  const features = [];
+  for (const name in topo.objects) {
+    for (const g of topo.objects[name].geometries) {
+      features.push({ type: "Feature", id: g.id, properties: g.properties, geometry: geometry(g) });
+    }
+  }
+  return { type: "FeatureCollection", features };
+}
+
+const times = [];
+for (let i = 0; i < Number(repeat); i++) {
+  const start = process.hrtime.bigint();
+  const obj = JSON.parse(text);
+  if (kind === "topojson") decode(obj);
+  times.push(Number(process.hrtime.bigint() - start) / 1e6);
+}
+times.sort((a, b) => a - b);
+console.log(JSON.stringify({ parse_ms: times[times.length >> 1] }));
+"""
+
+
+def _parse_ms(payload: str, kind: str, repeat: int, work_dir: str) -> dict:
+    """前端解析耗时（毫秒，取中位数）"""
+    node = shutil.which("node")
+    if node is None:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            json.loads(payload)
+            timings.append(time.perf_counter() - start)
+        return {"parser": "python", "parse_ms": round(statistics.median(timings) * 1e3, 2)}
+
+    payload_path = os.path.join(work_dir, f"{kind}.json")
+    script_path = os.path.join(work_dir, "parse.js")
+    with open(payload_path, "w", encoding="utf-8") as f:
+        f.write(payload)
+    with open(script_path, "w", encoding="utf-8") as f:
+        f.write(_PARSE_JS)
+    output = subprocess.run(
+        [node, script_path, payload_path, kind, str(repeat)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return {"parser": "node", "parse_ms": round(json.loads(output)["parse_ms"], 2)}
+
+
+def _measure(name: str, encode, kind: str, repeat: int, work_dir: str) -> dict:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        payload = encode()
+        timings.append(time.perf_counter() - start)
+    data = payload.encode("utf-8")
+    return {
+        "encoding": name,
+        "bytes": len(data),
+        "gzip_bytes": len(gzip.compress(data, compresslevel=6)),
+        "encode_s": round(statistics.median(timings), 3),
+        **_parse_ms(payload, kind, repeat, work_dir),
+    }
+
+
+def _run_size(n: int, seed: int, repeat: int, quantization: int) -> dict:
+    from benchmarks.generators import make_parcels
+    from utils.geojson_handler import to_geojson
+    from utils.topojson import to_topojson
+
+    gdf = make_parcels(n, seed).to_crs("EPSG:4326")
+    work_dir = tempfile.mkdtemp(prefix="bench_payload_")
+    try:
+        results = [
+            _measure("geojson_full", gdf.to_json, "geojson", repeat, work_dir),
+            _measure(
+                "geojson_rounded",
+                lambda: to_geojson(gdf, encoding="geojson"),
+                "geojson",
+                repeat,
+                work_dir,
+            ),
+            _measure(
+                "topojson",
+                lambda: to_topojson(gdf, quantization=quantization),
+                "topojson",
+                repeat,
+                work_dir,
+            ),
+        ]
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    full = results[0]["bytes"]
+    for item in results:
+        item["ratio"] = round(full / item["bytes"], 2)
+    return {"features": n, "quantization": quantization, "results": results}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="前端载荷基准测试")
+    parser.add_argument("--sizes", default="10k", help="地块数，逗号分隔，如 10k,100k")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="编码与解析的重复次数（取中位数）")
+    parser.add_argument("--quantization", type=int, default=None, help="TopoJSON 量化网格数，默认取配置")
+    opts = parser.parse_args(argv)
+
+    from benchmarks.generators import parse_size
+    from config.config import ConfigManager
+
+    ConfigManager.load_config(str(CONFIG_PATH))
+    quantization = opts.quantization or ConfigManager.get("output.quantization", 100000)
+    report = [
+        _run_size(parse_size(size), opts.seed, opts.repeat, quantization)
+        for size in opts.sizes.split(",")
+    ]
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,393 @@
+# 核心函数基准测试
+#
+# 用法（在项目根目录执行）：
+#   python -m benchmarks.run_benchmarks --sizes 1k,100k
+#   python -m benchmarks.run_benchmarks --sizes 1k --cases buffer,union --repeat 5
+#   python -m benchmarks.run_benchmarks --save-baseline benchmarks/baseline.json
+#   python -m benchmarks.run_benchmarks --baseline benchmarks/baseline.json --tolerance 0.2
+#
+# 每个用例在独立子进程中执行，分别记录墙钟时间、吞吐量（要素/秒）和峰值 RSS 增量（扣除预先导入模块的占用）；
+# 输入数据由 generators 按固定种子生成并缓存在 benchmarks/data/v<DATA_VERSION> 中。
+# 与基线对比时，耗时或峰值 RSS 增量超出容差的用例会被标记为回退，进程以退出码 1 结束。
+import argparse
+import json
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+# generators 的生成规则变化时递增，缓存数据按版本分目录存放，不会沿用旧规则生成的数据
+DATA_VERSION = 2
+DATA_DIR = ROOT / "benchmarks" / "data" / f"v{DATA_VERSION}"
+CONFIG_PATH = ROOT / "config" / "config.yaml"
+
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+# ----------------------------- 数据准备（父进程） -----------------------------
+def _parcels(n: int, seed: int) -> Path:
+    from benchmarks.generators import make_parcels, write_layer
+
+    path = DATA_DIR / f"parcels_{n}_{seed}.shp"
+    return path if path.exists() else write_layer(make_parcels(n, seed), path)
+
+
+def _parcels_next(n: int, seed: int) -> Path:
+    from benchmarks.generators import make_next_epoch, make_parcels, write_layer
+
+    path = DATA_DIR / f"parcels_next_{n}_{seed}.shp"
+    if path.exists():
+        return path
+    return write_layer(make_next_epoch(make_parcels(n, seed), seed), path)
+
+
+def _roads(n: int, seed: int) -> Path:
+    from benchmarks.generators import make_roads, write_layer
+
+    path = DATA_DIR / f"roads_{n}_{seed}.shp"
+    return path if path.exists() else write_layer(make_roads(n, seed), path)
+
+
+def _points(n: int, seed: int) -> Path:
+    from benchmarks.generators import make_points, write_layer
+
+    path = DATA_DIR / f"points_{n}_{seed}.shp"
+    return path if path.exists() else write_layer(make_points(n, seed), path)
+
+
+def _union_result(n: int, seed: int) -> Path:
+    from tools.vector.union import union_core
+
+    path = DATA_DIR / f"union_{n}_{seed}.shp"
+    if not path.exists():
+        union_core([_parcels(n, seed), _parcels_next(n, seed)], save_path=path)
+    return path
+
+
+def _area_result(n: int, seed: int) -> Path:
+    from tools.vector.statistics.calculate_geo import calculate_core
+
+    path = DATA_DIR / f"parcels_area_{n}_{seed}.shp"
+    if not path.exists():
+        calculate_core(_parcels(n, seed), path, mode="area")
+    return path
+
+
+def _parcels_zip(n: int, seed: int) -> Path:
+    path = DATA_DIR / f"parcels_{n}_{seed}.zip"
+    if not path.exists():
+        shp = _parcels(n, seed)
+        # 与用户上传的 ZIP 一致：文件放在与 ZIP 同名的文件夹中（extract_zip 在该文件夹下查找 .shp）
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+            for suffix in (".shp", ".shx", ".dbf", ".prj", ".cpg"):
+                component = shp.with_suffix(suffix)
+                if component.exists():
+                    zf.write(component, f"{path.stem}/{component.name}")
+    return path
+
+
+# 用例 -> 准备输入的函数，返回传给子进程的参数
+CASES: Dict[str, Callable[[int, int], dict]] = {
+    "buffer": lambda n, s: {"input": str(_parcels(n, s))},
+    "buffer_roads": lambda n, s: {"input": str(_roads(n, s))},
+    "buffer_points": lambda n, s: {"input": str(_points(n, s))},
+    "union": lambda n, s: {"inputs": [str(_parcels(n, s)), str(_parcels_next(n, s))]},
+    "change_analyze": lambda n, s: {"input": str(_union_result(n, s))},
+    "change_detect": lambda n, s: {"inputs": [str(_parcels(n, s)), str(_parcels_next(n, s))]},
+    "calculate": lambda n, s: {"input": str(_parcels(n, s))},
+    "aggregate": lambda n, s: {"input": str(_area_result(n, s))},
+    "process_zip": lambda n, s: {
+        "input": str(_parcels_zip(n, s)),
+        "source": str(_parcels(n, s)),
+    },
+}
+DEFAULT_CASES = ["buffer", "union", "change_analyze", "calculate", "aggregate", "process_zip"]
+
+
+# ----------------------------- 用例执行（子进程） -----------------------------
+def _reset_peak_rss():
+    """
+    Linux 下把峰值 RSS（VmHWM）重置为当前 RSS，之后读到的峰值只反映用例本身，不含导入过程中的瞬时峰值；
+    其他平台无法重置，增量按导入后的峰值扣除
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _peak_rss_mb() -> float:
+    """当前进程的峰值常驻内存（MB）"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 单位为 KB，macOS 为字节
+        return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        import psutil
+
+        return psutil.Process().memory_info().peak_wset / 1024 / 1024
+
+
+def _run_case(case: str, args: dict, out_dir: Path):
+    """执行一次用例，返回处理的要素数（用于计算吞吐量）"""
+    from utils.vector_io import count_features
+
+    if case.startswith("buffer"):
+        from tools.vector.buffer import buffer_core
+
+        buffer_core(Path(args["input"]), 10, save_path=out_dir / "buffer.shp")
+        return count_features(Path(args["input"]))
+    if case == "union":
+        from tools.vector.union import union_core
+
+        union_core([Path(p) for p in args["inputs"]], save_path=out_dir / "union.shp")
+        return sum(count_features(Path(p)) for p in args["inputs"])
+    if case == "change_analyze":
+        from tools.vector.statistics.change_analyze import change_analyze_core
+
+        change_analyze_core(Path(args["input"]), output_path=out_dir / "change.shp")
+        return count_features(Path(args["input"]))
+    if case == "change_detect":
+        from tools.vector.statistics.change_analyze import change_detect_core
+
+        before, after = (Path(p) for p in args["inputs"])
+        change_detect_core(before, after, output_path=out_dir / "change.shp")
+        return count_features(before) + count_features(after)
+    if case == "calculate":
+        from tools.vector.statistics.calculate_geo import calculate_core
+
+        calculate_core(Path(args["input"]), out_dir / "area.shp", mode="area")
+        return count_features(Path(args["input"]))
+    if case == "aggregate":
+        from tools.vector.statistics.aggregate_group import aggregate_core
+
+        aggregate_core(
+            Path(args["input"]),
+            mode="area",
+            group_field=None,
+            group_fields=["county", "crop"],
+            stats={"area": ["sum", "count", "mean", "p90"]},
+            output_path=out_dir / "aggregate.csv",
+        )
+        return count_features(Path(args["input"]))
+    if case == "process_zip":
+        from service.zip_to_shp import ShapefileService
+
+        ShapefileService(out_dir).process_zip(Path(args["input"]))
+        return count_features(Path(args["source"]))
+    raise ValueError(f"未知用例: {case}")
+
+
+def _child(case: str, args_json: str):
+    """子进程入口：加载配置（关闭结果缓存），执行用例并以 JSON 输出测量结果"""
+    from config.config import ConfigManager
+
+    ConfigManager.load_config(str(CONFIG_PATH))
+    config = dict(ConfigManager.as_dict())
+    # 缓存命中会让重复运行失去意义
+    config["summary_cache"] = {**config.get("summary_cache", {}), "enabled": False}
+    config["tool_memo"] = {**config.get("tool_memo", {}), "enabled": False}
+    ConfigManager.load_dict(config)
+    from utils.logger import configure_logging
+
+    configure_logging()
+
+    # 预先导入所有模块，导入耗时不计入用例
+    import service.zip_to_shp  # noqa: F401
+    import tools.vector.buffer  # noqa: F401
+    import tools.vector.statistics.aggregate_group  # noqa: F401
+    import tools.vector.statistics.calculate_geo  # noqa: F401
+    import tools.vector.statistics.change_analyze  # noqa: F401
+    import tools.vector.union  # noqa: F401
+
+    args = json.loads(args_json)
+    out_dir = Path(tempfile.mkdtemp(prefix=f"bench_{case}_"))
+    try:
+        _reset_peak_rss()
+        rss_before = _peak_rss_mb()
+        start = time.perf_counter()
+        features = _run_case(case, args, out_dir)
+        wall = time.perf_counter() - start
+        print(
+            json.dumps(
+                {
+                    "wall_s": wall,
+                    "features": features,
+                    "rss_before_mb": rss_before,
+                    "peak_rss_mb": _peak_rss_mb(),
+                }
+            )
+        )
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+
+# ----------------------------- 调度与对比（父进程） -----------------------------
+def _measure(case: str, args: dict, repeat: int) -> dict:
+    runs = []
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.run_benchmarks", "--child", case, json.dumps(args)],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"用例 {case} 执行失败:\n{proc.stderr[-2000:]}")
+        runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    wall = statistics.median(r["wall_s"] for r in runs)
+    return {
+        "features": runs[0]["features"],
+        "wall_s": round(wall, 4),
+        "wall_runs": [round(r["wall_s"], 4) for r in runs],
+        "throughput": round(runs[0]["features"] / wall, 1) if wall > 0 else None,
+        "peak_rss_mb": round(max(r["peak_rss_mb"] for r in runs), 1),
+        "rss_before_mb": round(min(r["rss_before_mb"] for r in runs), 1),
+        # 用例本身带来的峰值增量：峰值 RSS 中约有 180 MB 是预先导入的依赖，直接比较会掩盖用例内存的变化
+        "rss_delta_mb": round(
+            max(r["peak_rss_mb"] - r["rss_before_mb"] for r in runs), 1
+        ),
+    }
+
+
+def _rss_delta(result: dict) -> float:
+    """峰值 RSS 增量，兼容没有 rss_delta_mb 字段的旧结果"""
+    if "rss_delta_mb" in result:
+        return result["rss_delta_mb"]
+    return result["peak_rss_mb"] - result.get("rss_before_mb", 0)
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except OSError:
+        return ""
+
+
+def compare(results: List[dict], baseline: List[dict], tolerance: float, rss_tolerance: float):
+    """与基线对比（内存按峰值 RSS 增量比较），返回回退的用例列表"""
+    base = {(r["case"], r["size"]): r for r in baseline}
+    regressions = []
+    print(f"\n{'case':<16}{'size':>10}{'wall(s)':>12}{'base':>12}{'ratio':>8}{'Δrss(MB)':>10}{'base':>10}")
+    for r in results:
+        b = base.get((r["case"], r["size"]))
+        rss = _rss_delta(r)
+        if b is None:
+            print(f"{r['case']:<16}{r['size']:>10}{r['wall_s']:>12.3f}{'-':>12}{'-':>8}{rss:>10.1f}{'-':>10}")
+            continue
+        base_rss = _rss_delta(b)
+        wall_ratio = r["wall_s"] / b["wall_s"] if b["wall_s"] else 1.0
+        rss_ratio = rss / base_rss if base_rss > 0 else 1.0
+        flag = ""
+        if wall_ratio > 1 + tolerance or rss_ratio > 1 + rss_tolerance:
+            flag = "  <-- REGRESSION"
+            regressions.append({**r, "wall_ratio": wall_ratio, "rss_ratio": rss_ratio})
+        print(
+            f"{r['case']:<16}{r['size']:>10}{r['wall_s']:>12.3f}{b['wall_s']:>12.3f}"
+            f"{wall_ratio:>8.2f}{rss:>10.1f}{base_rss:>10.1f}{flag}"
+        )
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="GrainWatch 核心函数基准测试")
+    parser.add_argument("--child", nargs=2, metavar=("CASE", "ARGS"), help=argparse.SUPPRESS)
+    parser.add_argument("--sizes", default="1k,100k", help="数据规模，逗号分隔，如 1k,100k,1m")
+    parser.add_argument("--cases", default=",".join(DEFAULT_CASES), help=f"用例，可选: {','.join(CASES)}")
+    parser.add_argument("--seed", type=int, default=42, help="数据生成种子")
+    parser.add_argument("--repeat", type=int, default=3, help="每个用例重复次数，耗时取中位数")
+    parser.add_argument("--output", default=None, help="结果 JSON 路径，默认 benchmarks/results/<时间>.json")
+    parser.add_argument("--baseline", default=None, help="对比的基线 JSON")
+    parser.add_argument("--save-baseline", default=None, help="把本次结果保存为基线")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="耗时允许的回退比例")
+    parser.add_argument("--rss-tolerance", type=float, default=0.2, help="峰值 RSS 增量允许的回退比例")
+    opts = parser.parse_args(argv)
+
+    if opts.child:
+        _child(*opts.child)
+        return 0
+
+    from benchmarks.generators import parse_size
+    from config.config import ConfigManager
+
+    ConfigManager.load_config(str(CONFIG_PATH))
+    cases = [c.strip() for c in opts.cases.split(",") if c.strip()]
+    unknown = [c for c in cases if c not in CASES]
+    if unknown:
+        parser.error(f"未知用例: {unknown}")
+
+    results = []
+    for size in [s.strip() for s in opts.sizes.split(",") if s.strip()]:
+        n = parse_size(size)
+        for case in cases:
+            print(f"[{case} @ {size}] 准备数据...", flush=True)
+            args = CASES[case](n, opts.seed)
+            measured = _measure(case, args, opts.repeat)
+            results.append({"case": case, "size": size, **measured})
+            print(
+                f"[{case} @ {size}] {measured['wall_s']:.3f}s, "
+                f"{measured['throughput']} features/s, peak RSS {measured['peak_rss_mb']} MB "
+                f"(+{measured['rss_delta_mb']} MB)",
+                flush=True,
+            )
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": opts.seed,
+            "repeat": opts.repeat,
+        },
+        "results": results,
+    }
+    output = Path(opts.output) if opts.output else (
+        ROOT / "benchmarks" / "results" / f"{datetime.now():%Y%m%d_%H%M%S}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"结果已保存到: {output}")
+
+    if opts.save_baseline:
+        Path(opts.save_baseline).write_text(
+            json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        print(f"基线已保存到: {opts.save_baseline}")
+
+    if opts.baseline:
+        baseline = json.loads(Path(opts.baseline).read_text(encoding="utf-8"))
+        regressions = compare(results, baseline["results"], opts.tolerance, opts.rss_tolerance)
+        if regressions:
+            print(f"\n发现 {len(regressions)} 个性能回退")
+            return 1
+        print("\n未发现性能回退")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,6 +13,24 @@ class ConfigManager:
             with config_path.open("r", encoding="utf-8") as f:
                 cls._config = yaml.safe_load(f)
 
+    @classmethod
+    def load_dict(cls, config: dict):
+        """直接使用已加载的配置（如传给子进程的配置快照）"""
+        cls._config = config
+
+    @classmethod
+    def is_loaded(cls) -> bool:
+        return cls._config is not None
+
+    @classmethod
+    def as_dict(cls) -> dict:
+        """返回当前配置快照，可传给子进程"""
+        if cls._config is None:
+            raise ValueError(
+                "Config not loaded. Call `ConfigManager.load_config()` first."
+            )
+        return cls._config
+
     @classmethod
     def get(cls, key: str, default: Any = None) -> Any:
         # 支持 key.subkey 的访问方式
@@ -2,11 +2,22 @@
 from pathlib import Path
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import PlainTextResponse
 import uvicorn
 from config.config import ConfigManager
 ConfigManager.load_config()
+from utils.logger import configure_logging
+configure_logging()
+from api.compression import DynamicGZipMiddleware, PrecompressedStaticFiles
 from api.routes.upload_router import router as upload_router
+from service.job_scheduler import get_scheduler, shutdown_scheduler
+from utils.artifact_store import get_artifact_store
+from utils.metrics import (
+    enable_multiprocess,
+    flush as flush_metrics,
+    render_prometheus,
+    reset_multiprocess_dir,
+)
 
 
 app = FastAPI(title="GrainWatch API", version="1.0")
@@ -25,12 +36,75 @@ UPLOAD_DIR = Path(r"data\uploads")  # 创建上传目录
 UPLOAD_DIR.mkdir(exist_ok=True)  # 确保目录存在
 
 # 添加静态文件服务，这样上传的文件可以通过URL访问
-app.mount("/uploads", StaticFiles(directory=r"data\uploads"), name="uploads")
+# 预压缩版本、ETag/304 与 Range 请求见 api/compression.py
+app.mount("/uploads", PrecompressedStaticFiles(directory=r"data\uploads"), name="uploads")
+
+# ======= 动态响应压缩：超过阈值的接口响应（GeoJSON 等）使用 gzip =======
+app.add_middleware(
+    DynamicGZipMiddleware,
+    minimum_size=ConfigManager.get("compression.dynamic_min_bytes", 1024),
+    compresslevel=ConfigManager.get("compression.gzip_level", 6),
+    exclude_prefixes=("/uploads",),
+)
 
 # ======= 注册接口路由 =======
 app.include_router(upload_router, tags=["Upload"])
 
 
+# ======= 分阶段耗时指标（Prometheus 文本格式）=======
+# 多 worker 部署（server.workers > 1）时各 worker 把指标快照写到 metrics.multiprocess_dir，
+# 任一 worker 响应时合并所有快照，返回全局汇总；其他 worker 的数据最多滞后 metrics.flush_interval 秒
+METRICS_DIR = Path(
+    ConfigManager.get("metrics.multiprocess_dir", "data/uploads/cache/metrics")
+)
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(
+        render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+# ======= 产物存储各目录占用 =======
+@app.get("/artifacts/usage")
+def artifacts_usage():
+    store = get_artifact_store()
+    if store is None:
+        return {"enabled": False, "directories": {}}
+    return {
+        "enabled": True,
+        "quota_mb": store.quota_bytes / (1024 * 1024),
+        "directories": store.usage(),
+    }
+
+
+# ======= 任务调度器：启动时预热进程池（server.preload），退出时关闭 =======
+@app.on_event("startup")
+def start_scheduler():
+    if ConfigManager.get("server.workers", 1) > 1:
+        enable_multiprocess(METRICS_DIR, ConfigManager.get("metrics.flush_interval", 5))
+    # server.preload 关闭时在首个请求时再创建，缩短 worker 启动时间
+    if ConfigManager.get("server.preload", True):
+        get_scheduler()
+
+
+@app.on_event("shutdown")
+def stop_scheduler():
+    shutdown_scheduler()
+    # 写出最后一次快照，退出的 worker 的指标仍计入汇总
+    flush_metrics()
+
+
 # ======= 启动入口 =======
 if __name__ == "__main__":
-    uvicorn.run(app, port=8000)
\ No newline at end of file
+    host = ConfigManager.get("server.host", "127.0.0.1")
+    port = ConfigManager.get("server.port", 8000)
+    workers = ConfigManager.get("server.workers", 1)
+    if workers > 1:
+        # 清空上次运行的指标快照，各 worker 启动后各自写入
+        reset_multiprocess_dir(METRICS_DIR)
+        # 多进程部署：uvicorn 按导入字符串在每个 worker 进程中重新导入应用
+        uvicorn.run("main:app", host=host, port=port, workers=workers)
+    else:
+        uvicorn.run(app, host=host, port=port)
\ No newline at end of file
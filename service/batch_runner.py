@@ -0,0 +1,207 @@
+# 批量执行：对多个输入文件使用同一组参数执行同一个工具
+# 各文件作为独立任务提交给任务调度器，与其他请求共用同一进程池和内存预算；
+# 只返回紧凑的清单（输出路径、耗时、错误），不返回逐个文件的 GeoJSON。
+import asyncio
+import glob
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+from config.config import ConfigManager
+from service.job_scheduler import (
+    SchedulerBusyError,
+    estimate_layer_memory,
+    get_scheduler,
+)
+from utils.artifact_store import register_artifact
+from utils.file_handler import ensure_folder_exists, get_unique_filename
+from utils.logger import get_logger
+from utils.precompress import precompress_artifact
+
+logger = get_logger("batch_runner")
+
+# 只接受单个输入图层的工具可以批量执行
+BATCH_TOOLS = ("buffer", "calculate_field", "aggregate_group", "dissolve")
+
+_WORKER_TOOL_MANAGER = None
+
+
+def resolve_inputs(inputs: Union[str, List[str]]) -> List[Path]:
+    """展开通配符（支持 ** 递归），去重并保持顺序"""
+    patterns = [inputs] if isinstance(inputs, str) else list(inputs)
+    paths = []
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            paths.extend(sorted(glob.glob(pattern, recursive=True)))
+        else:
+            paths.append(pattern)
+    return [Path(p) for p in dict.fromkeys(paths)]
+
+
+def _run_batch_item(
+    tool_name: str, input_path: str, output_dir: Optional[str], params: dict
+) -> Dict[str, Any]:
+    """在子进程中处理单个文件，异常记录到结果中而不向上抛出"""
+    global _WORKER_TOOL_MANAGER
+    from service.tool_manager import ToolManager
+
+    if _WORKER_TOOL_MANAGER is None:
+        _WORKER_TOOL_MANAGER = ToolManager()
+    tool = _WORKER_TOOL_MANAGER._tools[tool_name]
+
+    start = time.perf_counter()
+    item = {"input": input_path, "output": None, "seconds": None, "error": None}
+    try:
+        save_path = None
+        if output_dir:
+            save_path = Path(output_dir) / tool.path_strategy.get_default_filename(
+                [Path(input_path)]
+            )
+        output, _ = tool.execute(
+            input_paths=[Path(input_path)], save_path=save_path, **params
+        )
+        item["output"] = str(output)
+    except Exception as e:
+        item["error"] = f"{type(e).__name__}: {e}"
+    item["seconds"] = round(time.perf_counter() - start, 3)
+    return item
+
+
+async def _schedule_item(
+    tool_name: str,
+    input_path: Path,
+    output_dir: Optional[Path],
+    params: dict,
+    slots: asyncio.Semaphore,
+) -> Dict[str, Any]:
+    """
+    通过任务调度器处理单个文件：按图层估算内存后排队，受调度器的进程数和内存预算约束
+
+    调度器队列已满时按其建议的间隔重试，不把繁忙当作该文件处理失败。
+    """
+    retries = ConfigManager.get("batch.busy_retries", 30)
+    async with slots:
+        try:
+            # 统计要素数需要打开图层，不在事件循环中执行
+            cost = await asyncio.to_thread(estimate_layer_memory, input_path)
+        except Exception:
+            # 输入不存在等错误由工具报告
+            cost = 0
+        for attempt in range(retries + 1):
+            try:
+                return await get_scheduler().run(
+                    _run_batch_item,
+                    tool_name,
+                    str(input_path),
+                    str(output_dir) if output_dir else None,
+                    params,
+                    cost=cost,
+                )
+            except SchedulerBusyError as e:
+                if attempt == retries:
+                    error = e
+                    break
+                logger.debug(f"调度器繁忙，{e.retry_after} 秒后重试: {input_path}")
+                await asyncio.sleep(e.retry_after)
+            except Exception as e:
+                # 子进程异常退出等无法在子进程内捕获的错误
+                error = e
+                break
+    return {
+        "input": str(input_path),
+        "output": None,
+        "seconds": None,
+        "error": f"{type(error).__name__}: {error}",
+    }
+
+
+def run_batch(
+    tool_name: str,
+    inputs: Union[str, List[str]],
+    params: Optional[Dict[str, Any]] = None,
+    output_dir: Optional[Path] = None,
+    workers: int = None,
+    manifest_path: Optional[Path] = None,
+) -> Tuple[str, str]:
+    """
+    同步入口（脚本、同步调用的工具），在新的事件循环中执行 arun_batch；
+    服务端运行时各文件仍转交服务端事件循环中的调度器排队。服务端事件循环中应直接 await arun_batch
+    """
+    return asyncio.run(
+        arun_batch(tool_name, inputs, params, output_dir, workers, manifest_path)
+    )
+
+
+async def arun_batch(
+    tool_name: str,
+    inputs: Union[str, List[str]],
+    params: Optional[Dict[str, Any]] = None,
+    output_dir: Optional[Path] = None,
+    workers: int = None,
+    manifest_path: Optional[Path] = None,
+) -> Tuple[str, str]:
+    """
+    对多个输入文件并行执行同一个工具
+
+    各文件通过任务调度器执行，与其他请求共用进程池和内存预算，
+    实际并行数同时受 workers 和调度器的 scheduler.max_workers / 内存预算限制。
+
+    Args:
+        tool_name: 工具注册名，可选 buffer、calculate_field、aggregate_group、dissolve
+        inputs: 通配符（如 "data/counties/*.shp"）或输入文件路径列表
+        params: 传给工具的参数（与单次调用相同，不含输入/输出路径）
+        output_dir: 输出目录，默认使用各工具的默认目录
+        workers: 同时提交给调度器的文件数上限，默认从配置获取或使用4
+        manifest_path: 清单保存路径，默认保存到矢量目录
+
+    Returns:
+        Tuple[str, str]: 清单保存路径和 JSON 格式的清单
+
+    Raises:
+        ValueError: 当工具不支持批量执行或没有匹配的输入文件时
+    """
+    if tool_name not in BATCH_TOOLS:
+        raise ValueError(f"工具 '{tool_name}' 不支持批量执行，可选: {list(BATCH_TOOLS)}")
+    paths = resolve_inputs(inputs)
+    if not paths:
+        raise ValueError(f"没有匹配的输入文件: {inputs}")
+    params = params or {}
+    workers = min(workers or ConfigManager.get("batch.workers", 4), len(paths))
+    if output_dir:
+        ensure_folder_exists(output_dir)
+
+    logger.info(f"批量执行 {tool_name}: {len(paths)} 个文件，同时提交数 {workers}")
+    start = time.perf_counter()
+    slots = asyncio.Semaphore(workers)
+    ordered = await asyncio.gather(
+        *(_schedule_item(tool_name, p, output_dir, params, slots) for p in paths)
+    )
+    for item in ordered:
+        if item["error"]:
+            logger.warning(f"批量处理失败: {item['input']}，{item['error']}")
+
+    failed = sum(1 for item in ordered if item["error"])
+    manifest = {
+        "tool": tool_name,
+        "params": params,
+        "total": len(ordered),
+        "succeeded": len(ordered) - failed,
+        "failed": failed,
+        "seconds": round(time.perf_counter() - start, 3),
+        "items": ordered,
+    }
+
+    if manifest_path is None:
+        save_dir = Path(ConfigManager.get("vector_dir", "data/uploads/vectors"))
+        ensure_folder_exists(save_dir)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        manifest_path = get_unique_filename(save_dir, f"batch_{tool_name}_{stamp}.json")
+    manifest_json = json.dumps(manifest, ensure_ascii=False, indent=2, default=str)
+    Path(manifest_path).write_text(manifest_json, encoding="utf-8")
+    precompress_artifact(manifest_path)
+    register_artifact(manifest_path, kind="manifest")
+    logger.info(
+        f"批量执行完成: 成功 {manifest['succeeded']}，失败 {failed}，清单保存到: {manifest_path}"
+    )
+    return str(manifest_path), manifest_json
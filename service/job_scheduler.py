@@ -0,0 +1,305 @@
+# 重型 GIS 任务调度器
+# 按输入文件大小和要素数估算每个任务的内存占用，在配置的内存预算和进程数内执行；
+# 超出预算的任务排队等待，队列已满时立即拒绝（SchedulerBusyError），避免并发的大图层任务耗尽内存。
+# 任务在预热的进程池中执行，子进程启动时已导入 geopandas/pyproj 并加载配置。
+import asyncio
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from config.config import ConfigManager
+from utils import metrics
+from utils.logger import configure_logging, get_logger
+from utils.parallel import mark_scheduler_worker
+from utils.profiler import request_profiling
+from utils.vector_io import count_features, layer_components
+
+logger = get_logger("job_scheduler")
+
+_MB = 1024 * 1024
+
+
+class SchedulerBusyError(RuntimeError):
+    """等待队列已满，任务被拒绝"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# ----------------------------- 子进程 -----------------------------
+_WORKER_TOOL_MANAGER = None
+
+
+def init_worker_process(config: dict):
+    """子进程初始化：加载配置并预先导入重型依赖，避免首个任务承担导入开销"""
+    import geopandas  # noqa: F401
+    import pyproj  # noqa: F401
+    import shapely  # noqa: F401
+
+    ConfigManager.load_dict(config)
+    configure_logging()
+    # 工具内部不再启动嵌套进程池，避免绕过调度器的进程数与内存预算
+    mark_scheduler_worker()
+
+
+def _warmup() -> bool:
+    return True
+
+
+def call_with_metrics(func: Callable, *args):
+    """执行任务并带回子进程中记录的阶段指标，由主进程合并后统一输出"""
+    try:
+        return func(*args), None, metrics.drain()
+    except Exception as e:
+        return None, e, metrics.drain()
+
+
+def _run_tool_in_worker(
+    tool_name: str,
+    input_paths: List[str],
+    save_path: Optional[str],
+    kwargs: dict,
+    profile: Optional[bool] = None,
+):
+    """在子进程中通过该进程的 ToolManager 执行工具"""
+    global _WORKER_TOOL_MANAGER
+    from service.tool_manager import ToolManager
+
+    if _WORKER_TOOL_MANAGER is None:
+        _WORKER_TOOL_MANAGER = ToolManager()
+    with request_profiling(profile):
+        return _WORKER_TOOL_MANAGER._tools[tool_name].execute(
+            input_paths=[Path(p) for p in input_paths],
+            save_path=Path(save_path) if save_path else None,
+            **kwargs,
+        )
+
+
+def _process_zip_in_worker(
+    upload_dir: str, zip_path: str, profile: Optional[bool] = None
+) -> dict:
+    """在子进程中处理上传的 ZIP 文件"""
+    from service.zip_to_shp import ShapefileService
+
+    return ShapefileService(Path(upload_dir)).process_zip(Path(zip_path), profile)
+
+
+# ----------------------------- 内存估算 -----------------------------
+def estimate_layer_memory(path: Path) -> int:
+    """按图层文件大小和要素数估算读入内存后的占用（字节）"""
+    size_factor = ConfigManager.get("scheduler.size_factor", 6)
+    bytes_per_feature = ConfigManager.get("scheduler.bytes_per_feature", 2048)
+    size = sum(f.stat().st_size for f in layer_components(path))
+    try:
+        features = count_features(path)
+    except Exception:
+        features = 0
+    return int(size * size_factor + features * bytes_per_feature)
+
+
+def estimate_zip_memory(zip_path: Path) -> int:
+    """按 ZIP 内文件的解压后大小估算处理上传文件的内存占用（字节）"""
+    size_factor = ConfigManager.get("scheduler.size_factor", 6)
+    with zipfile.ZipFile(zip_path) as zf:
+        size = sum(info.file_size for info in zf.infolist())
+    return int(size * size_factor)
+
+
+# ----------------------------- 调度器 -----------------------------
+class JobScheduler:
+    """
+    内存感知的任务调度器
+
+    - 同时运行的任务数不超过 max_workers，预估内存之和不超过 memory_budget
+    - 单个任务预估超过预算时按预算计，即独占执行
+    - 等待中的任务数达到 max_queue 时新任务立即被拒绝
+    """
+
+    def __init__(self, memory_budget: int, max_workers: int, max_queue: int):
+        self.memory_budget = memory_budget
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after = ConfigManager.get("scheduler.retry_after", 10)
+        self._reserved = 0
+        self._running = 0
+        self._waiting = 0
+        # 排队状态只在所属事件循环中读写，其他事件循环的调用转交给它执行
+        self._condition: Optional[asyncio.Condition] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._bind_lock = threading.Lock()
+        self._pool = ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=init_worker_process,
+            initargs=(ConfigManager.as_dict(),),
+        )
+        # 预热：提前启动所有子进程并完成导入
+        for future in [self._pool.submit(_warmup) for _ in range(max_workers)]:
+            future.result()
+        logger.info(
+            f"任务调度器已启动: 进程数 {max_workers}，内存预算 {memory_budget // _MB} MB，队列上限 {max_queue}"
+        )
+
+    def stats(self) -> Dict[str, int]:
+        """当前运行/排队情况"""
+        return {
+            "running": self._running,
+            "waiting": self._waiting,
+            "reserved_mb": self._reserved // _MB,
+            "budget_mb": self.memory_budget // _MB,
+        }
+
+    def _admissible(self, cost: int) -> bool:
+        return (
+            self._running < self.max_workers
+            and self._reserved + cost <= self.memory_budget
+        )
+
+    def _owner_loop(self, loop: asyncio.AbstractEventLoop) -> asyncio.AbstractEventLoop:
+        """
+        返回持有排队状态的事件循环
+
+        首次调用的事件循环成为所属循环；所属循环已关闭，或已停止且没有运行/排队中的任务时
+        （如脚本中先后两次 run_batch 各自的 asyncio.run），改由当前事件循环持有。
+        """
+        with self._bind_lock:
+            owner = self._loop
+            if owner is None or owner.is_closed() or (
+                not owner.is_running() and self._running == 0 and self._waiting == 0
+            ):
+                self._loop = owner = loop
+                self._condition = asyncio.Condition()
+            return owner
+
+    async def run(self, func: Callable, *args, cost: int = 0) -> Any:
+        """
+        在内存预算内执行任务（func 及参数需可在进程间传递）
+
+        在其他线程的事件循环中调用时（如工具线程中同步 run_batch 的 asyncio.run），
+        任务转交给所属事件循环排队，与服务端的请求共用同一份预算，不会出现两个循环同时修改计数。
+
+        Args:
+            func: 子进程中执行的顶层函数
+            *args: 函数参数
+            cost: 预估内存占用（字节）
+
+        Raises:
+            SchedulerBusyError: 需要排队但等待队列已满时
+        """
+        loop = asyncio.get_running_loop()
+        owner = self._owner_loop(loop)
+        if owner is not loop:
+            future = asyncio.run_coroutine_threadsafe(
+                self._run(func, *args, cost=cost), owner
+            )
+            return await asyncio.wrap_future(future)
+        return await self._run(func, *args, cost=cost)
+
+    async def _run(self, func: Callable, *args, cost: int = 0) -> Any:
+        """在所属事件循环中排队并执行任务"""
+        loop = asyncio.get_running_loop()
+        cost = min(cost, self.memory_budget)
+
+        async with self._condition:
+            if not self._admissible(cost):
+                if self._waiting >= self.max_queue:
+                    raise SchedulerBusyError(
+                        f"服务繁忙，当前排队任务数已达上限({self.max_queue})",
+                        self.retry_after,
+                    )
+                self._waiting += 1
+                logger.debug("任务排队等待，预估内存 %s MB，%s", cost // _MB, self.stats())
+                try:
+                    await self._condition.wait_for(lambda: self._admissible(cost))
+                finally:
+                    self._waiting -= 1
+            self._reserved += cost
+            self._running += 1
+
+        try:
+            result, error, snapshot = await loop.run_in_executor(
+                self._pool, call_with_metrics, func, *args
+            )
+            metrics.merge(snapshot)
+            if error is not None:
+                raise error
+            return result
+        finally:
+            async with self._condition:
+                self._reserved -= cost
+                self._running -= 1
+                self._condition.notify_all()
+
+    async def run_tool(
+        self,
+        tool_name: str,
+        input_paths: List[Path],
+        save_path: Optional[Path] = None,
+        profile: Optional[bool] = None,
+        **kwargs,
+    ):
+        """按输入图层估算内存后，在子进程中执行 ToolManager 中注册的工具"""
+        # 估算需要统计要素数（打开图层），不在事件循环中执行
+        cost = await asyncio.to_thread(
+            lambda: sum(estimate_layer_memory(p) for p in input_paths)
+        )
+        return await self.run(
+            _run_tool_in_worker,
+            tool_name,
+            [str(p) for p in input_paths],
+            str(save_path) if save_path else None,
+            kwargs,
+            profile,
+            cost=cost,
+        )
+
+    async def process_zip(
+        self, upload_dir: Path, zip_path: Path, profile: Optional[bool] = None
+    ) -> dict:
+        """按解压后大小估算内存后，在子进程中处理上传的 ZIP 文件"""
+        # 读取 ZIP 目录需要磁盘 IO，不在事件循环中执行
+        cost = await asyncio.to_thread(estimate_zip_memory, zip_path)
+        return await self.run(
+            _process_zip_in_worker,
+            str(upload_dir),
+            str(zip_path),
+            profile,
+            cost=cost,
+        )
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
+
+
+_SCHEDULER: Optional[JobScheduler] = None
+_SCHEDULER_LOCK = threading.Lock()
+
+
+def get_scheduler() -> JobScheduler:
+    """
+    获取全局调度器，首次调用时按配置创建（每个 uvicorn worker 进程各有一个）
+
+    scheduler.memory_budget_mb 为整机预算，多 worker 部署时按 server.workers 平均分配。
+    """
+    global _SCHEDULER
+    with _SCHEDULER_LOCK:
+        if _SCHEDULER is None:
+            server_workers = max(1, ConfigManager.get("server.workers", 1))
+            _SCHEDULER = JobScheduler(
+                memory_budget=ConfigManager.get("scheduler.memory_budget_mb", 4096)
+                * _MB
+                // server_workers,
+                max_workers=ConfigManager.get("scheduler.max_workers", 2),
+                max_queue=ConfigManager.get("scheduler.max_queue", 8),
+            )
+    return _SCHEDULER
+
+
+def shutdown_scheduler(wait: bool = True):
+    """关闭全局调度器（尚未创建时无需处理）"""
+    global _SCHEDULER
+    with _SCHEDULER_LOCK:
+        scheduler, _SCHEDULER = _SCHEDULER, None
+    if scheduler is not None:
+        scheduler.shutdown(wait=wait)
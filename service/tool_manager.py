@@ -1,30 +1,51 @@
+import asyncio
+import json
 from pathlib import Path
-from typing import List, Literal, Optional
+from typing import Any, Callable, Dict, List, Literal, Optional, Tuple, Union
 import geopandas as gpd
 from shapely import make_valid
 from config.config import ConfigManager
-from langchain_core.tools import tool
+from langchain_core.tools import BaseTool, StructuredTool, tool
+from service.batch_runner import arun_batch, run_batch
+from service.job_scheduler import get_scheduler
+from service.worker_pool import run_in_pool
 from tools.strategies.path_strategy import (
     AggregateGroupPathStrategy,
     BufferPathStrategy,
     CalculateFieldPathStrategy,
     ChangeAnalyzePathStrategy,
+    DissolvePathStrategy,
+    TransitionMatrixPathStrategy,
     UnionPathStrategy,
 )
 from tools.vector.statistics.aggregate_group import AggregateGroupTool
 from tools.vector.statistics.calculate_geo import CalculateGeoAttributesTool
 from tools.vector.statistics.change_analyze import ChangeAnalyzeTool
+from tools.vector.statistics.transition_matrix import TransitionMatrixTool
 from tools.vector.union import UnionTool, union_core
+from tools.vector.dissolve import DissolveTool
 from tools.vector.buffer import BufferTool, buffer_core
 from utils.crs_validator import CRSValidator
+from utils.layer_catalog import describe_layer, get_layer_catalog
 from utils.logger import get_logger
 
 logger = get_logger("工具管理器")
 
 
+def _plan_call(
+    name: str,
+    input_paths: List[Path],
+    save_path: Optional[Path] = None,
+    **kwargs,
+) -> Tuple[str, List[Path], Optional[Path], Dict[str, Any]]:
+    """不执行工具，只返回调用参数，供异步调用提交给任务调度器"""
+    return name, input_paths, save_path, kwargs
+
+
 class ToolManager:
     def __init__(self):
         self._tools = {}
+        self._lc_tools = None
         self._register_tools()
 
     def _register_tools(self):
@@ -34,27 +55,130 @@ class ToolManager:
         self._tools["change_analyze"] = ChangeAnalyzeTool(
             ChangeAnalyzePathStrategy(),
         )
-        self._tools["calculate_filed"] = CalculateGeoAttributesTool(
+        self._tools["calculate_field"] = CalculateGeoAttributesTool(
             CalculateFieldPathStrategy()
         )
         self._tools["aggregate_group"] = AggregateGroupTool(
             AggregateGroupPathStrategy()
         )
+        self._tools["transition_matrix"] = TransitionMatrixTool(
+            TransitionMatrixPathStrategy()
+        )
+        self._tools["dissolve"] = DissolveTool(DissolvePathStrategy())
 
     def get_tool_lists(self) -> list:
-        """获取工具列表，供 LangChain Agent 使用"""
-        tools = [
-            self._create_buffer_tool,
-            self._create_union_tool,
-            self._create_change_analyze_tool,
-            self._create_calculate_field_tool,
-            self._create_aggregate_group_tool,
-        ]
-        return tools
-
-    def _create_buffer_tool(self):
+        """获取工具列表，供 LangChain Agent 使用（同时支持 invoke 和 ainvoke）"""
+        if self._lc_tools is None:
+            # 重型 GIS 工具：异步调用经任务调度器在子进程中执行
+            scheduled = [
+                self._create_buffer_tool,
+                self._create_union_tool,
+                self._create_change_analyze_tool,
+                self._create_calculate_field_tool,
+                self._create_aggregate_group_tool,
+                self._create_transition_matrix_tool,
+                self._create_dissolve_tool,
+            ]
+            others = [
+                self._create_batch_tool,
+                self._create_describe_layer_tool,
+            ]
+            self._lc_tools = [self._with_scheduler(create) for create in scheduled] + [
+                self._with_coroutine(create()) for create in others
+            ]
+        return self._lc_tools
+
+    def _execute_tool(
+        self,
+        name: str,
+        input_paths: List[Path],
+        save_path: Optional[Path] = None,
+        **kwargs,
+    ) -> Tuple[str, str]:
+        """在当前进程中执行注册的工具"""
+        return self._tools[name].execute(
+            input_paths=input_paths, save_path=save_path, **kwargs
+        )
+
+    def _with_scheduler(self, create: Callable[..., StructuredTool]) -> StructuredTool:
+        """
+        创建重型工具：同步调用在当前进程中执行；异步调用（Agent 的 ainvoke）经任务调度器在子进程中执行，
+        受内存预算和排队上限约束，队列已满时抛出 SchedulerBusyError
+
+        同一个创建函数再以“只记录调用”的方式创建一次，得到工具参数到 (工具名, 输入, 保存路径, 参数) 的转换，
+        两种调用方式共用同一份参数处理逻辑。
+        """
+        lc_tool = create(self._execute_tool)
+        plan = create(_plan_call).func
+
+        async def coroutine(*args, **kwargs):
+            name, input_paths, save_path, tool_kwargs = plan(*args, **kwargs)
+            return await self.arun_scheduled(name, input_paths, save_path, **tool_kwargs)
+
+        lc_tool.coroutine = coroutine
+        return lc_tool
+
+    @staticmethod
+    def _with_coroutine(sync_tool: StructuredTool) -> StructuredTool:
+        """为同步工具添加协程实现：计算交给共享线程池执行，不阻塞事件循环；已有协程实现的工具保持不变"""
+        if sync_tool.coroutine is not None:
+            return sync_tool
+        func = sync_tool.func
+
+        async def coroutine(*args, **kwargs):
+            return await run_in_pool(func, *args, **kwargs)
+
+        sync_tool.coroutine = coroutine
+        return sync_tool
+
+    def get_tool(self, name: str) -> BaseTool:
+        """按名称获取 LangChain 工具，如 buffer_tool"""
+        for lc_tool in self.get_tool_lists():
+            if lc_tool.name == name:
+                return lc_tool
+        raise ValueError(f"未知工具: {name}")
+
+    async def arun_tools(
+        self, calls: List[Tuple[str, Dict[str, Any]]]
+    ) -> List[Union[Tuple[str, str], Exception]]:
+        """
+        并发执行多个互不依赖的工具调用，总耗时约等于最慢的一个调用
+
+        Args:
+            calls: (工具名, 参数) 列表，如 [("buffer_tool", {"input_path": "a.shp"}), ...]
+
+        Returns:
+            与 calls 顺序一致的结果列表；某个调用失败时对应位置为异常对象，不影响其他调用
+        """
+        tasks = [self.get_tool(name).ainvoke(args) for name, args in calls]
+        logger.info(f"并发执行{len(tasks)}个工具调用")
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def arun_scheduled(
+        self,
+        name: str,
+        input_paths: List[Path],
+        save_path: Optional[Path] = None,
+        **kwargs,
+    ) -> Tuple[str, str]:
+        """
+        通过内存感知调度器在子进程中执行工具，适用于大图层的重型任务
+
+        Args:
+            name: 注册的工具名，如 "union"、"dissolve"
+            input_paths: 输入文件路径列表
+            save_path: 保存路径（可选）
+            **kwargs: 工具参数
+
+        Raises:
+            SchedulerBusyError: 等待队列已满时
+        """
+        if name not in self._tools:
+            raise ValueError(f"未知工具: {name}")
+        return await get_scheduler().run_tool(name, input_paths, save_path, **kwargs)
+
+    def _create_buffer_tool(self, execute: Callable[..., Any]):
         """创建 buffer 工具函数"""
-        buffer_instance = self._tools["buffer"]
 
         @tool
         def buffer_tool(
@@ -76,19 +200,19 @@ class ToolManager:
                 geojson: 处理后的数据可视化的 GeoJSON。
             """
 
-            return buffer_instance.execute(
+            return execute(
+                "buffer",
                 input_paths=[Path(input_path)],
                 distance=distance,
                 unit=unit,
                 target_crs=target_crs,
-                save_path=Path(save_path),
+                save_path=Path(save_path) if save_path else None,
             )
 
         return buffer_tool
 
-    def _create_union_tool(self):
+    def _create_union_tool(self, execute: Callable[..., Any]):
         """创建 union 工具函数"""
-        union_instance = self._tools["union"]
 
         @tool
         def union_tool(
@@ -115,7 +239,8 @@ class ToolManager:
                 >>> paths = ["data1.shp", "data2.shp"]
                 >>> save_path, geojson = union_tool(paths)
             """
-            return union_instance.execute(
+            return execute(
+                "union",
                 input_paths=[Path(p) for p in input_paths],
                 keep_fid=keep_fid,
                 save_path=Path(save_path) if save_path else None,
@@ -123,9 +248,7 @@ class ToolManager:
 
         return union_tool
 
-    def _create_change_analyze_tool(self):
-        change_analyze_instance = self._tools["change_analyze"]
-
+    def _create_change_analyze_tool(self, execute: Callable[..., Any]):
         @tool
         def change_analyze_tool(
             input_paths: list[str],
@@ -133,15 +256,20 @@ class ToolManager:
             after_fid: str = "FID_2",
             change_type_field: str = "changed",
             output_path: str = None,
+            overlap_threshold: Optional[float] = None,
+            incremental: bool = False,
         ) -> tuple[str, str]:
             """
             分析矢量数据中的变化类型，共有new、lost、unchanged、unknown四种类型。
             args:
-                input_paths: 输入矢量数据的路径。
+                input_paths: 输入矢量数据的路径。传入一个路径时为 union 结果；
+                    传入两个路径时直接对比前后两期图层，无需先执行 union_tool。
                 before_fid: 变化前的FID字段名称，默认为 "FID_1"。
                 after_fid: 变化后的FID字段名称，默认为 "FID_2"。
                 change_type_field: 变化类型字段名称，默认为 "changed"。
                 output_path: 处理后数据的保存路径。如果未提供，则保存到默认目录。
+                overlap_threshold: 两期直接对比时判定为未变化的重叠比例阈值，默认为0.9。
+                incremental: 两期直接对比时是否复用同一基期上一次的检测结果，只重新计算几何变化的要素，默认为False。
             Returns:
                 tuple[str, str]: 保存路径和GeoJSON格式的结果
             Example:
@@ -153,32 +281,37 @@ class ToolManager:
                         output_path="data/change_result.shp"
                     )
             """
-            return change_analyze_instance.execute(
-                input_paths=Path(input_paths[0]),
+            return execute(
+                "change_analyze",
+                input_paths=[Path(p) for p in input_paths],
                 before_fid=before_fid,
                 after_fid=after_fid,
                 change_type_field=change_type_field,
-                save_path=Path(output_path),
+                overlap_threshold=overlap_threshold,
+                incremental=incremental,
+                save_path=Path(output_path) if output_path else None,
             )
 
         return change_analyze_tool
 
-    def _create_calculate_field_tool(self):
-        calculate_field_instance = self._tools["calculate_field"]
-
+    def _create_calculate_field_tool(self, execute: Callable[..., Any]):
         @tool
         def calculate_field_tool(
             input_path: list[str],
             output_path: str,
-            mode: Literal["area", "length"],
+            mode: Optional[Literal["area", "length"]] = "area",
             target_crs: str = None,
             field_name: str = None,
             overwrite: bool = True,
             area_unit: Literal["m2", "km2", "mu"] = "m2",
             length_unit: Literal["m", "km"] = "m",
+            metrics: Optional[dict[str, Optional[str]]] = None,
+            field_names: Optional[dict[str, str]] = None,
+            geodesic: bool = False,
+            write_mode: Literal["file", "sidecar"] = "file",
         ) -> tuple[str, str]:
             """
-            计算矢量数据的几何属性（面积或长度）
+            计算矢量数据的几何属性（面积或长度），或一次读写计算多个几何属性
 
             Args:
                 input_path (Path): 输入矢量文件路径
@@ -189,6 +322,15 @@ class ToolManager:
                 overwrite (bool, optional): 是否覆盖已存在的字段，默认为True
                 area_unit (Literal["m2", "km2", "mu"]): 面积单位，默认为"m2"
                 length_unit (Literal["m", "km"]): 长度单位，默认为"m"
+                metrics (dict, optional): 多指标模式，指标 -> 单位，提供时忽略 mode/field_name/area_unit/length_unit。
+                    支持 area（m2/km2/mu/ha）、perimeter（m/km）、length（m/km）、centroid_x、centroid_y、
+                    vertex_count、bbox、compactness，如 {"area": "mu", "perimeter": "m", "compactness": null}
+                field_names (dict, optional): 多指标模式下 指标 -> 字段名，默认使用指标对应的字段名；
+                    bbox 需提供四个字段名的列表，如 {"bbox": ["xmin", "ymin", "xmax", "ymax"]}
+                geodesic (bool, optional): 是否按椭球计算面积/周长/长度，不重投影到EPSG:3857，
+                    高纬度地区结果更准确，默认为False
+                write_mode (Literal["file", "sidecar"]): "file" 重写完整图层；"sidecar" 只把新字段写入
+                    输入图层关联的属性旁路文件，不复制几何，返回输入图层路径，后续工具可直接使用该路径
 
             Returns:
                 tuple: (保存路径, GeoJSON字符串)
@@ -198,45 +340,57 @@ class ToolManager:
                 TypeError: 当几何类型与计算模式不匹配时
                 Exception: 其他未预期的错误
             """
-            return calculate_field_instance.execute(
-                input_paths=Path(input_path[0]),
+            return execute(
+                "calculate_field",
+                input_paths=[Path(input_path[0])],
                 field_name=field_name,
                 mode=mode,
                 target_crs=target_crs,
                 overwrite=overwrite,
-                save_path=Path(output_path),
+                save_path=Path(output_path) if output_path else None,
                 area_unit=area_unit,
                 length_unit=length_unit,
+                metrics=metrics,
+                field_names=field_names,
+                geodesic=geodesic,
+                write_mode=write_mode,
             )
 
         return calculate_field_tool
 
-    def _create_aggregate_group_tool(self):
-        aggregate_group_instance = self._tools["aggregate_group"]
-
+    def _create_aggregate_group_tool(self, execute: Callable[..., Any]):
         @tool
         def aggregate_group_tool(
             input_path: list[str],
             output_path: str,
             mode: Literal["area", "length"],
-            group_field: str,
+            group_field: str = None,
             field_name: str = None,
             target_crs: str = None,
             area_unit: Literal["m2", "km2", "mu"] = "m2",
             length_unit: Literal["m", "km"] = "m",
+            group_fields: Optional[list[str]] = None,
+            stats: Optional[dict[str, list[str]]] = None,
+            output_format: Literal["csv", "parquet", "pivot"] = "csv",
+            streaming: bool = False,
         ) -> tuple[str, str]:
             """
-            按字段汇总几何统计结果
+            按字段汇总几何统计结果，支持多个分组字段和多个统计量一次计算
 
             Args:
                 input_path (Path): 输入矢量文件路径
                 mode (Literal["area", "length"]): 统计模式，"area"表示面积，"length"表示长度
                 group_field (str): 分组字段名
                 field_name (str, optional): 计算结果字段名称，默认使用mode值
-                target_crs (str, optional): 目标坐标系，默认从配置获取或使用EPSG:3857
+                target_crs (str, optional): 保留参数，汇总已计算的字段值，不再重投影
                 area_unit (Literal["m2", "km2", "mu"]): 面积单位，默认为"m2"
                 length_unit (Literal["m", "km"]): 长度单位，默认为"m"
                 output_path (Path, optional): 保存路径，默认使用配置的默认路径。
+                group_fields (list[str], optional): 多个分组字段，如 ["county", "crop", "changed"]，提供时忽略 group_field
+                stats (dict, optional): 字段 -> 统计量列表，如 {"area": ["sum", "count", "mean", "min", "max", "p90"]}，
+                    支持 sum、count、mean、min、max、median、std 及百分位数 p1~p99，默认只统计 field_name 的 sum
+                output_format (Literal["csv", "parquet", "pivot"]): 输出格式，pivot 以最后一个分组字段展开为列
+                streaming (bool): 图层过大无法一次载入内存时设为True，分批读取并合并统计结果（分位数为近似值）
 
             Returns:
                 tuple: (保存路径, GeoJSON字符串)
@@ -244,15 +398,178 @@ class ToolManager:
             Raises:
                 ValueError: 当mode参数无效、分组字段不存在或计算字段不存在时
             """
-            return aggregate_group_instance.execute(
-                input_paths=Path(input_path[0]),
-                save_path=Path(output_path),
+            return execute(
+                "aggregate_group",
+                input_paths=[Path(input_path[0])],
+                save_path=Path(output_path) if output_path else None,
                 mode=mode,
                 group_field=group_field,
                 field_name=field_name,
                 target_crs=target_crs,
                 area_unit=area_unit,
                 length_unit=length_unit,
+                group_fields=group_fields,
+                stats=stats,
+                output_format=output_format,
+                streaming=streaming,
             )
 
         return aggregate_group_tool
+
+    def _create_transition_matrix_tool(self, execute: Callable[..., Any]):
+        @tool
+        def transition_matrix_tool(
+            input_paths: list[str],
+            output_path: str = None,
+            fid_fields: Optional[list[str]] = None,
+            class_fields: Optional[list[str]] = None,
+            epoch_labels: Optional[list[str]] = None,
+            pairs: Literal["consecutive", "all"] = "consecutive",
+            target_crs: str = None,
+            area_unit: Literal["m2", "km2", "mu"] = "m2",
+        ) -> tuple[str, str]:
+            """
+            一次性统计多期数据的面积加权转移矩阵，无需多次 union 和变化分析
+
+            Args:
+                input_paths (list[str]): 一个 N 期 union 结果路径，或按时间顺序排列的多期图层路径
+                output_path (str, optional): 转移矩阵表（CSV）保存路径，默认保存到默认目录
+                fid_fields (list[str], optional): 各期 FID 字段，默认自动识别 FID_1...FID_N
+                class_fields (list[str], optional): 各期分类字段（如各年作物类型），为空时只统计存在/消失
+                epoch_labels (list[str], optional): 各期名称，如 ["2020", "2021", "2022"]
+                pairs (Literal["consecutive", "all"]): 统计相邻期次还是所有期次两两之间的转移
+                target_crs (str, optional): 面积计算坐标系，默认从配置获取或使用EPSG:3857
+                area_unit (Literal["m2", "km2", "mu"]): 面积单位，默认为"m2"
+
+            Returns:
+                tuple: (保存路径, JSON 格式的转移矩阵)
+            """
+            return execute(
+                "transition_matrix",
+                input_paths=[Path(p) for p in input_paths],
+                save_path=Path(output_path) if output_path else None,
+                fid_fields=fid_fields,
+                class_fields=class_fields,
+                epoch_labels=epoch_labels,
+                pairs=pairs,
+                target_crs=target_crs,
+                area_unit=area_unit,
+            )
+
+        return transition_matrix_tool
+
+    def _create_dissolve_tool(self, execute: Callable[..., Any]):
+        @tool
+        def dissolve_tool(
+            input_path: str,
+            by: list[str],
+            output_path: str = None,
+            aggfunc: Optional[Union[str, dict[str, Union[str, list[str]]]]] = "first",
+            target_crs: str = None,
+            coverage: Literal["auto", "always", "never"] = "auto",
+        ) -> tuple[str, str]:
+            """
+            按一个或多个字段融合(dissolve)矢量要素，合并同组几何并汇总属性，输出带几何的汇总结果
+
+            Args:
+                input_path (str): 输入矢量数据路径
+                by (list[str]): 分组字段，如 ["county"] 或 ["county", "crop"]
+                output_path (str, optional): 处理后数据的保存路径。如果未提供，则保存到默认目录
+                aggfunc (str | dict, optional): 其余字段的汇总方式，默认取每组第一个值（"first"）；
+                    也可为 字段 -> 统计量或统计量列表，如 {"area": ["sum", "mean"], "FID_1": "count"}
+                target_crs (str, optional): 目标坐标系，默认从配置获取或使用EPSG:3857
+                coverage (Literal["auto", "always", "never"]): 地块互不重叠时使用的快速合并方式，
+                    "auto" 自动判断，"never" 始终使用通用合并
+
+            Returns:
+                tuple: (保存路径, GeoJSON字符串)
+
+            Raises:
+                ValueError: 当输入数据为空或分组字段不存在时
+            """
+            return execute(
+                "dissolve",
+                input_paths=[Path(input_path)],
+                save_path=Path(output_path) if output_path else None,
+                by=by,
+                aggfunc=aggfunc,
+                target_crs=target_crs,
+                coverage=coverage,
+            )
+
+        return dissolve_tool
+
+    def _create_batch_tool(self):
+        @tool
+        def batch_tool(
+            tool_name: Literal["buffer", "calculate_field", "aggregate_group", "dissolve"],
+            inputs: list[str],
+            params: Optional[dict[str, Any]] = None,
+            output_dir: str = None,
+            workers: int = None,
+        ) -> tuple[str, str]:
+            """
+            对多个输入文件使用同一组参数批量执行同一个工具（如对所有县的图层计算面积），各文件并行处理，
+            只返回一份清单，不返回逐个文件的 GeoJSON。一次调用代替多次相同的工具调用。
+
+            Args:
+                tool_name: 要执行的工具，可选 buffer、calculate_field、aggregate_group、dissolve
+                inputs (list[str]): 输入文件路径列表，也可以是通配符，如 ["data/counties/*.shp"]
+                params (dict, optional): 工具参数（与单次调用相同，不含输入/输出路径），
+                    如 {"mode": "area", "area_unit": "mu"} 或 {"distance": 100}
+                output_dir (str, optional): 输出目录，默认使用各工具的默认目录
+                workers (int, optional): 同时处理的文件数上限，默认从配置获取；实际并行数还受任务调度器的进程数和内存预算限制
+
+            Returns:
+                tuple: (清单保存路径, JSON 清单)，清单包含每个文件的输出路径、耗时和错误信息
+            """
+            return run_batch(
+                tool_name=tool_name,
+                inputs=inputs,
+                params=params,
+                output_dir=Path(output_dir) if output_dir else None,
+                workers=workers,
+            )
+
+        async def abatch_tool(
+            tool_name: str,
+            inputs: list[str],
+            params: Optional[dict[str, Any]] = None,
+            output_dir: str = None,
+            workers: int = None,
+        ) -> tuple[str, str]:
+            # 异步调用时在当前事件循环中把各文件提交给任务调度器
+            return await arun_batch(
+                tool_name=tool_name,
+                inputs=inputs,
+                params=params,
+                output_dir=Path(output_dir) if output_dir else None,
+                workers=workers,
+            )
+
+        batch_tool.coroutine = abatch_tool
+        return batch_tool
+
+    def _create_describe_layer_tool(self):
+        @tool
+        def describe_layer_tool(path: str, with_lineage: bool = False) -> str:
+            """
+            查询矢量图层的元数据：坐标系、字段及类型、要素数、范围、几何类型，以及生成该图层的工具和参数。
+            直接读取图层目录，不打开图层文件；回答“图层里有哪些字段/是什么坐标系/有多少要素”时优先使用。
+
+            Args:
+                path (str): 图层路径
+                with_lineage (bool): 是否同时返回完整来源链（由哪些输入经哪些工具生成），默认为False
+
+            Returns:
+                str: JSON 格式的图层元数据
+            """
+            info = {
+                k: v for k, v in describe_layer(Path(path)).items() if k != "signature"
+            }
+            catalog = get_layer_catalog()
+            if with_lineage and catalog is not None:
+                info["lineage"] = catalog.lineage(Path(path))
+            return json.dumps(info, ensure_ascii=False, indent=2, default=str)
+
+        return describe_layer_tool
@@ -0,0 +1,45 @@
+# 工具调用共享线程池
+# 异步 Agent 中的工具协程把 GIS 计算交给该线程池执行，不阻塞事件循环；
+# GEOS/GDAL/PROJ 计算期间会释放 GIL，多个工具调用可以真正并行。
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+from config.config import ConfigManager
+from utils.logger import get_logger
+
+logger = get_logger("worker_pool")
+
+_POOL: Optional[ThreadPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_worker_pool() -> ThreadPoolExecutor:
+    """获取共享线程池，首次调用时按配置 worker_pool.max_workers 创建"""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            max_workers = ConfigManager.get("worker_pool.max_workers", 4)
+            _POOL = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="gis-worker"
+            )
+            logger.info(f"工具线程池已创建，线程数: {max_workers}")
+    return _POOL
+
+
+async def run_in_pool(func: Callable, *args, **kwargs) -> Any:
+    """在共享线程池中执行同步函数并等待结果"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_worker_pool(), functools.partial(func, *args, **kwargs)
+    )
+
+
+def shutdown_worker_pool(wait: bool = True):
+    """关闭共享线程池（应用退出时调用）"""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.shutdown(wait=wait)
+            _POOL = None
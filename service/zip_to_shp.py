@@ -1,9 +1,16 @@
 import json
 from pathlib import Path
-import geopandas as gpd
+from config.config import ConfigManager
+from utils.artifact_store import register_artifact
 from utils.crs_validator import CRSValidator
 from utils.file_handler import extract_zip
+from utils.geojson_handler import to_geojson
+from utils.layer_catalog import record_layer
 from utils.logger import get_logger
+from utils.metrics import tool_context
+from utils.precompress import precompress_artifact
+from utils.profiler import profile_call
+from utils.vector_io import read_vector, write_canonical
 logger = get_logger("ShapefileService")
 
 
@@ -28,16 +35,27 @@ class ShapefileService:
     1. 解压ZIP文件
     2. 验证shapefile组成
     3. 读取shapefile
-    4、判断坐标系并统一为4326
-    5. 转为GeoJSON返回前端
-    6. 转换为3857并保存到本地
-    7. 返回结果
+    4. 生成规范化副本：修复几何、投影到 project_crs、统一属性类型（canonical/ 目录）
+    5. 生成 4326 展示副本（display/ 目录）并转为 GeoJSON 返回前端
+    6. 返回结果，后续工具使用规范化副本，无需再修复和重投影
     """
 
     def __init__(self, upload_dir: Path):
         self.upload_dir = upload_dir
 
-    def process_zip(self, zip_path: Path):
+    def process_zip(self, zip_path: Path, profile: bool = None):
+        """
+        Args:
+            zip_path: 上传的 ZIP 文件路径
+            profile: 是否进行内存分析，None 时按配置决定；分析报告路径在结果的 profile_report 中
+        """
+        with tool_context("process_zip"), profile_call("process_zip", profile) as p:
+            result = self._process_zip(zip_path)
+        if p is not None:
+            result["profile_report"] = p.report_path
+        return result
+
+    def _process_zip(self, zip_path: Path):
         try: 
             logger.debug("开始处理ZIP文件")
             # 1. 解压
@@ -45,23 +63,49 @@ class ShapefileService:
 
             # 2. 验证 shapefile 组成
             shp_path = validate_shapefile_components(extract_path)
-            logger.debug(f"找到 shapefile: {shp_path}")
+            logger.debug("找到 shapefile: %s", shp_path)
 
             # 3. 读取 shapefile
-            gdf = gpd.read_file(shp_path)
+            gdf = read_vector(shp_path)
 
-            # 4. 判断坐标系并统一为4326
-            gdf_4326 = CRSValidator.ensure_projected_crs(gdf, "EPSG:4326")
+            # 4. 规范化副本，只在入库时修复和重投影一次
+            project_crs = ConfigManager.get("project_crs", "EPSG:3857")
+            canonical_path = extract_path / "canonical" / shp_path.name
+            gdf = write_canonical(gdf, canonical_path, project_crs)
+            logger.debug("规范化副本已保存: %s", canonical_path)
+            record_layer(
+                canonical_path,
+                tool="ingest",
+                params={"project_crs": project_crs},
+                inputs=[shp_path],
+            )
 
-            # 5. 转为GeoJSON返回前端
-            geojson_str = gdf_4326.to_json()
+            # 5. 4326 展示副本，转为GeoJSON返回前端
+            gdf_4326 = CRSValidator.ensure_projected_crs(gdf, "EPSG:4326")
+            geojson_str = to_geojson(gdf_4326, encoding="geojson")
+            display_path = extract_path / "display" / f"{shp_path.stem}.geojson"
+            display_path.parent.mkdir(exist_ok=True)
+            display_path.write_text(geojson_str, encoding="utf-8")
+            precompress_artifact(display_path)
+            # 展示文件始终为 GeoJSON；配置为 TopoJSON 输出时响应另行编码
+            if ConfigManager.get("output.encoding", "geojson") == "topojson":
+                geojson_str = to_geojson(gdf_4326)
             geojson = json.loads(geojson_str)
 
-            # 6. 返回GeoJSON和文件路径
+            # 6. 登记解压目录，纳入产物存储的配额管理
+            register_artifact(
+                extract_path.parent,
+                kind="upload",
+                pinned=ConfigManager.get("artifacts.pin_uploads", False),
+            )
+
+            # 7. 返回GeoJSON和文件路径
             return {
                 "label": shp_path.stem,
                 "geojson": geojson,
-                "shp_path": str(shp_path)
+                "shp_path": str(canonical_path),
+                "original_path": str(shp_path),
+                "display_path": str(display_path),
             }
         except Exception as e:
             logger.error(f"处理ZIP文件时出错: {str(e)}")
@@ -0,0 +1,53 @@
+import os
+import sys
+
+import geopandas as gpd
+import pandas as pd
+from shapely.geometry import Point
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools.vector.statistics.aggregate_group import _grouped_stats
+from tools.vector.statistics.streaming_aggregate import streaming_grouped_stats
+from utils.summary_cache import SummaryCache
+
+STATS = {"area": ["sum", "count", "mean"]}
+
+
+def _frame():
+    # 县为空的要素仍属于省 A，粗分组结果必须包含它
+    return pd.DataFrame(
+        {"prov": ["A", "A", "A"], "county": ["x", None, "y"], "area": [1.0, 10.0, 100.0]}
+    )
+
+
+def _assert_prov_a(table):
+    row = table.set_index("prov").loc["A"]
+    assert row["area_sum"] == 111
+    assert row["area_mean"] == 37
+
+
+def test_rollup_keeps_null_group_keys(tmp_path):
+    cache = SummaryCache(tmp_path / "summary.sqlite")
+    fine = _grouped_stats(_frame(), ["prov", "county"], STATS, dropna=False)
+    cache.put(tmp_path / "layer.gpkg", "h", ["prov", "county"], STATS, fine)
+
+    _assert_prov_a(cache.get("h", ["prov"], {"area": ["sum", "mean"]}))
+    # 直接计算（默认丢弃空分组键）与上卷一致
+    _assert_prov_a(_grouped_stats(_frame(), ["prov"], STATS))
+
+
+def test_streaming_keeps_null_group_keys(tmp_path):
+    path = tmp_path / "layer.gpkg"
+    df = _frame()
+    gpd.GeoDataFrame(df, geometry=[Point(i, i) for i in range(len(df))], crs=4326).to_file(
+        path
+    )
+    fine = streaming_grouped_stats(
+        path, ["prov", "county"], STATS, batch_size=2, dropna=False
+    )
+    assert len(fine) == 3
+    assert fine["area_sum"].sum() == 111
+
+    cache = SummaryCache(tmp_path / "summary.sqlite")
+    cache.put(path, "h", ["prov", "county"], STATS, fine)
+    _assert_prov_a(cache.get("h", ["prov"], {"area": ["sum", "mean"]}))
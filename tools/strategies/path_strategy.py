@@ -82,4 +82,24 @@ class AggregateGroupPathStrategy(VectorPathStrategy):
     def get_default_dir(self) -> Path:
         return self.get_default_vector_dir()
     def get_default_filename(self, input_paths: List[Path]) -> str:
-        return f"{input_paths[0].stem}_aggre.csv"
\ No newline at end of file
+        return f"{input_paths[0].stem}_aggre.csv"
+
+
+class TransitionMatrixPathStrategy(VectorPathStrategy):
+    """TransitionMatrix工具的路径策略"""
+
+    def get_default_dir(self) -> Path:
+        return self.get_default_vector_dir()
+
+    def get_default_filename(self, input_paths: List[Path]) -> str:
+        return f"{input_paths[0].stem}_transition.csv"
+
+
+class DissolvePathStrategy(VectorPathStrategy):
+    """Dissolve工具的路径策略"""
+
+    def get_default_dir(self) -> Path:
+        return self.get_default_vector_dir()
+
+    def get_default_filename(self, input_paths: List[Path]) -> str:
+        return f"{input_paths[0].stem}_dissolve.shp"
@@ -1,12 +1,52 @@
+import hashlib
+import json
+import re
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import List, Optional, Tuple, Callable
+from typing import Any, Dict, List, Optional, Tuple, Callable
 from tools.strategies.path_strategy import VectorPathStrategy
-from utils.file_handler import ensure_folder_exists, get_unique_filename
+from utils.artifact_store import artifacts_in_use, register_artifact, touch_artifacts
+from utils.content_hash import content_hash
+from utils.file_handler import (
+    discard_placeholder,
+    ensure_folder_exists,
+    get_unique_filename,
+)
+from utils.layer_catalog import get_layer_catalog, record_layer
 from utils.logger import get_logger
+from utils.metrics import tool_context
+from utils.precompress import precompress_artifact
+from utils.profiler import profile_call
+from utils.tool_memo import ToolMemo, get_tool_memo
+from utils.vector_io import layer_components
 
 logger = get_logger("vector_base")
 
+# 写出矢量图层的工具结果登记到图层目录（统计表等 CSV 结果不登记）
+_LAYER_SUFFIXES = (".shp", ".gpkg", ".geojson", ".json", ".fgb")
+
+
+def _normalize(value: Any) -> Any:
+    """将参数规范化为可稳定序列化的形式（路径转字符串、字典按键排序、整数值浮点数转整数）"""
+    if isinstance(value, Path):
+        return str(value)
+    if isinstance(value, dict):
+        return {str(k): _normalize(value[k]) for k in sorted(value, key=str)}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _output_signature(path: str) -> tuple:
+    """输出图层各组成文件的大小和修改时间，文件被删除或改写后与缓存时的签名不一致"""
+    try:
+        stats = [(f.name, f.stat()) for f in layer_components(Path(path))]
+    except OSError:
+        return ()
+    return tuple((name, st.st_size, st.st_mtime_ns) for name, st in stats)
+
 
 class BaseVectorTool(ABC):
     """
@@ -25,11 +65,19 @@ class BaseVectorTool(ABC):
         """
         self.path_strategy = path_strategy
 
+    @property
+    def metrics_name(self) -> str:
+        """指标中的工具标签，如 BufferTool -> buffer"""
+        name = type(self).__name__
+        if name.endswith("Tool"):
+            name = name[: -len("Tool")]
+        return re.sub(r"(?<!^)(?=[A-Z])", "_", name).lower()
+
     def execute(
         self, input_paths: List[Path], save_path: Optional[Path] = None, **kwargs
     ) -> Tuple[str, str]:
         """
-        执行工具的统一流程
+        执行工具的统一流程，各阶段耗时记录在该工具的标签下；开启分析时写出内存分析报告
 
         Args:
             input_paths: 输入文件路径列表
@@ -39,16 +87,120 @@ class BaseVectorTool(ABC):
         Returns:
             Tuple[str, str]: (保存路径, GeoJSON字符串)
         """
+        with tool_context(self.metrics_name), profile_call(self.metrics_name):
+            return self._execute_memoized(input_paths, save_path, **kwargs)
+
+    def _execute_memoized(
+        self, input_paths: List[Path], save_path: Optional[Path] = None, **kwargs
+    ) -> Tuple[str, str]:
+        """
+        带结果缓存的执行
+
+        工具名、参数、指定的保存路径和输入内容都相同，且已有输出未被删除或改写时直接返回已有结果；
+        结果保存在各进程共享的 tool_memo 中，并发的相同调用（包括调度器其他子进程中的调用）只计算一次，
+        其余调用等待该结果。
+        """
+        memo = get_tool_memo()
+        if memo is None:
+            return self._run(input_paths, save_path, **kwargs)
+
+        try:
+            key = self._memo_key(input_paths, save_path, kwargs)
+        except OSError as e:
+            # 输入文件不存在等情况交给核心函数报错
+            logger.debug("无法计算缓存键，跳过结果缓存: %s", e)
+            return self._run(input_paths, save_path, **kwargs)
+
+        cached = self._memo_lookup(memo, key)
+        if cached is not None:
+            return cached
+        with memo.computing(key):
+            # 等待期间其他进程中的相同调用可能已经完成
+            cached = self._memo_lookup(memo, key)
+            if cached is not None:
+                return cached
+            result = self._run(input_paths, save_path, **kwargs)
+            signature = _output_signature(result[0])
+            # 没有可校验的输出文件时不缓存
+            if signature:
+                memo.put(key, *result, signature)
+        return result
+
+    def _memo_lookup(self, memo: ToolMemo, key: str) -> Optional[Tuple[str, str]]:
+        """查询缓存结果，输出已被删除、淘汰或改写时删除该记录并返回 None"""
+        cached = memo.get(key)
+        if cached is None:
+            return None
+        if _output_signature(cached[0]) != cached[2]:
+            memo.delete(key)
+            return None
+        logger.info(f"{type(self).__name__} 参数与输入均未变化，复用已有结果: {cached[0]}")
+        touch_artifacts([cached[0]])
+        return cached[:2]
+
+    def _memo_key(
+        self, input_paths: List[Path], save_path: Optional[Path], kwargs: Dict[str, Any]
+    ) -> str:
+        """
+        结果缓存键：工具名 + 规范化参数 + 指定的保存路径 + 输入图层内容哈希
+
+        指定了保存路径的调用只复用写到同一路径的结果，不会拿到其他位置的输出。
+        """
+        payload = {
+            "tool": type(self).__name__,
+            "inputs": [content_hash(p) for p in input_paths],
+            "save_path": _normalize(save_path),
+            "kwargs": _normalize(kwargs),
+        }
+        data = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.blake2b(data.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _run(
+        self, input_paths: List[Path], save_path: Optional[Path] = None, **kwargs
+    ) -> Tuple[str, str]:
+        """准备保存路径并调用核心业务函数，执行期间输入不会被产物存储淘汰"""
         # 准备保存路径
         prepared_save_path = self._prepare_save_path(input_paths, save_path)
 
         # 调用核心业务函数
-        save_path, geojson = self._execute_core(
-            input_paths, prepared_save_path, **kwargs
-        )
+        with artifacts_in_use(input_paths):
+            try:
+                save_path, geojson = self._execute_core(
+                    input_paths, prepared_save_path, **kwargs
+                )
+            finally:
+                # 执行失败，或结果写到了别处（如旁路模式）时，删除未使用的占位文件
+                discard_placeholder(prepared_save_path)
 
+            self._record_output(Path(save_path), input_paths, kwargs)
         return save_path, geojson
 
+    def _record_output(
+        self, output_path: Path, input_paths: List[Path], kwargs: Dict[str, Any]
+    ):
+        """生成输出的压缩版本并在产物存储中登记，在图层目录中登记输出图层及其来源"""
+        sidecar = any(output_path.resolve() == Path(p).resolve() for p in input_paths)
+        if not sidecar:
+            precompress_artifact(output_path)
+            register_artifact(output_path)
+        if output_path.suffix.lower() not in _LAYER_SUFFIXES:
+            return
+        if sidecar:
+            # 旁路模式只更新了输入图层的属性列，刷新元数据但保留其原有来源
+            catalog = get_layer_catalog()
+            try:
+                if catalog is not None:
+                    catalog.describe(output_path)
+            except Exception as e:
+                logger.warning(f"图层目录刷新失败: {output_path}，{e}")
+            return
+        record_layer(
+            output_path,
+            tool=self.metrics_name,
+            params=_normalize(kwargs),
+            inputs=input_paths,
+        )
+
     def _prepare_save_path(self, input_paths, save_path):
         """统一的路径准备逻辑"""
         if save_path is None:
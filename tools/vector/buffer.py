@@ -2,15 +2,15 @@ import json
 import os
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple, Union
-import geopandas as gpd
-from shapely import make_valid
 from shapely.geometry import shape, mapping
 from tools.vector.base import BaseVectorTool
 from utils.file_handler import ensure_folder_exists
 from utils.crs_validator import CRSValidator
 from utils.file_handler import get_unique_filename
-from utils.geojson_handler import load_geojson, save_geojson
+from utils.geojson_handler import load_geojson, save_geojson, to_geojson
 from utils.logger import get_logger
+from utils.metrics import span
+from utils.vector_io import read_layer, write_vector
 from config.config import ConfigManager
 
 logger = get_logger("buffer_tool")
@@ -63,44 +63,40 @@ def buffer_core(
         )
         DEFAULT_METRIC_CRS = ConfigManager.get("buffer.metric_crs", "EPSG:3857")
 
-        # Step 1. 读取数据
-        gdf = gpd.read_file(input_path)
-        gdf["geometry"] = gdf["geometry"].apply(make_valid)
+        # Step 1. 读取数据（修复几何并投影到输出坐标系，入库时已规范化的图层直接使用）
+        gdf = read_layer(input_path, DEFAULT_OUTPUT_CRS)
 
         # Step 2. 验证输入
         if gdf.empty:
             raise ValueError("输入数据为空。")
-        if not gdf.crs:
-            raise ValueError("输入数据缺少坐标系定义。")
-        gdf = CRSValidator.ensure_projected_crs(gdf, DEFAULT_OUTPUT_CRS)
-        logger.debug(f"已自动将数据重投影为 {DEFAULT_OUTPUT_CRS}。")
 
         # Step 3. 计算缓冲区
         meters = _normalize_unit_to_meters(distance, DEFAULT_DISTANCE_UNIT)
-        if meters != meters:  # NaN => unit was degrees
-            # buffer in degrees directly (no reprojection)
-            gdf["geometry"] = gdf.geometry.buffer(distance)
-            out_gdf = gdf
-        else:
-            # 重投影到度量单位的CRS，进行缓冲后再投影回目标CRS
-            try:
-                gdf_m = gdf.to_crs(DEFAULT_METRIC_CRS)
-                gdf_m["geometry"] = gdf_m.geometry.buffer(meters)
-                out_gdf = gdf_m.to_crs(DEFAULT_OUTPUT_CRS)
-            except Exception as e:
-                logger.warning(f"投影转换失败，尝试在原始CRS中缓冲: {e}")
-                # fallback: try buffering in original CRS if reprojection fails
-                gdf["geometry"] = gdf.geometry.buffer(meters)
+        with span("compute", features=len(gdf)):
+            if meters != meters:  # NaN => unit was degrees
+                # buffer in degrees directly (no reprojection)
+                gdf["geometry"] = gdf.geometry.buffer(distance)
                 out_gdf = gdf
+            else:
+                # 重投影到度量单位的CRS，进行缓冲后再投影回目标CRS（坐标系相同时不转换）
+                try:
+                    gdf_m = CRSValidator.ensure_projected_crs(gdf, DEFAULT_METRIC_CRS)
+                    gdf_m["geometry"] = gdf_m.geometry.buffer(meters)
+                    out_gdf = CRSValidator.ensure_projected_crs(gdf_m, DEFAULT_OUTPUT_CRS)
+                except Exception as e:
+                    logger.warning(f"投影转换失败，尝试在原始CRS中缓冲: {e}")
+                    # fallback: try buffering in original CRS if reprojection fails
+                    gdf["geometry"] = gdf.geometry.buffer(meters)
+                    out_gdf = gdf
 
         logger.info(f"缓冲区处理完成，缓冲距离: {distance} {DEFAULT_DISTANCE_UNIT} 。")
 
         # Step 4. 保存结果
-        out_gdf.to_file(save_path)
+        write_vector(out_gdf, save_path)
         logger.info(f"缓冲区结果已保存到: {save_path}")
 
         # Step 5. 生成可视化的 GeoJSON
-        geojson = out_gdf.to_json()
+        geojson = to_geojson(out_gdf)
 
         return str(save_path), geojson
     except Exception as e:
@@ -0,0 +1,201 @@
+# 按字段融合几何要素工具
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Literal, Optional, Tuple, Union
+import geopandas as gpd
+import numpy as np
+import shapely
+from shapely.errors import GEOSException
+from config.config import ConfigManager
+from tools.vector.base import BaseVectorTool
+from utils.geojson_handler import to_geojson
+from utils.logger import get_logger
+from utils.metrics import span
+from utils.parallel import resolve_workers
+from utils.vector_io import read_layer, write_vector
+
+logger = get_logger("dissolve_tool")
+
+
+def _union_group(geoms: np.ndarray, coverage: bool, tolerance: float):
+    """
+    合并一组几何。coverage 为 True 时先尝试 coverage_union_all（要求组内面要素互不重叠，
+    只需拼接公共边，远快于通用 union），结果面积与各部件面积之和不一致时说明存在重叠，回退到 union_all
+    """
+    if len(geoms) == 1:
+        return geoms[0]
+    if coverage:
+        try:
+            merged = shapely.coverage_union_all(geoms)
+            expected = shapely.area(geoms).sum()
+            if abs(shapely.area(merged) - expected) <= tolerance * max(expected, 1.0):
+                return merged
+        except GEOSException:
+            pass
+    return shapely.union_all(geoms)
+
+
+def _union_groups(
+    groups: List[np.ndarray], coverage: bool, tolerance: float
+) -> List[object]:
+    """合并多组几何，可在子进程中执行"""
+    return [_union_group(geoms, coverage, tolerance) for geoms in groups]
+
+
+def _chunk_groups(sizes: np.ndarray, chunk_size: int) -> List[List[int]]:
+    """按要素数把相邻分组打包成大小相近的任务，减少进程间调度开销"""
+    chunks, current, count = [], [], 0
+    for i, size in enumerate(sizes):
+        current.append(i)
+        count += size
+        if count >= chunk_size:
+            chunks.append(current)
+            current, count = [], 0
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def dissolve_core(
+    input_path: Path,
+    by: Union[str, List[str]],
+    aggfunc: Optional[Union[str, Dict[str, Union[str, List[str]]]]] = "first",
+    target_crs: str = None,
+    coverage: Literal["auto", "always", "never"] = "auto",
+    workers: int = None,
+    save_path: Path = None,
+) -> Tuple[str, str]:
+    """
+    按一个或多个字段融合几何，并同时汇总属性
+
+    1. 按分组字段排序，得到每组连续的几何数组
+    2. 每组分别合并：面要素优先使用 coverage_union_all，存在重叠时回退到 union_all
+    3. 要素数超过阈值时，各组合并任务在进程池中并行执行
+    4. 属性按 aggfunc 一次分组汇总
+
+    Args:
+        input_path (Path): 输入矢量文件路径
+        by (str | List[str]): 分组字段，如 "county" 或 ["county", "crop"]
+        aggfunc (str | Dict, optional): 其余字段的汇总方式。字符串时作用于所有字段（默认"first"）；
+            字典时为 字段 -> 统计量或统计量列表，如 {"area": ["sum", "mean"], "FID_1": "count"}，
+            列表形式的结果字段名为 {字段}_{统计量}
+        target_crs (str, optional): 目标坐标系，默认从配置获取或使用EPSG:3857
+        coverage (Literal["auto", "always", "never"]): 是否使用 coverage union 快速路径。
+            "auto" 只对面要素使用并检查面积，"never" 始终使用通用 union
+        workers (int, optional): 并行进程数，默认从配置获取或使用4，在任务调度器子进程中固定为1
+        save_path (Path): 保存路径
+
+    Returns:
+        Tuple[str, str]: 保存路径和GeoJSON格式的结果
+
+    Raises:
+        ValueError: 当输入数据为空、缺少坐标系或分组字段不存在时
+    """
+    try:
+        by = [by] if isinstance(by, str) else list(by or [])
+        if not by:
+            raise ValueError("至少需要一个分组字段。")
+        if coverage not in ("auto", "always", "never"):
+            raise ValueError("coverage 只能是 'auto'、'always' 或 'never'")
+        DEFAULT_OUTPUT_CRS = target_crs or ConfigManager.get("project_crs", "EPSG:3857")
+        workers = resolve_workers(workers, "dissolve.workers", 4)
+        threshold = ConfigManager.get("dissolve.parallel_threshold", 50000)
+        tolerance = ConfigManager.get("dissolve.coverage_tolerance", 1e-6)
+
+        # Step 1. 读取数据
+        gdf = read_layer(input_path, DEFAULT_OUTPUT_CRS)
+        if gdf.empty:
+            raise ValueError("输入数据为空。")
+        missing = [f for f in by if f not in gdf.columns]
+        if missing:
+            raise ValueError(f"分组字段不存在：{missing}")
+
+        # Step 2. 按分组排序，每组几何在数组中连续
+        codes = gdf.groupby(by, sort=True, dropna=False).ngroup().to_numpy()
+        order = np.argsort(codes, kind="stable")
+        geoms = gdf.geometry.to_numpy()[order]
+        sizes = np.bincount(codes, minlength=codes.max() + 1)
+        groups = np.split(geoms, np.cumsum(sizes)[:-1])
+
+        polygonal = bool(np.isin(shapely.get_type_id(geoms), (3, 6)).all())
+        use_coverage = coverage == "always" or (coverage == "auto" and polygonal)
+        logger.info(
+            f"开始融合: {len(gdf)} 个要素，{len(groups)} 组，coverage union: {use_coverage}"
+        )
+
+        # Step 3. 逐组合并，要素数较多时并行
+        with span("compute", features=len(gdf)):
+            if workers > 1 and len(gdf) >= threshold and len(groups) > 1:
+                chunks = _chunk_groups(sizes, max(len(gdf) // (workers * 4), 1))
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    futures = [
+                        executor.submit(
+                            _union_groups,
+                            [groups[i] for i in chunk],
+                            use_coverage,
+                            tolerance,
+                        )
+                        for chunk in chunks
+                    ]
+                    merged = [g for future in futures for g in future.result()]
+            else:
+                merged = _union_groups(groups, use_coverage, tolerance)
+
+        # Step 4. 汇总属性（与 ngroup 使用相同的分组顺序）
+        attrs = gdf.drop(columns=gdf.geometry.name)
+        others = [c for c in attrs.columns if c not in by]
+        grouped = attrs.groupby(by, sort=True, dropna=False)
+        if isinstance(aggfunc, dict):
+            named = {}
+            for field, funcs in aggfunc.items():
+                if field not in attrs.columns:
+                    raise ValueError(f"汇总字段 '{field}' 不存在。")
+                if isinstance(funcs, str):
+                    named[field] = (field, funcs)
+                else:
+                    named.update({f"{field}_{func}": (field, func) for func in funcs})
+            table = grouped.agg(**named) if named else grouped.size().to_frame("count")
+        else:
+            table = (
+                grouped[others].agg(aggfunc or "first")
+                if others
+                else grouped.size().to_frame("count")
+            )
+
+        result = gpd.GeoDataFrame(table.reset_index(), geometry=merged, crs=gdf.crs)
+        logger.debug("融合完成，共%s个要素", len(result))
+
+        # Step 5. 保存结果
+        write_vector(result, save_path)
+        logger.info(f"融合结果已保存到: {save_path}")
+
+        return str(save_path), to_geojson(result)
+    except Exception as e:
+        logger.error(f"融合处理失败: {e}")
+        raise
+
+
+# ===== 新增：DissolveTool 类 =====
+class DissolveTool(BaseVectorTool):
+    """Dissolve工具类，封装路径管理和业务逻辑调用"""
+
+    def _execute_core(
+        self, input_paths: List[Path], save_path: Path, **kwargs
+    ) -> Tuple[str, str]:
+        """
+        调用 dissolve_core 函数
+
+        Args:
+            input_paths: 输入路径列表（dissolve只需要第一个）
+            save_path: 已准备好的保存路径
+            **kwargs: by, aggfunc, target_crs 等参数
+        """
+        return dissolve_core(
+            input_path=input_paths[0],
+            by=kwargs.get("by"),
+            aggfunc=kwargs.get("aggfunc", "first"),
+            target_crs=kwargs.get("target_crs", None),
+            coverage=kwargs.get("coverage", "auto"),
+            workers=kwargs.get("workers", None),
+            save_path=save_path,
+        )
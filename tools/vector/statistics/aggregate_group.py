@@ -1,15 +1,162 @@
 # 分组统计几何要素工具
-import json
 from pathlib import Path
-from typing import List, Literal, Tuple
-import geopandas as gpd
+from typing import Dict, List, Literal, Optional, Tuple
+import pandas as pd
 from config.config import ConfigManager
 from tools.vector.base import BaseVectorTool
-from utils.crs_validator import CRSValidator
+from tools.vector.statistics.calculate_geo import AREA_UNIT_FACTORS, LENGTH_UNIT_FACTORS
+from tools.vector.statistics.streaming_aggregate import (
+    PERCENTILE_PATTERN,
+    streaming_grouped_stats,
+)
+from utils.file_handler import discard_placeholder, get_unique_filename
+from utils.geojson_handler import attributes_to_geojson
+from utils.layer_catalog import describe_layer
+from utils.content_hash import content_hash
 from utils.logger import get_logger
+from utils.metrics import span
+from utils.parallel import resolve_workers
+from utils.summary_cache import get_summary_cache
+from utils.vector_io import read_vector
 
 logger = get_logger("aggregate_group")
 
+# pandas groupby 原生支持的统计量
+_BASIC_STATS = {"sum", "count", "mean", "min", "max", "median", "std"}
+# 流式模式下结果精确的统计量
+_EXACT_STATS = {"sum", "count", "mean", "min", "max", "std"}
+
+
+def _validate_stats(stats: Dict[str, List[str]]):
+    for field, names in stats.items():
+        for name in names:
+            if name not in _BASIC_STATS and not PERCENTILE_PATTERN.fullmatch(name):
+                raise ValueError(
+                    f"字段 '{field}' 的统计量 '{name}' 无效，可选: {sorted(_BASIC_STATS)} 或 p1~p99"
+                )
+
+
+def _grouped_stats(
+    df: pd.DataFrame,
+    group_fields: List[str],
+    stats: Dict[str, List[str]],
+    dropna: bool = True,
+) -> pd.DataFrame:
+    """
+    使用分类分组键一次分组计算所有字段的所有统计量，结果列名为 {字段}_{统计量}
+
+    dropna=False 时分组字段为空的要素单独成组（写入统计缓存的表需要保留，粗分组上卷时才不会漏掉这些要素）
+    """
+    for key in group_fields:
+        df[key] = df[key].astype("category")
+    grouped = df.groupby(group_fields, observed=True, sort=True, dropna=dropna)
+
+    named = {
+        f"{field}_{name}": (field, name)
+        for field, names in stats.items()
+        for name in names
+        if name in _BASIC_STATS
+    }
+    result = grouped.agg(**named) if named else grouped.size().to_frame("_size")
+
+    for field, names in stats.items():
+        for name in names:
+            match = PERCENTILE_PATTERN.fullmatch(name)
+            if match:
+                q = float(match.group(1)) / 100
+                result[f"{field}_{name}"] = grouped[field].quantile(q)
+
+    ordered = [f"{field}_{name}" for field, names in stats.items() for name in names]
+    return result[ordered].reset_index()
+
+
+def _write_table(
+    table: pd.DataFrame,
+    output_path: Path,
+    output_format: str,
+    group_fields: List[str],
+) -> Tuple[Path, pd.DataFrame]:
+    """按输出格式写出统计表，返回实际保存路径和写出的表"""
+    if output_format == "parquet":
+        output_path = Path(output_path)
+        if output_path.suffix.lower() != ".parquet":
+            # 路径策略预留的是 .csv 占位文件：另行分配不重名的 .parquet 文件名，避免覆盖已有文件
+            placeholder = output_path
+            output_path = get_unique_filename(
+                output_path.parent, output_path.stem + ".parquet"
+            )
+            discard_placeholder(placeholder)
+        try:
+            table.to_parquet(output_path, index=False)
+        except ImportError as e:
+            discard_placeholder(output_path)
+            raise ValueError(f"输出 Parquet 需要安装 pyarrow: {e}")
+        except Exception:
+            discard_placeholder(output_path)
+            raise
+        return output_path, table
+
+    if output_format == "pivot":
+        # 透视表：最后一个分组字段展开为列
+        if len(group_fields) < 2:
+            raise ValueError("pivot 输出至少需要两个分组字段。")
+        index, column = group_fields[:-1], group_fields[-1]
+        values = [c for c in table.columns if c not in group_fields]
+        table = table.pivot(index=index, columns=column, values=values)
+        table.columns = [f"{stat}_{value}" for stat, value in table.columns]
+        table = table.reset_index()
+
+    with span("write", features=len(table)):
+        table.to_csv(output_path, index=False, encoding="utf-8-sig")
+    return output_path, table
+
+
+def _compute_table(
+    input_path: Path,
+    group_fields: List[str],
+    stats: Dict[str, List[str]],
+    streaming: bool,
+    batch_size: int,
+    workers: int,
+) -> pd.DataFrame:
+    """读取图层并计算分组统计表（原始单位），分组字段为空的要素单独成组"""
+    # 按图层目录中的字段信息校验，无需读取图层
+    info = describe_layer(input_path)
+    if info["feature_count"] == 0:
+        raise ValueError("输入数据为空。")
+
+    for key in group_fields:
+        if key not in info["columns"]:
+            raise ValueError(f"分组字段 '{key}' 不存在。")
+
+    # 检查计算字段是否存在
+    for field in stats:
+        if field not in info["columns"]:
+            raise ValueError(
+                f"计算字段 '{field}' 不存在。请先使用 calculate_geo 工具计算几何属性。"
+            )
+
+    if streaming:
+        # 分批读取，合并可合并的部分聚合结果（含分批读取耗时）
+        with span("compute"):
+            return streaming_grouped_stats(
+                input_path,
+                group_fields,
+                stats,
+                batch_size=batch_size
+                or ConfigManager.get("aggregate.batch_size", 100000),
+                workers=resolve_workers(workers, "aggregate.workers", 1),
+                dropna=False,
+            )
+    # 只读取分组字段和统计字段，跳过几何解码与重投影（汇总的是已计算好的字段值，与坐标系无关）
+    logger.info(f"开始读取数据: {input_path}")
+    columns = list(dict.fromkeys(group_fields + list(stats)))
+    df = read_vector(input_path, columns=columns, ignore_geometry=True)
+
+    # 一次分组计算所有统计量
+    with span("compute", features=len(df)):
+        return _grouped_stats(df, group_fields, stats, dropna=False)
+
 
 def aggregate_core(
     input_path: Path,
@@ -20,19 +167,36 @@ def aggregate_core(
     area_unit: Literal["m2", "km2", "mu"] = "m2",
     length_unit: Literal["m", "km"] = "m",
     output_path: Path = None,
+    group_fields: Optional[List[str]] = None,
+    stats: Optional[Dict[str, List[str]]] = None,
+    output_format: Literal["csv", "parquet", "pivot"] = "csv",
+    streaming: bool = False,
+    batch_size: int = None,
+    workers: int = None,
 ):
     """
     按字段汇总几何统计结果
 
+    同一图层内容的统计表缓存在 summary_cache 中，重复查询、换单位或可由细分组上卷的查询不再读取图层。
+
     Args:
         input_path (Path): 输入矢量文件路径
         mode (Literal["area", "length"]): 统计模式，"area"表示面积，"length"表示长度
         group_field (str): 分组字段名
         field_name (str, optional): 计算结果字段名称，默认使用mode值
-        target_crs (str, optional): 目标坐标系，默认从配置获取或使用EPSG:3857
+        target_crs (str, optional): 保留参数，仅汇总已计算的字段值，不再重投影
         area_unit (Literal["m2", "km2", "mu"]): 面积单位，默认为"m2"
         length_unit (Literal["m", "km"]): 长度单位，默认为"m"
         output_path (Path, optional): 保存路径，默认使用配置的默认路径。
+        group_fields (List[str], optional): 多个分组字段，如 ["county", "crop", "changed"]，提供时忽略 group_field
+        stats (Dict[str, List[str]], optional): 字段 -> 统计量列表，如 {"area": ["sum", "mean", "p90"], "FID_1": ["count"]}。
+            支持 sum、count、mean、min、max、median、std 及百分位数 p1~p99，默认为 {field_name: ["sum"]}。
+            面积/长度单位换算只作用于 field_name 字段（count 除外）
+        output_format (Literal["csv", "parquet", "pivot"]): 输出格式，pivot 为以最后一个分组字段展开列的 CSV
+        streaming (bool): 是否按批流式读取并合并部分聚合结果，内存占用与图层大小无关，
+            此时 median 与百分位数为近似值，默认为False
+        batch_size (int, optional): 流式模式每批要素数，默认从配置获取或使用100000
+        workers (int, optional): 流式模式并行进程数，默认从配置获取或使用1，在任务调度器子进程中固定为1
 
     Returns:
         Tuple[str, str]: 处理后数据的保存路径和可视化的 GeoJSON。
@@ -43,68 +207,61 @@ def aggregate_core(
     # 参数验证
     if mode not in ["area", "length"]:
         raise ValueError("mode 只能是 'area' 或 'length'")
+    if output_format not in ("csv", "parquet", "pivot"):
+        raise ValueError("output_format 只能是 'csv'、'parquet' 或 'pivot'")
 
-    # 读取数据
-    logger.info(f"开始读取数据: {input_path}")
-    gdf = gpd.read_file(input_path)
-    if gdf.empty:
-        raise ValueError("输入数据为空。")
-
-    group_field = group_field or mode.lower()
-    if group_field not in gdf.columns:
-        raise ValueError(f"分组字段 '{group_field}' 不存在。")
-
-    # 坐标系验证和转换
-    DEFAULT_OUTPUT_CRS = target_crs or ConfigManager.get("project_crs", "EPSG:3857")
-    gdf = CRSValidator.ensure_projected_crs(gdf, DEFAULT_OUTPUT_CRS)
-
-    # 检查计算字段是否存在
+    group_fields = group_fields or [group_field or mode.lower()]
     field_name = field_name or mode.lower()
-    if field_name not in gdf.columns:
-        raise ValueError(
-            f"计算字段 '{field_name}' 不存在。请先使用 calculate_geo 工具计算几何属性。"
+    stats = stats or {field_name: ["sum"]}
+    _validate_stats(stats)
+
+    # 命中物化缓存时直接使用缓存的统计表（原始单位），不再读取图层
+    cache = get_summary_cache()
+    layer_hash = content_hash(input_path) if cache is not None else None
+    table = cache.get(layer_hash, group_fields, stats) if cache is not None else None
+    if table is not None:
+        logger.info(f"命中统计缓存: {input_path}，分组: {group_fields}")
+    else:
+        # 顺带计算 sum/count，便于之后的 mean 查询和粗分组查询从缓存上卷
+        computed = {
+            field: list(dict.fromkeys(names + ["sum", "count"]))
+            for field, names in stats.items()
+        }
+        table = _compute_table(
+            input_path, group_fields, computed, streaming, batch_size, workers
         )
+        if cache is not None:
+            # 流式模式的中位数/百分位数为近似值，不写入缓存
+            exact = {
+                field: [n for n in names if not streaming or n in _EXACT_STATS]
+                for field, names in computed.items()
+            }
+            cache.put(input_path, layer_hash, group_fields, exact, table)
+        ordered = [f"{field}_{name}" for field, names in stats.items() for name in names]
+        # 缓存中保留分组字段为空的组，输出时与 groupby 默认行为一致去掉
+        table = table[group_fields + ordered].dropna(subset=group_fields)
+        table = table.reset_index(drop=True)
 
-    # 聚合
-    df_sum = (
-        gdf.groupby(group_field)[field_name]
-        .sum()
-        .reset_index()
-        .rename(columns={field_name: f"{field_name}_sum"})
+    # 单位换算（在缓存之后进行，不同单位的查询共用同一份缓存）
+    factor = (
+        AREA_UNIT_FACTORS.get(area_unit, 1.0)
+        if mode == "area"
+        else LENGTH_UNIT_FACTORS.get(length_unit, 1.0)
     )
+    if factor != 1.0 and field_name in stats:
+        for name in stats[field_name]:
+            if name != "count":
+                table[f"{field_name}_{name}"] /= factor
 
-    # 单位换算
-    result_unit = area_unit if mode == "area" else length_unit
-    if mode == "area":
-        if result_unit == "km2":
-            df_sum[f"{field_name}_sum"] /= 1e6
-        elif result_unit == "mu":
-            df_sum[f"{field_name}_sum"] /= 666.6667
-    elif mode == "length":
-        if result_unit == "km":
-            df_sum[f"{field_name}_sum"] /= 1000
-
-    
-    # 优化：后期要保存成表，shp输出就做融合（dissolve工具）
-    df_sum.to_csv(output_path, index=False, encoding="utf-8-sig")
-    logger.debug(f"分组统计{mode}完成，结果保存到: {output_path}")
-    
-    # 构造轻量级 GeoJSON（无 geometry，仅 properties）
-    geojson = {
-        "type": "FeatureCollection",
-        "features": [
-            {
-                "type": "Feature",
-                "geometry": None,  # 占位，方便未来扩展
-                "properties": row.to_dict()
-            }
-            for _, row in df_sum.iterrows()
-        ]
-    }
+    # 只输出统计表；需要带几何的汇总结果时使用 dissolve 工具
+    output_path, table = _write_table(table, output_path, output_format, group_fields)
+    logger.debug("分组统计%s完成，共%s组，结果保存到: %s", mode, len(table), output_path)
 
-    geojson_str = json.dumps(geojson, ensure_ascii=False, indent=2)
+    # 构造轻量级 GeoJSON（无 geometry，仅 properties）
+    geojson_str = attributes_to_geojson(table)
     return str(output_path), geojson_str
 
+
 # ===== 新增：AggregateGroupTool 类 =====
 class AggregateGroupTool(BaseVectorTool):
     def _execute_core(
@@ -130,4 +287,10 @@ class AggregateGroupTool(BaseVectorTool):
             target_crs=target_crs,
             area_unit=area_unit,
             length_unit=length_unit,
-        )
\ No newline at end of file
+            group_fields=kwargs.get("group_fields", None),
+            stats=kwargs.get("stats", None),
+            output_format=kwargs.get("output_format", "csv"),
+            streaming=kwargs.get("streaming", False),
+            batch_size=kwargs.get("batch_size", None),
+            workers=kwargs.get("workers", None),
+        )
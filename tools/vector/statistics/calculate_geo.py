@@ -1,117 +1,260 @@
 from pathlib import Path
-from typing import List, Literal, Tuple
-import geopandas as gpd
+from typing import Any, Dict, List, Literal, Optional, Tuple
+import numpy as np
 import pandas as pd
-from shapely import make_valid
+import shapely
 from config.config import ConfigManager
 from tools.vector.base import BaseVectorTool
-from utils.crs_validator import CRSValidator
+from utils.geodesic import geodesic_measures
 from utils.logger import get_logger
+from utils.geojson_handler import attributes_to_geojson, to_geojson
+from utils.layer_catalog import describe_layer
+from utils.metrics import span
+from utils.vector_io import read_layer, write_sidecar, write_vector
 
 logger = get_logger("change_analyze")
 
 
-def calculate_core(
+# 单位换算系数（投影坐标系下以米为基本单位）
+AREA_UNIT_FACTORS = {"m2": 1.0, "km2": 1e6, "mu": 666.6667, "ha": 1e4}
+LENGTH_UNIT_FACTORS = {"m": 1.0, "km": 1000.0}
+
+# 指标 -> (默认字段名, 单位类型, 适用的几何类型)
+# 字段名不超过10个字符，满足 shapefile 字段名长度限制
+METRICS = {
+    "area": ("area", "area", ("Polygon", "MultiPolygon")),
+    "perimeter": ("perimeter", "length", ("Polygon", "MultiPolygon")),
+    "length": ("length", "length", ("LineString", "MultiLineString")),
+    "centroid_x": ("centroid_x", None, None),
+    "centroid_y": ("centroid_y", None, None),
+    "vertex_count": ("vertex_cnt", None, None),
+    "bbox": (("bbox_minx", "bbox_miny", "bbox_maxx", "bbox_maxy"), None, None),
+    "compactness": ("compact", None, ("Polygon", "MultiPolygon")),
+}
+
+
+def _resolve_unit(metric: str, unit: Optional[str]) -> Optional[str]:
+    """校验指标单位，未指定时使用基本单位"""
+    unit_kind = METRICS[metric][1]
+    if unit_kind == "area":
+        unit = unit or "m2"
+        if unit not in AREA_UNIT_FACTORS:
+            raise ValueError(f"不支持的面积单位: {unit}")
+    elif unit_kind == "length":
+        unit = unit or "m"
+        if unit not in LENGTH_UNIT_FACTORS:
+            raise ValueError(f"不支持的长度单位: {unit}")
+    return unit
+
+
+def _resolve_fields(metric: str, name: Any) -> Tuple[str, ...]:
+    """校验指标的输出字段名，统一返回字段名元组（bbox 为四个，其余为一个）"""
+    default = METRICS[metric][0]
+    if not name:
+        return default if isinstance(default, tuple) else (default,)
+    if metric == "bbox":
+        if isinstance(name, str) or len(name) != 4:
+            raise ValueError(
+                "bbox 的字段名需为包含四个字段名的列表（minx, miny, maxx, maxy）"
+            )
+        names = tuple(name)
+    else:
+        names = (name,)
+    invalid = [n for n in names if not isinstance(n, str) or not n]
+    if invalid:
+        raise ValueError(f"{metric} 的字段名无效: {invalid}")
+    return names
+
+
+def _check_geometry_types(metrics, geom_types):
+    """检查几何类型是否适用于各计算指标"""
+    logger.debug("检测到几何类型: %s", geom_types)
+    for metric in metrics:
+        allowed = METRICS[metric][2]
+        if allowed and not any(g in allowed for g in geom_types):
+            if "Polygon" in allowed:
+                raise TypeError(f"当前数据不是面要素，无法计算{metric}。")
+            raise TypeError(f"当前数据不是线要素，无法计算{metric}。")
+
+
+def _compute_metrics(
+    geoms: np.ndarray,
+    metrics: Dict[str, Optional[str]],
+    field_names: Dict[str, Tuple[str, ...]],
+    geodesic_crs=None,
+) -> Dict[str, np.ndarray]:
+    """
+    使用 shapely 向量化函数一次计算所有指标，返回 字段名 -> 结果数组
+
+    指定 geodesic_crs 时面积、周长、长度按椭球计算（单位为米），其余指标使用原始坐标
+    """
+    results = {}
+    # 面积与周长可能被多个指标复用，只计算一次
+    need_area = bool({"area", "compactness"} & metrics.keys())
+    need_length = bool({"perimeter", "length", "compactness"} & metrics.keys())
+    if geodesic_crs is not None:
+        area, length = geodesic_measures(
+            geoms, geodesic_crs, need_area=need_area, need_length=need_length
+        )
+    else:
+        area = shapely.area(geoms) if need_area else None
+        length = shapely.length(geoms) if need_length else None
+    centroids = (
+        shapely.centroid(geoms) if {"centroid_x", "centroid_y"} & metrics.keys() else None
+    )
+
+    for metric, unit in metrics.items():
+        field = field_names[metric][0]
+        if metric == "area":
+            results[field] = area / AREA_UNIT_FACTORS[unit]
+        elif metric in ("perimeter", "length"):
+            results[field] = length / LENGTH_UNIT_FACTORS[unit]
+        elif metric == "centroid_x":
+            results[field] = shapely.get_x(centroids)
+        elif metric == "centroid_y":
+            results[field] = shapely.get_y(centroids)
+        elif metric == "vertex_count":
+            results[field] = shapely.get_num_coordinates(geoms)
+        elif metric == "bbox":
+            bounds = shapely.bounds(geoms)
+            for i, bbox_field in enumerate(field_names[metric]):
+                results[bbox_field] = bounds[:, i]
+        elif metric == "compactness":
+            # Polsby-Popper 紧凑度：4πA/P²，圆为1
+            with np.errstate(divide="ignore", invalid="ignore"):
+                results[field] = np.where(
+                    length > 0, 4 * np.pi * area / length**2, np.nan
+                )
+    return results
+
+
+def calculate_metrics_core(
     input_path: Path,
     output_path: Path,
-    mode: Literal["area", "length"],
+    metrics: Dict[str, Optional[str]],
     target_crs: str = None,
-    field_name: str = None,
+    field_names: Optional[Dict[str, Any]] = None,
     overwrite: bool = True,
-    area_unit: Literal["m2", "km2", "mu"] = "m2",
-    length_unit: Literal["m", "km"] = "m",
+    geodesic: bool = False,
+    write_mode: Literal["file", "sidecar"] = "file",
 ):
     """
-    计算矢量数据的几何属性（面积或长度）
+    一次读写计算多个几何属性
 
     Args:
         input_path (Path): 输入矢量文件路径
         output_path (Path): 输出矢量文件路径
-        mode (Literal["area", "length"]): 计算模式，"area"表示面积，"length"表示长度
+        metrics (Dict[str, Optional[str]]): 指标 -> 单位，如 {"area": "mu", "perimeter": "km", "compactness": None}。
+            支持 area（m2/km2/mu/ha）、perimeter（m/km）、length（m/km）、centroid_x、centroid_y、
+            vertex_count、bbox、compactness，单位为空时使用基本单位
         target_crs (str, optional): 目标坐标系，默认从配置获取或使用EPSG:3857
-        field_name (str, optional): 存储计算结果的字段名称，默认使用mode值
+        field_names (Dict[str, Any], optional): 指标 -> 字段名，默认使用 METRICS 中的字段名；
+            bbox 对应四个字段名组成的列表
         overwrite (bool, optional): 是否覆盖已存在的字段，默认为True
-        area_unit (Literal["m2", "km2", "mu"]): 面积单位，默认为"m2"
-        length_unit (Literal["m", "km"]): 长度单位，默认为"m"
+        geodesic (bool, optional): 是否按椭球计算面积、周长与长度。开启后不重投影图层，
+            直接基于原始坐标分批计算，避免 Web Mercator 的面积变形，默认为False
+        write_mode (Literal["file", "sidecar"]): 结果写出方式。"file" 重写完整图层到 output_path；
+            "sidecar" 只把新字段写入与输入图层关联的 *.attrs.csv，不复制几何，
+            下游工具通过 read_vector 自动读取，此时返回输入图层路径和仅含属性的 GeoJSON
 
     Returns:
         tuple: (保存路径, GeoJSON字符串)
 
     Raises:
-        ValueError: 当输入数据为空或mode参数无效时
-        TypeError: 当几何类型与计算模式不匹配时
+        ValueError: 当输入数据为空、指标或单位无效时
+        TypeError: 当几何类型与计算指标不匹配时
         Exception: 其他未预期的错误
     """
     try:
         # 获取默认参数
         DEFAULT_OUTPUT_CRS = target_crs or ConfigManager.get("project_crs", "EPSG:3857")
-        field_name = field_name or mode.lower()
 
         # 参数验证
-        if mode not in ["area", "length"]:
-            raise ValueError("mode 只能是 'area' 或 'length'")
+        if not metrics:
+            raise ValueError("至少需要指定一个计算指标。")
+        if write_mode not in ("file", "sidecar"):
+            raise ValueError("write_mode 只能是 'file' 或 'sidecar'")
+        unknown = [m for m in metrics if m not in METRICS]
+        if unknown:
+            raise ValueError(f"不支持的计算指标: {unknown}，可选: {list(METRICS)}")
+        metrics = {m: _resolve_unit(m, unit) for m, unit in metrics.items()}
+        field_names = {
+            m: _resolve_fields(m, (field_names or {}).get(m)) for m in metrics
+        }
+
+        # 按图层目录中的元数据校验，不满足时无需读取图层
+        info = describe_layer(input_path)
+        if info["feature_count"] == 0:
+            raise ValueError("输入数据为空。")
+        if not info["crs"]:
+            raise ValueError("输入数据缺少坐标系定义。")
+        if info["geometry_types"]:
+            _check_geometry_types(metrics, info["geometry_types"])
 
         # 读取数据
         logger.info(f"开始读取数据: {input_path}")
-        gdf = gpd.read_file(input_path)
+        # 旁路模式且覆盖已有字段时，只需要几何，不解码属性
+        columns = [] if write_mode == "sidecar" and overwrite else None
+        # 修复几何并投影到目标坐标系，测地线模式直接使用原始坐标；入库时已规范化的图层直接使用
+        gdf = read_layer(
+            input_path, None if geodesic else DEFAULT_OUTPUT_CRS, columns=columns
+        )
 
         if gdf.empty:
             raise ValueError("输入数据为空。")
 
-        if not gdf.crs:
-            raise ValueError("输入数据缺少坐标系定义。")
-
-        # 修复几何图形
-        gdf["geometry"] = gdf["geometry"].apply(make_valid)
-
         # 检查字段是否已存在且不需要覆盖
-        if not overwrite and field_name in gdf.columns:
-            logger.warning(f"字段 '{field_name}' 已存在，且未设置覆盖，跳过计算。")
-            save_path = gdf.to_file(output_path)
-            geojson = gdf.to_json()
-            return str(save_path), geojson
-
-        # 坐标系验证和转换
-        gdf = CRSValidator.ensure_projected_crs(gdf, DEFAULT_OUTPUT_CRS)
-        logger.debug(f"已自动将数据重投影为 {DEFAULT_OUTPUT_CRS}。")
-
-        # 几何类型检查
-        geom_types = gdf.geometry.geom_type.unique()
-        logger.debug(f"检测到几何类型: {geom_types}")
-
-        if mode == "area" and not any(
-            g in ["Polygon", "MultiPolygon"] for g in geom_types
-        ):
-            raise TypeError("当前数据不是面要素，无法计算面积。")
-        if mode == "length" and not any(
-            g in ["LineString", "MultiLineString"] for g in geom_types
-        ):
-            raise TypeError("当前数据不是线要素，无法计算长度。")
+        if not overwrite:
+            # bbox 的四个字段都已存在时才跳过
+            existing = [
+                m
+                for m, names in field_names.items()
+                if all(name in gdf.columns for name in names)
+            ]
+            for m in existing:
+                logger.warning(
+                    f"字段 '{', '.join(field_names[m])}' 已存在，且未设置覆盖，跳过计算。"
+                )
+                metrics.pop(m)
+            if not metrics:
+                if write_mode == "sidecar":
+                    return str(input_path), attributes_to_geojson(
+                        pd.DataFrame(gdf.drop(columns=gdf.geometry.name))
+                    )
+                write_vector(gdf, output_path)
+                geojson = to_geojson(gdf)
+                return str(output_path), geojson
+
+        # 目录中没有具体几何类型（如混合类型图层）时按实际数据检查
+        if not info["geometry_types"]:
+            _check_geometry_types(metrics, gdf.geometry.geom_type.unique())
 
         # 执行计算
-        if mode == "area":
-            gdf[field_name] = gdf.geometry.area
-            # 单位转换
-            if area_unit == "km2":
-                gdf[field_name] /= 1e6
-            elif area_unit == "mu":
-                gdf[field_name] /= 666.6667
-            logger.info(
-                f"成功计算面积（单位：{area_unit}），结果存储在字段 '{field_name}' 中"
-            )
-        elif mode == "length":
-            gdf[field_name] = gdf.geometry.length
-            # 单位转换
-            if length_unit == "km":
-                gdf[field_name] /= 1000
-            logger.info(
-                f"成功计算长度（单位：{length_unit}），结果存储在字段 '{field_name}' 中"
+        with span("compute", features=len(gdf)):
+            results = _compute_metrics(
+                gdf.geometry.to_numpy(),
+                metrics,
+                field_names,
+                geodesic_crs=gdf.crs if geodesic else None,
             )
+        logger.info(
+            f"成功计算指标 {metrics}，结果存储在字段 {list(results)} 中，共 {len(gdf)} 条记录。"
+        )
 
-        logger.debug(f"字段 '{field_name}' 计算完成，共 {len(gdf)} 条记录。")
-        gdf.to_file(output_path)
-        logger.info(f"计算{mode}完成，保存路径: {output_path}")
-        geojson = gdf.to_json()
+        # 旁路模式：只写新增属性列，不重写几何
+        if write_mode == "sidecar":
+            attrs = pd.DataFrame(results)
+            units = {field_names[m][0]: unit for m, unit in metrics.items() if unit}
+            sidecar_path = write_sidecar(input_path, attrs, units)
+            logger.info(f"计算{list(metrics)}完成，属性已写入旁路文件: {sidecar_path}")
+            return str(input_path), attributes_to_geojson(attrs)
+
+        for field, values in results.items():
+            gdf[field] = values
+
+        write_vector(gdf, output_path)
+        logger.info(f"计算{list(metrics)}完成，保存路径: {output_path}")
+        geojson = to_geojson(gdf)
         return str(output_path), geojson
 
     except FileNotFoundError:
@@ -128,6 +271,57 @@ def calculate_core(
         raise
 
 
+def calculate_core(
+    input_path: Path,
+    output_path: Path,
+    mode: Literal["area", "length"],
+    target_crs: str = None,
+    field_name: str = None,
+    overwrite: bool = True,
+    area_unit: Literal["m2", "km2", "mu"] = "m2",
+    length_unit: Literal["m", "km"] = "m",
+    geodesic: bool = False,
+    write_mode: Literal["file", "sidecar"] = "file",
+):
+    """
+    计算矢量数据的几何属性（面积或长度）
+
+    Args:
+        input_path (Path): 输入矢量文件路径
+        output_path (Path): 输出矢量文件路径
+        mode (Literal["area", "length"]): 计算模式，"area"表示面积，"length"表示长度
+        target_crs (str, optional): 目标坐标系，默认从配置获取或使用EPSG:3857
+        field_name (str, optional): 存储计算结果的字段名称，默认使用mode值
+        overwrite (bool, optional): 是否覆盖已存在的字段，默认为True
+        area_unit (Literal["m2", "km2", "mu"]): 面积单位，默认为"m2"
+        length_unit (Literal["m", "km"]): 长度单位，默认为"m"
+        geodesic (bool, optional): 是否按椭球计算，不重投影图层，默认为False
+        write_mode (Literal["file", "sidecar"]): "sidecar" 时只把结果字段写入输入图层的旁路属性文件
+
+    Returns:
+        tuple: (保存路径, GeoJSON字符串)
+
+    Raises:
+        ValueError: 当输入数据为空或mode参数无效时
+        TypeError: 当几何类型与计算模式不匹配时
+        Exception: 其他未预期的错误
+    """
+    # 参数验证
+    if mode not in ["area", "length"]:
+        raise ValueError("mode 只能是 'area' 或 'length'")
+
+    return calculate_metrics_core(
+        input_path=input_path,
+        output_path=output_path,
+        metrics={mode: area_unit if mode == "area" else length_unit},
+        target_crs=target_crs,
+        field_names={mode: field_name or mode.lower()},
+        overwrite=overwrite,
+        geodesic=geodesic,
+        write_mode=write_mode,
+    )
+
+
 # ===== 新增：Calculate_Attributes_Tool 类 =====
 class CalculateGeoAttributesTool(BaseVectorTool):
     """CalculateGeoAttributesTool工具类，封装路径管理和业务逻辑调用
@@ -138,11 +332,27 @@ class CalculateGeoAttributesTool(BaseVectorTool):
     ) -> Tuple[str, str]:
         # 从 kwargs 提取参数
         mode = kwargs.get("mode", "area")
+        metrics = kwargs.get("metrics", None)
         target_crs = kwargs.get("target_crs", "EPSG:3857")
         field_name = kwargs.get("field_name", None)
         overwrite = kwargs.get("overwrite", True)
         area_unit = kwargs.get("area_unit", "m2")
         length_unit = kwargs.get("length_unit", "m")
+        geodesic = kwargs.get("geodesic", False)
+        write_mode = kwargs.get("write_mode", "file")
+
+        # 多指标模式：一次读写计算所有指标
+        if metrics:
+            return calculate_metrics_core(
+                input_path=input_paths[0],
+                output_path=save_path,
+                metrics=metrics,
+                target_crs=target_crs,
+                field_names=kwargs.get("field_names", None),
+                overwrite=overwrite,
+                geodesic=geodesic,
+                write_mode=write_mode,
+            )
 
         # 调用核心函数，传入准备好的 save_path
         return calculate_core(
@@ -154,4 +364,6 @@ class CalculateGeoAttributesTool(BaseVectorTool):
             overwrite=overwrite,
             area_unit=area_unit,
             length_unit=length_unit,
+            geodesic=geodesic,
+            write_mode=write_mode,
         )
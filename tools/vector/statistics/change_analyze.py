@@ -1,9 +1,20 @@
+import os
 from pathlib import Path
 from typing import List, Tuple
 import geopandas as gpd
+import numpy as np
 import pandas as pd
+import shapely
+from config.config import ConfigManager
 from tools.vector.base import BaseVectorTool
+from utils.artifact_store import register_artifact, touch_artifacts
+from utils.file_handler import ensure_folder_exists
+from utils.geojson_handler import to_geojson
+from utils.geometry_fingerprint import fingerprint_digest, geometry_fingerprints
+from utils.layer_catalog import describe_layer
 from utils.logger import get_logger
+from utils.metrics import span
+from utils.vector_io import read_layer, read_vector, write_vector
 
 logger = get_logger("change_analyze")
 
@@ -27,23 +38,448 @@ def change_analyze_core(
     path: Path,
     before_fid: str = "FID_1",
     after_fid: str = "FID_2",
-    change_type_field: str = "change_type",
+    change_type_field: str = "changed",
     output_path: Path = None,
 ) -> Path:
 
-    gdf = gpd.read_file(path)
-
-    if before_fid not in gdf.columns or after_fid not in gdf.columns:
+    # 按图层目录中的字段信息校验，缺少字段时无需读取图层
+    columns = describe_layer(path)["columns"]
+    if before_fid not in columns or after_fid not in columns:
         logger.error(f"输入文件缺少必要字段：{before_fid}, {after_fid}")
         raise ValueError(f"输入文件缺少必要字段：{before_fid}, {after_fid}")
 
-    gdf[change_type_field] = gdf.apply(
-        _get_change_type, axis=1, before_field=before_fid, after_field=after_fid
-    )
+    gdf = read_vector(path)
 
-    gdf.to_file(output_path)
+    with span("compute", features=len(gdf)):
+        gdf[change_type_field] = gdf.apply(
+            _get_change_type, axis=1, before_field=before_fid, after_field=after_fid
+        )
+
+    write_vector(gdf, output_path)
     logger.info(f"变化分析完成，结果保存到: {output_path}")
-    geojson = gdf.to_json()
+    geojson = to_geojson(gdf)
+    return str(output_path), geojson
+
+
+# ===== 直接两期变化检测（无需预先 union）=====
+def _read_epoch(path: Path, project_crs: str, fid_field: str) -> gpd.GeoDataFrame:
+    """读取单期图层：修复几何、统一坐标系，并补充 FID 字段（与 union_core 一致，从1开始编号）"""
+    gdf = read_layer(path, project_crs)
+    if gdf.empty:
+        raise ValueError(f"输入数据为空: {path}")
+
+    geom_types = gdf.geometry.geom_type.unique()
+    if not any(g in ["Polygon", "MultiPolygon"] for g in geom_types):
+        raise TypeError(f"当前数据不是面要素，无法进行变化检测: {path}")
+
+    gdf = gdf.reset_index(drop=True)
+    if fid_field not in gdf.columns:
+        gdf[fid_field] = gdf.index + 1
+    return gdf
+
+
+def _keep_polygonal(geoms: np.ndarray) -> np.ndarray:
+    """只保留面状部分，等价于 overlay 的 keep_geom_type=True"""
+    collections = np.flatnonzero(shapely.get_type_id(geoms) == 7)
+    if len(collections):
+        geoms = geoms.copy()
+        for i in collections:
+            parts = [
+                g for g in geoms[i].geoms if g.geom_type in ("Polygon", "MultiPolygon")
+            ]
+            geoms[i] = shapely.union_all(parts) if parts else shapely.Polygon()
+    return geoms
+
+
+def _match_pairs(
+    before_geoms: np.ndarray,
+    after_geoms: np.ndarray,
+    tree: shapely.STRtree,
+    after_subset: np.ndarray,
+):
+    """
+    用 STRtree 批量查询 after_subset 中的后期要素与前期要素的相交对，并计算重叠面积
+
+    Returns:
+        (before_idx, after_idx, overlap_area, overlap_geoms)，只包含重叠面积大于0的要素对
+    """
+    query_idx, before_idx = tree.query(after_geoms[after_subset], predicate="intersects")
+    after_idx = after_subset[query_idx]
+    b = before_geoms[before_idx]
+    a = after_geoms[after_idx]
+
+    # 大部分地块未变化：坐标完全一致的要素对直接跳过求交
+    same = shapely.equals_exact(b, a, tolerance=0)
+    overlap = np.empty(len(before_idx), dtype=object)
+    overlap[same] = a[same]
+    overlap[~same] = shapely.intersection(b[~same], a[~same])
+    overlap = _keep_polygonal(overlap)
+    overlap_area = shapely.area(overlap)
+
+    keep = overlap_area > 0
+    return before_idx[keep], after_idx[keep], overlap_area[keep], overlap[keep]
+
+
+def _one_to_one(
+    b_idx: np.ndarray, a_idx: np.ndarray, ratio: np.ndarray, matched: np.ndarray
+) -> np.ndarray:
+    """
+    阈值不超过0.5时一个要素可能与多个要素都达到阈值：按重叠比例从高到低贪心选取，
+    每个前期、后期要素最多匹配一次，避免同一要素输出多行 unchanged
+    """
+    candidates = np.flatnonzero(matched)
+    order = candidates[np.argsort(-ratio[candidates], kind="stable")]
+    keep = np.zeros(len(matched), dtype=bool)
+    used_before, used_after = set(), set()
+    for i in order:
+        if b_idx[i] in used_before or a_idx[i] in used_after:
+            continue
+        used_before.add(b_idx[i])
+        used_after.add(a_idx[i])
+        keep[i] = True
+    return keep
+
+
+def _remainder(
+    geoms: np.ndarray,
+    owner_idx: np.ndarray,
+    other_geoms: np.ndarray,
+    pair_owner: np.ndarray,
+    pair_other: np.ndarray,
+) -> np.ndarray:
+    """计算 geoms[owner_idx] 扣除与之相交的另一期要素后剩余的部分（owner_idx 需已排序）"""
+    result = geoms[owner_idx].copy()
+    mask = np.isin(pair_owner, owner_idx)
+    if not mask.any():
+        return result
+
+    order = np.argsort(pair_owner[mask], kind="stable")
+    owners_sorted = pair_owner[mask][order]
+    others_sorted = pair_other[mask][order]
+    owners, starts = np.unique(owners_sorted, return_index=True)
+    cutters = np.empty(len(owners), dtype=object)
+    cutters[:] = [
+        shapely.union_all(other_geoms[g]) for g in np.split(others_sorted, starts[1:])
+    ]
+
+    pos = np.searchsorted(owner_idx, owners)
+    result[pos] = shapely.difference(geoms[owners], cutters)
+    return _keep_polygonal(result)
+
+
+def _detect_changes(
+    before_geoms: np.ndarray,
+    after_geoms: np.ndarray,
+    tree: shapely.STRtree,
+    threshold: float,
+    changed_after: np.ndarray = None,
+    dirty_before: np.ndarray = None,
+) -> pd.DataFrame:
+    """
+    计算变化检测结果行，_b/_a 为前后期要素位置（-1 表示无对应要素）
+
+    默认计算全部要素；增量模式下只输出涉及 changed_after（几何发生变化的后期要素）
+    或 dirty_before（与变化要素相交的前期要素）的结果行。
+    """
+    if changed_after is None:
+        changed_after = np.arange(len(after_geoms))
+        dirty_before = np.arange(len(before_geoms))
+        query_after = changed_after
+    else:
+        # 与受影响前期要素相交的后期要素也要重新判定匹配状态
+        related = shapely.STRtree(after_geoms).query(
+            before_geoms[dirty_before], predicate="intersects"
+        )[1]
+        query_after = np.union1d(changed_after, related)
+
+    # Step 1. 空间连接 + 重叠比例匹配
+    b_idx, a_idx, overlap_area, overlap = _match_pairs(
+        before_geoms, after_geoms, tree, query_after
+    )
+    larger_area = np.maximum(
+        shapely.area(before_geoms[b_idx]), shapely.area(after_geoms[a_idx])
+    )
+    matched = overlap_area >= threshold * larger_area
+    if threshold <= 0.5:
+        # 阈值大于0.5时每个要素最多与一个要素达到阈值，无需处理
+        matched = _one_to_one(b_idx, a_idx, overlap_area / larger_area, matched)
+
+    # 与变化后期要素相交的前期要素一定在 dirty_before 中，因此只需按前期要素筛选
+    emit = np.isin(b_idx, dirty_before)
+    unmatched_before = np.setdiff1d(dirty_before, b_idx[matched])
+    unmatched_query = np.setdiff1d(query_after, a_idx[matched])
+    unmatched_after = np.intersect1d(unmatched_query, changed_after)
+    logger.debug(
+        f"匹配要素对 {int(matched.sum())} 个，待计算前期要素 {len(unmatched_before)} 个、后期要素 {len(unmatched_after)} 个"
+    )
+
+    # Step 2. 只对未匹配要素计算几何变化
+    matched &= emit
+    partial = (
+        emit
+        & ~matched
+        & np.isin(b_idx, unmatched_before)
+        & np.isin(a_idx, unmatched_query)
+    )
+    lost_geoms = _remainder(before_geoms, unmatched_before, after_geoms, b_idx, a_idx)
+    new_geoms = _remainder(after_geoms, unmatched_after, before_geoms, a_idx, b_idx)
+
+    parts = [
+        # 匹配成功的要素对：保留后期几何
+        (b_idx[matched], a_idx[matched], after_geoms[a_idx[matched]], "unchanged"),
+        # 未匹配要素之间的交集
+        (b_idx[partial], a_idx[partial], overlap[partial], "unchanged"),
+        (unmatched_before, np.full(len(unmatched_before), -1), lost_geoms, "lost"),
+        (np.full(len(unmatched_after), -1), unmatched_after, new_geoms, "new"),
+    ]
+    rows = pd.concat(
+        [
+            pd.DataFrame({"_b": b, "_a": a, "_type": change_type, "geometry": geoms})
+            for b, a, geoms, change_type in parts
+        ],
+        ignore_index=True,
+    )
+    geoms = rows["geometry"].to_numpy()
+    return rows[~shapely.is_empty(geoms) & (shapely.area(geoms) > 0)]
+
+
+def _load_state(state_path: Path):
+    """读取上一期的增量状态：后期要素指纹与几何、带来源标识的结果行"""
+    if not state_path.exists():
+        return None
+    # 状态文件由产物存储按最近使用时间淘汰，读取时刷新
+    touch_artifacts([state_path])
+    try:
+        prev_after = gpd.read_file(state_path, layer="after")
+        prev_rows = gpd.read_file(state_path, layer="rows")
+    except Exception as e:
+        logger.warning(f"增量状态读取失败，将执行全量计算: {e}")
+        return None
+    prev_rows["_afp"] = prev_rows["_afp"].fillna("")
+    return (
+        prev_after["fp"].to_numpy(),
+        prev_after.geometry.to_numpy(),
+        pd.DataFrame(prev_rows),
+    )
+
+
+def _save_state(state_path: Path, after_fp, after_geoms, rows: pd.DataFrame, crs):
+    """保存本期增量状态，先写临时文件再替换，避免中断时留下不完整的状态"""
+    ensure_folder_exists(state_path.parent)
+    # 临时文件名带进程号，多个 worker 同时保存同一基期的状态时互不覆盖，最后一次替换生效
+    tmp_path = state_path.with_suffix(f".{os.getpid()}.tmp.gpkg")
+    if tmp_path.exists():
+        tmp_path.unlink()
+    gpd.GeoDataFrame({"fp": after_fp}, geometry=after_geoms, crs=crs).to_file(
+        tmp_path, layer="after", driver="GPKG"
+    )
+    gpd.GeoDataFrame(
+        rows[["_b", "_afp", "_type"]], geometry=rows["geometry"].to_numpy(), crs=crs
+    ).to_file(tmp_path, layer="rows", driver="GPKG")
+    os.replace(tmp_path, state_path)
+
+
+def _detect_incremental(
+    before_geoms: np.ndarray,
+    after_geoms: np.ndarray,
+    tree: shapely.STRtree,
+    threshold: float,
+    state_path: Path,
+    crs,
+) -> pd.DataFrame:
+    """
+    增量变化检测：与同一基期上一次检测的后期图层比较几何指纹，
+    只重新计算指纹变化的后期要素及与之相交的前期要素，其余结果行直接复用
+    """
+    after_fp = geometry_fingerprints(after_geoms)
+    state = _load_state(state_path)
+    if state is None:
+        logger.info("未找到历史变化检测状态，执行全量计算")
+        rows = _detect_changes(before_geoms, after_geoms, tree, threshold)
+    else:
+        prev_fp, prev_geoms, prev_rows = state
+        # 指纹重复的要素只复用第一个，其余按变化要素处理
+        duplicated = pd.Series(after_fp).duplicated().to_numpy()
+        kept = np.isin(after_fp, prev_fp) & ~duplicated
+        changed_after = np.flatnonzero(~kept)
+        removed_geoms = prev_geoms[~np.isin(prev_fp, after_fp)]
+        dirty_geoms = np.concatenate([after_geoms[changed_after], removed_geoms])
+        dirty_before = np.unique(tree.query(dirty_geoms, predicate="intersects")[1])
+        logger.info(
+            f"增量变化检测：{len(changed_after)} 个后期要素几何变化，{len(removed_geoms)} 个要素被移除，"
+            f"{len(dirty_before)} 个前期要素需要重新计算"
+        )
+        rows = _detect_changes(
+            before_geoms,
+            after_geoms,
+            tree,
+            threshold,
+            changed_after=changed_after,
+            dirty_before=dirty_before,
+        )
+
+        # 复用未受影响的历史结果行，并按指纹映射到当前后期要素的位置
+        fp_pos = pd.Series(np.arange(len(after_fp)), index=after_fp)[~duplicated]
+        reuse = (
+            prev_rows["_afp"].eq("") | prev_rows["_afp"].isin(after_fp[kept])
+        ) & ~prev_rows["_b"].isin(dirty_before)
+        reused = prev_rows[reuse].copy()
+        reused["_a"] = reused["_afp"].map(fp_pos).fillna(-1).astype(int)
+        logger.debug("复用历史结果 %s 行，新计算 %s 行", len(reused), len(rows))
+        rows = pd.concat(
+            [reused[["_b", "_a", "_type", "geometry"]], rows], ignore_index=True
+        )
+
+    positions = rows["_a"].to_numpy()
+    rows["_afp"] = np.where(positions >= 0, after_fp[positions.clip(min=0)], "")
+    _save_state(state_path, after_fp, after_geoms, rows, crs)
+    # 每个新基期都会生成一个状态文件，登记到产物存储中，随配额和 TTL 淘汰
+    register_artifact(state_path, kind="change_state")
+    return rows
+
+
+def _epoch_attributes(
+    before_attrs: pd.DataFrame,
+    after_attrs: pd.DataFrame,
+    before_fid: str,
+    after_fid: str,
+    reserved: List[str],
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    为两期属性列改名（各自的 FID 关联字段除外）
+
+    两期同名字段与 overlay 一致加 _1/_2 后缀；改名后仍与结果中已有字段重名的
+    （如两期都有 FID 字段，加后缀后与 FID_1/FID_2 冲突）再追加序号，如 FID_1_1。
+    """
+    shared = set(before_attrs.columns) & set(after_attrs.columns)
+    taken = set(reserved)
+    renamed = []
+    for attrs, key, suffix in (
+        (before_attrs, before_fid, "_1"),
+        (after_attrs, after_fid, "_2"),
+    ):
+        mapping = {}
+        for column in attrs.columns:
+            if column == key:
+                continue
+            name = base = f"{column}{suffix}" if column in shared else column
+            n = 1
+            while name in taken:
+                name = f"{base}_{n}"
+                n += 1
+            taken.add(name)
+            mapping[column] = name
+        renamed.append(attrs.rename(columns=mapping))
+    return renamed[0], renamed[1]
+
+
+def change_detect_core(
+    before_path: Path,
+    after_path: Path,
+    overlap_threshold: float = None,
+    before_fid: str = "FID_1",
+    after_fid: str = "FID_2",
+    change_type_field: str = "changed",
+    target_crs: str = None,
+    incremental: bool = False,
+    output_path: Path = None,
+) -> Tuple[str, str]:
+    """
+    直接对前后两期图层进行变化检测，无需先执行 union 并落盘
+
+    1. STRtree 空间连接找出相交要素对
+    2. 重叠比例（重叠面积 / 两者中较大的面积）不低于阈值的要素对视为未变化，直接保留后期几何
+    3. 只对未匹配的要素计算几何差异：
+       - 前后期未匹配要素的交集 -> unchanged
+       - 前期要素扣除所有后期要素 -> lost
+       - 后期要素扣除所有前期要素 -> new
+
+    增量模式下，按基期图层保存每个后期要素的几何指纹和结果行，
+    新一期只重新计算指纹发生变化的要素，耗时与实际变化量成正比。
+
+    输出字段与 union + change_analyze 的结果保持一致（before_fid、after_fid、变化类型字段及两期属性）。
+
+    Args:
+        before_path (Path): 前期（基期）矢量文件路径
+        after_path (Path): 后期矢量文件路径
+        overlap_threshold (float, optional): 判定为未变化的重叠比例阈值，默认从配置获取或使用0.9
+        before_fid (str): 前期 FID 字段名称，默认为 "FID_1"
+        after_fid (str): 后期 FID 字段名称，默认为 "FID_2"
+        change_type_field (str): 变化类型字段名称，默认为 "changed"（shapefile 字段名不超过10个字符）
+        target_crs (str, optional): 计算使用的坐标系，默认从配置获取或使用EPSG:3857
+        incremental (bool): 是否复用同一基期上一次检测的结果，默认为False
+        output_path (Path): 保存路径
+
+    Returns:
+        Tuple[str, str]: 保存路径和GeoJSON格式的结果
+
+    Raises:
+        ValueError: 当输入数据为空、缺少坐标系或阈值无效时
+        TypeError: 当输入数据不是面要素时
+    """
+    threshold = overlap_threshold
+    if threshold is None:
+        threshold = ConfigManager.get("change_detect.overlap_threshold", 0.9)
+    if not 0 < threshold <= 1:
+        raise ValueError("overlap_threshold 必须在 (0, 1] 区间内")
+    project_crs = target_crs or ConfigManager.get("project_crs", "EPSG:3857")
+
+    logger.info(f"开始变化检测: {before_path} -> {after_path}")
+    before = _read_epoch(before_path, project_crs, before_fid)
+    after = _read_epoch(after_path, project_crs, after_fid)
+    before_geoms = before.geometry.to_numpy()
+    after_geoms = after.geometry.to_numpy()
+    with span("compute", features=len(before) + len(after)):
+        tree = shapely.STRtree(before_geoms)
+
+        if incremental:
+            # 状态按基期几何与检测参数区分，基期变化时自动重新全量计算
+            state_key = fingerprint_digest(
+                geometry_fingerprints(before_geoms), threshold, project_crs
+            )
+            state_dir = Path(
+                ConfigManager.get("change_detect.state_dir", "data/uploads/change_state")
+            )
+            rows = _detect_incremental(
+                before_geoms,
+                after_geoms,
+                tree,
+                threshold,
+                state_dir / f"{state_key}.gpkg",
+                before.crs,
+            )
+        else:
+            rows = _detect_changes(before_geoms, after_geoms, tree, threshold)
+
+    # 要素位置 -> FID，-1 对应空值
+    rows = pd.DataFrame(
+        {
+            before_fid: before[before_fid].reindex(rows["_b"]).to_numpy(),
+            after_fid: after[after_fid].reindex(rows["_a"]).to_numpy(),
+            change_type_field: rows["_type"].to_numpy(),
+            "geometry": rows["geometry"].to_numpy(),
+        }
+    )
+
+    # 关联两期属性，合并前先为两期属性列改名，保证与结果中已有字段互不冲突
+    before_attrs, after_attrs = _epoch_attributes(
+        pd.DataFrame(before.drop(columns=before.geometry.name)),
+        pd.DataFrame(after.drop(columns=after.geometry.name)),
+        before_fid,
+        after_fid,
+        reserved=[before_fid, after_fid, change_type_field, "geometry"],
+    )
+    result = rows.merge(
+        before_attrs, on=before_fid, how="left", validate="many_to_one"
+    ).merge(after_attrs, on=after_fid, how="left", validate="many_to_one")
+    result = gpd.GeoDataFrame(result, geometry="geometry", crs=before.crs)
+
+    counts = result[change_type_field].value_counts().to_dict()
+    logger.info(f"变化检测完成，各类型数量: {counts}")
+
+    write_vector(result, output_path)
+    logger.info(f"变化检测结果保存到: {output_path}")
+    geojson = to_geojson(result)
     return str(output_path), geojson
 
 
@@ -55,18 +491,31 @@ class ChangeAnalyzeTool(BaseVectorTool):
         self, input_paths: List[Path], save_path: Path, **kwargs
     ) -> Tuple[str, str]:
         """
-        调用 change_analyze_core 函数
+        调用 change_analyze_core 函数；传入两个路径时调用 change_detect_core 直接对比前后两期
 
         Args:
-            input_paths: 输入路径列表（change_analyze只需要一个）
+            input_paths: 输入路径列表（一个为 union 结果，两个为前后两期图层）
             save_path: 已准备好的保存路径
-            **kwargs: before_fid, after_fid 等参数
+            **kwargs: before_fid, after_fid, overlap_threshold 等参数
         """
         # 从 kwargs 提取参数
         before_fid = kwargs.get("before_fid", "FID_1")
         after_fid = kwargs.get("after_fid", "FID_2")
         change_type_field = kwargs.get("change_type_field", "changed")
 
+        if len(input_paths) >= 2:
+            return change_detect_core(
+                before_path=input_paths[0],
+                after_path=input_paths[1],
+                overlap_threshold=kwargs.get("overlap_threshold", None),
+                before_fid=before_fid,
+                after_fid=after_fid,
+                change_type_field=change_type_field,
+                target_crs=kwargs.get("target_crs", None),
+                incremental=kwargs.get("incremental", False),
+                output_path=save_path,
+            )
+
         # 调用核心函数，传入准备好的 save_path
         return change_analyze_core(
             path=input_paths[0],
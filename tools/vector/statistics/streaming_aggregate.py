@@ -0,0 +1,224 @@
+# 流式分块分组统计
+# 按固定要素数分批读取图层，每批计算可合并的部分聚合结果（sum/count/min/max/平方和/分位数草图），
+# 最后合并得到与一次性分组相同的统计量；内存占用只与批大小和分组数有关，与图层大小无关。
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+from utils.logger import get_logger
+from utils.vector_io import count_features, read_vector
+
+logger = get_logger("streaming_aggregate")
+
+# 分位数统计量名称，如 p50、p99.5（aggregate_group 共用此定义）
+PERCENTILE_PATTERN = re.compile(r"p(\d{1,2}(\.\d+)?)")
+# 部分聚合量 -> 合并方式
+_MERGE = {"sum": "sum", "count": "sum", "min": "min", "max": "max", "sumsq": "sum"}
+
+
+class QuantileSketch:
+    """
+    可合并的近似分位数草图：保存按值排序的 (质心, 权重) 对，超过容量时按累计权重等分压缩。
+    误差随容量增大而减小，合并顺序不影响结果的数量级精度。
+    """
+
+    def __init__(self, capacity: int = 200):
+        self.capacity = capacity
+        self.values = np.empty(0)
+        self.weights = np.empty(0)
+
+    def add(self, values: np.ndarray, weights: np.ndarray = None):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if weights is None:
+            weights = np.ones(len(values))
+        self.values = np.concatenate([self.values, values])
+        self.weights = np.concatenate([self.weights, weights])
+        if len(self.values) > self.capacity:
+            self._compress()
+        return self
+
+    def merge(self, other: "QuantileSketch"):
+        return self.add(other.values, other.weights)
+
+    def _compress(self):
+        order = np.argsort(self.values, kind="stable")
+        values, weights = self.values[order], self.weights[order]
+        cum = np.cumsum(weights)
+        bucket = np.minimum(
+            (cum - weights / 2) / cum[-1] * self.capacity, self.capacity - 1
+        ).astype(int)
+        total = np.bincount(bucket, weights=weights, minlength=self.capacity)
+        weighted = np.bincount(bucket, weights=values * weights, minlength=self.capacity)
+        keep = total > 0
+        self.values = weighted[keep] / total[keep]
+        self.weights = total[keep]
+
+    def quantile(self, q: float) -> float:
+        if not len(self.values):
+            return np.nan
+        order = np.argsort(self.values, kind="stable")
+        values, weights = self.values[order], self.weights[order]
+        positions = np.cumsum(weights) - weights / 2
+        return float(np.interp(q * weights.sum(), positions, values))
+
+
+def _sketch_key(key) -> tuple:
+    """分组键转为草图字典的键，空值统一为 None（NaN 互不相等，不能直接作字典键）"""
+    key = key if isinstance(key, tuple) else (key,)
+    return tuple(None if pd.isna(k) else k for k in key)
+
+
+def _partial_aggregate(
+    path: Path,
+    group_fields: List[str],
+    fields: List[str],
+    sketch_fields: List[str],
+    rows: slice,
+    capacity: int,
+    dropna: bool = True,
+) -> Tuple[pd.DataFrame, Dict[str, Dict[tuple, QuantileSketch]]]:
+    """读取一批要素并计算部分聚合结果，可在子进程中执行"""
+    df = read_vector(
+        path,
+        columns=list(dict.fromkeys(group_fields + fields)),
+        ignore_geometry=True,
+        rows=rows,
+    )
+    keys = [df[k] for k in group_fields]
+    parts = {}
+    for field in fields:
+        values = pd.to_numeric(df[field], errors="coerce")
+        g = values.groupby(keys, sort=False, dropna=dropna)
+        parts[f"{field}__sum"] = g.sum()
+        parts[f"{field}__count"] = g.count()
+        parts[f"{field}__min"] = g.min()
+        parts[f"{field}__max"] = g.max()
+        parts[f"{field}__sumsq"] = (
+            (values**2).groupby(keys, sort=False, dropna=dropna).sum()
+        )
+    table = pd.DataFrame(parts)
+
+    grouped = df.groupby(group_fields, sort=False, dropna=dropna)
+    sketches = {}
+    for field in sketch_fields:
+        sketches[field] = {
+            _sketch_key(key): QuantileSketch(capacity).add(
+                pd.to_numeric(group[field], errors="coerce").to_numpy()
+            )
+            for key, group in grouped
+        }
+    return table, sketches
+
+
+def _merge_partials(merged, partial):
+    """合并两份部分聚合结果"""
+    if merged is None:
+        return partial
+    table = pd.concat([merged[0], partial[0]])
+    level = list(range(table.index.nlevels))
+    agg = {c: _MERGE[c.rsplit("__", 1)[1]] for c in table.columns}
+    # 空分组键（dropna=False 时保留的组）同样参与合并
+    table = table.groupby(level=level, sort=False, dropna=False).agg(agg)
+
+    sketches = merged[1]
+    for field, groups in partial[1].items():
+        target = sketches.setdefault(field, {})
+        for key, sketch in groups.items():
+            if key in target:
+                target[key].merge(sketch)
+            else:
+                target[key] = sketch
+    return table, sketches
+
+
+def _finalize(
+    table: pd.DataFrame,
+    sketches: Dict[str, Dict[tuple, QuantileSketch]],
+    group_fields: List[str],
+    stats: Dict[str, List[str]],
+) -> pd.DataFrame:
+    """由合并后的部分聚合结果计算最终统计量"""
+    result = pd.DataFrame(index=table.index)
+    keys = [_sketch_key(k) for k in table.index]
+    for field, names in stats.items():
+        s, n = table[f"{field}__sum"], table[f"{field}__count"]
+        for name in names:
+            column = f"{field}_{name}"
+            if name in ("sum", "count", "min", "max"):
+                result[column] = table[f"{field}__{name}"]
+            elif name == "mean":
+                result[column] = s / n
+            elif name == "std":
+                var = (table[f"{field}__sumsq"] - s**2 / n) / (n - 1)
+                result[column] = np.sqrt(var.clip(lower=0))
+            else:
+                match = PERCENTILE_PATTERN.fullmatch(name)
+                q = float(match.group(1)) / 100 if match else 0.5
+                result[column] = [sketches[field][k].quantile(q) for k in keys]
+    result.index.names = group_fields
+    return result.sort_index().reset_index()
+
+
+def streaming_grouped_stats(
+    path: Path,
+    group_fields: List[str],
+    stats: Dict[str, List[str]],
+    batch_size: int,
+    workers: int = 1,
+    capacity: int = 200,
+    dropna: bool = True,
+) -> pd.DataFrame:
+    """
+    分批读取图层并合并部分聚合结果，输出列与一次性分组统计一致（{字段}_{统计量}）
+
+    Args:
+        path: 输入矢量文件路径
+        group_fields: 分组字段
+        stats: 字段 -> 统计量列表，median 与百分位数为近似值
+        batch_size: 每批读取的要素数
+        workers: 并行进程数，大于1时各批次在子进程中读取与聚合
+        capacity: 分位数草图容量
+        dropna: 是否丢弃分组字段为空的要素，False 时这些要素单独成组
+
+    Returns:
+        pd.DataFrame: 分组统计结果
+    """
+    total = count_features(path)
+    fields = list(stats)
+    sketch_fields = [
+        f
+        for f, names in stats.items()
+        if any(n == "median" or PERCENTILE_PATTERN.fullmatch(n) for n in names)
+    ]
+    batches = [
+        slice(start, min(start + batch_size, total))
+        for start in range(0, total, batch_size)
+    ]
+    logger.info(f"流式分组统计: 共 {total} 个要素，分 {len(batches)} 批，并行进程数 {workers}")
+
+    args = (path, group_fields, fields, sketch_fields)
+    merged = None
+    if workers > 1 and len(batches) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = []
+            for rows in batches:
+                pending.append(
+                    executor.submit(_partial_aggregate, *args, rows, capacity, dropna)
+                )
+                # 限制在途批次数量，保证内存占用恒定
+                if len(pending) >= 2 * workers:
+                    merged = _merge_partials(merged, pending.pop(0).result())
+            for future in pending:
+                merged = _merge_partials(merged, future.result())
+    else:
+        for rows in batches:
+            merged = _merge_partials(
+                merged, _partial_aggregate(*args, rows, capacity, dropna)
+            )
+
+    if merged is None:
+        raise ValueError("输入数据为空。")
+    return _finalize(merged[0], merged[1], group_fields, stats)
@@ -0,0 +1,193 @@
+# 多期转移矩阵统计工具
+import re
+from pathlib import Path
+from typing import List, Literal, Optional, Tuple
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+from config.config import ConfigManager
+from tools.vector.base import BaseVectorTool
+from tools.vector.union import _overlay_layers, _read_layers
+from utils.crs_validator import CRSValidator
+from utils.geojson_handler import attributes_to_geojson
+from utils.logger import get_logger
+from utils.metrics import span
+from utils.vector_io import read_vector
+
+logger = get_logger("transition_matrix")
+
+_AREA_UNIT_FACTORS = {"m2": 1.0, "km2": 1e6, "mu": 666.6667}
+
+
+def _detect_fid_fields(columns) -> List[str]:
+    """按编号顺序找出 union 结果中的 FID_1、FID_2... 字段"""
+    fid_fields = [c for c in columns if re.fullmatch(r"FID_\d+", c)]
+    return sorted(fid_fields, key=lambda c: int(c.split("_")[1]))
+
+
+def _presence_matrix(gdf: gpd.GeoDataFrame, fid_fields: List[str]) -> np.ndarray:
+    """每个碎片在各期是否存在（FID 非空且不为0，与 change_analyze 的判断一致）"""
+    fids = gdf[fid_fields].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+    return ~np.isnan(fids) & (fids != 0)
+
+
+def transition_matrix_core(
+    input_paths: List[Path],
+    fid_fields: Optional[List[str]] = None,
+    class_fields: Optional[List[str]] = None,
+    epoch_labels: Optional[List[str]] = None,
+    pairs: Literal["consecutive", "all"] = "consecutive",
+    target_crs: str = None,
+    area_unit: Literal["m2", "km2", "mu"] = "m2",
+    output_path: Path = None,
+) -> Tuple[str, str]:
+    """
+    单次计算多期面积加权转移矩阵
+
+    1. 一个输入为 N 期 union 结果；多个输入则按顺序直接在内存中叠加，不落盘中间文件
+    2. 向量化计算每个碎片的存在位掩码（第 i 期存在则第 i 位为1）
+    3. 按期次对统计面积加权的转移矩阵，状态为 present/absent，或指定的各期分类字段值
+
+    Args:
+        input_paths (List[Path]): 一个 union 结果路径，或按时间顺序排列的多期图层路径
+        fid_fields (List[str], optional): 各期 FID 字段，默认自动识别 FID_1...FID_N
+        class_fields (List[str], optional): 各期分类字段（与期次一一对应），为空时只统计存在/消失
+        epoch_labels (List[str], optional): 各期名称，默认使用 FID 字段名
+        pairs (Literal["consecutive", "all"]): 统计相邻期次的转移还是所有期次两两之间的转移
+        target_crs (str, optional): 面积计算坐标系，默认从配置获取或使用EPSG:3857
+        area_unit (Literal["m2", "km2", "mu"]): 面积单位，默认为"m2"
+        output_path (Path): 转移矩阵表保存路径（CSV），位掩码汇总表保存在同目录 *_presence.csv
+
+    Returns:
+        Tuple[str, str]: 保存路径和 JSON 格式的转移矩阵
+
+    Raises:
+        ValueError: 当输入为空、期数少于2或字段不匹配时
+    """
+    if not input_paths:
+        raise ValueError("至少需要一个输入文件。")
+    if area_unit not in _AREA_UNIT_FACTORS:
+        raise ValueError(f"不支持的面积单位: {area_unit}")
+    DEFAULT_OUTPUT_CRS = target_crs or ConfigManager.get("project_crs", "EPSG:3857")
+
+    # Step 1. 读取叠加结果
+    if len(input_paths) == 1:
+        logger.info(f"开始读取叠加结果: {input_paths[0]}")
+        gdf = read_vector(input_paths[0])
+    else:
+        logger.info(f"开始在内存中叠加{len(input_paths)}期图层")
+        layers = [
+            CRSValidator.ensure_projected_crs(layer, DEFAULT_OUTPUT_CRS)
+            for layer in _read_layers(input_paths, keep_fid=True)
+        ]
+        with span("compute", features=sum(len(layer) for layer in layers)):
+            gdf = _overlay_layers(layers)
+    if gdf.empty:
+        raise ValueError("输入数据为空。")
+
+    fid_fields = fid_fields or _detect_fid_fields(gdf.columns)
+    missing = [f for f in fid_fields if f not in gdf.columns]
+    if missing:
+        raise ValueError(f"输入文件缺少必要字段：{missing}")
+    if len(fid_fields) < 2:
+        raise ValueError("至少需要两期数据才能计算转移矩阵。")
+    if class_fields and len(class_fields) != len(fid_fields):
+        raise ValueError("class_fields 的数量必须与期数一致。")
+    epoch_labels = epoch_labels or fid_fields
+    if len(epoch_labels) != len(fid_fields):
+        raise ValueError("epoch_labels 的数量必须与期数一致。")
+
+    gdf = CRSValidator.ensure_projected_crs(gdf, DEFAULT_OUTPUT_CRS)
+    with span("compute", features=len(gdf)):
+        area = shapely.area(gdf.geometry.to_numpy()) / _AREA_UNIT_FACTORS[area_unit]
+
+        # Step 2. 存在位掩码
+        presence = _presence_matrix(gdf, fid_fields)
+        weights = np.left_shift(1, np.arange(len(fid_fields), dtype=np.int64))
+        mask = presence.astype(np.int64) @ weights
+
+        presence_table = (
+            pd.DataFrame({"mask": mask, "area": area})
+            .groupby("mask", sort=True)
+            .agg(area=("area", "sum"), count=("area", "size"))
+            .reset_index()
+        )
+        presence_table.insert(
+            1,
+            "pattern",
+            [
+                "".join("1" if m >> i & 1 else "0" for i in range(len(fid_fields)))
+                for m in presence_table["mask"]
+            ],
+        )
+
+        # Step 3. 各期状态与面积加权转移矩阵
+        states = []
+        for i, fid in enumerate(fid_fields):
+            if class_fields:
+                values = gdf[class_fields[i]].astype("string")
+                state = values.where(presence[:, i], "absent").fillna("unknown")
+            else:
+                state = pd.Series(np.where(presence[:, i], "present", "absent"))
+            states.append(pd.Categorical(state))
+
+        n = len(fid_fields)
+        if pairs == "all":
+            epoch_pairs = [(i, j) for i in range(n) for j in range(i + 1, n)]
+        else:
+            epoch_pairs = [(i, i + 1) for i in range(n - 1)]
+
+        tables = []
+        for i, j in epoch_pairs:
+            table = (
+                pd.DataFrame({"from_state": states[i], "to_state": states[j], "area": area})
+                .groupby(["from_state", "to_state"], observed=True, sort=True)
+                .agg(area=("area", "sum"), count=("area", "size"))
+                .reset_index()
+            )
+            table.insert(0, "to_epoch", epoch_labels[j])
+            table.insert(0, "from_epoch", epoch_labels[i])
+            tables.append(table)
+        matrix = pd.concat(tables, ignore_index=True)
+        # 两期都不存在的碎片不参与转移统计
+        matrix = matrix[
+            ~((matrix["from_state"] == "absent") & (matrix["to_state"] == "absent"))
+        ]
+        logger.debug("共统计%s组期次转移，%s条记录", len(epoch_pairs), len(matrix))
+
+    # Step 4. 保存紧凑表格
+    presence_path = Path(output_path).with_name(f"{Path(output_path).stem}_presence.csv")
+    with span("write", features=len(matrix) + len(presence_table)):
+        matrix.to_csv(output_path, index=False, encoding="utf-8-sig")
+        presence_table.to_csv(presence_path, index=False, encoding="utf-8-sig")
+    logger.info(f"转移矩阵计算完成，结果保存到: {output_path}")
+
+    return str(output_path), attributes_to_geojson(matrix)
+
+
+# ===== 新增：TransitionMatrixTool 类 =====
+class TransitionMatrixTool(BaseVectorTool):
+    """TransitionMatrix工具类，封装路径管理和业务逻辑调用"""
+
+    def _execute_core(
+        self, input_paths: List[Path], save_path: Path, **kwargs
+    ) -> Tuple[str, str]:
+        """
+        调用 transition_matrix_core 函数
+
+        Args:
+            input_paths: 一个 union 结果路径或多期图层路径
+            save_path: 已准备好的保存路径
+            **kwargs: fid_fields, class_fields, epoch_labels 等参数
+        """
+        return transition_matrix_core(
+            input_paths=input_paths,
+            fid_fields=kwargs.get("fid_fields", None),
+            class_fields=kwargs.get("class_fields", None),
+            epoch_labels=kwargs.get("epoch_labels", None),
+            pairs=kwargs.get("pairs", "consecutive"),
+            target_crs=kwargs.get("target_crs", None),
+            area_unit=kwargs.get("area_unit", "m2"),
+            output_path=save_path,
+        )
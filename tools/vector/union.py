@@ -3,12 +3,44 @@ from pathlib import Path
 from typing import List, Tuple, Optional
 from tools.vector.base import BaseVectorTool
 from utils.file_handler import ensure_folder_exists, get_unique_filename
+from utils.geojson_handler import to_geojson
 from utils.logger import get_logger
+from utils.metrics import span
+from utils.vector_io import read_vector, write_vector
 from config.config import ConfigManager
 
 logger = get_logger("union_tool")
 
 
+def _read_layers(input_paths: List[Path], keep_fid: bool = True) -> List[gpd.GeoDataFrame]:
+    """读取所有图层，keep_fid 时为每个图层添加 FID_{i} 字段以区分来源"""
+    layers = []
+    for i, path in enumerate(input_paths):
+        logger.debug("正在读取第%s个图层: %s", i + 1, path)
+        layer = read_vector(path)
+        # 添加 FID 字段以区分来源
+        if keep_fid:
+            fid_field = f"FID_{i+1}"
+            if fid_field not in layer.columns:
+                layer[fid_field] = layer.index + 1  # 从1开始编号,避免与0混淆
+        layers.append(layer)
+    return layers
+
+
+def _overlay_layers(layers: List[gpd.GeoDataFrame]) -> gpd.GeoDataFrame:
+    """依次对图层执行 union 叠加，结果仅保存在内存中"""
+    result = layers[0]
+    for i, layer in enumerate(layers[1:]):
+        logger.debug("正在合并第%s个图层", i + 2)
+        result = gpd.overlay(result, layer, how="union", keep_geom_type=True)
+        dropped_count = len(layer) - len(result)
+        if dropped_count > 0:
+            logger.warning(
+                f"⚠️ {dropped_count} 个几何被丢弃（非 Polygon 类型）。如需保留，请设置 keep_geom_type=False。"
+            )
+    return result
+
+
 def union_core(
     input_paths: List[Path], keep_fid: bool = True, save_path: Optional[Path] = None
 ) -> Tuple[Path, str]:
@@ -18,34 +50,18 @@ def union_core(
 
     try:
         # 读取所有图层
-        layers = []
-        for i, path in enumerate(input_paths):
-            logger.debug(f"正在读取第{i+1}个图层: {path}")
-            layer = gpd.read_file(path)
-            # 添加 FID 字段以区分来源
-            if keep_fid:
-                fid_field = f"FID_{i+1}"
-                if fid_field not in layer.columns:
-                    layer[fid_field] = layer.index + 1  # 从1开始编号,避免与0混淆
-            layers.append(layer)
+        layers = _read_layers(input_paths, keep_fid)
         logger.info(f"成功读取{len(layers)}个图层，开始合并操作")
 
-        result = layers[0]
         # 依次合并图层
-        for i, layer in enumerate(layers[1:]):
-            logger.debug(f"正在合并第{i+2}个图层")
-            result = gpd.overlay(result, layer, how="union", keep_geom_type=True)
-            dropped_count = len(layer) - len(result)
-            if dropped_count > 0:
-                logger.warning(
-                    f"⚠️ {dropped_count} 个几何被丢弃（非 Polygon 类型）。如需保留，请设置 keep_geom_type=False。"
-                )
+        with span("compute", features=sum(len(layer) for layer in layers)):
+            result = _overlay_layers(layers)
 
         # 保存结果
-        result.to_file(save_path)
+        write_vector(result, save_path)
         logger.info(f"合并完成，结果保存到: {save_path}")
 
-        geojson = result.to_json()
+        geojson = to_geojson(result)
         return str(save_path), geojson
 
     except Exception as e:
@@ -0,0 +1,291 @@
+# 产物存储管理
+# 登记工具输出、上传解压目录、批量清单等产物的大小和最近使用时间（本地 SQLite），
+# 超出磁盘配额或超过保留期限时按最近最少使用顺序删除；固定（pin）的产物和正在被工具使用的输入不会被删除。
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+from config.config import ConfigManager
+from utils.file_handler import ensure_folder_exists
+from utils.logger import get_logger
+from utils.precompress import variants
+from utils.vector_io import (
+    canonical_marker_path,
+    layer_components,
+    sidecar_lock_path,
+    sidecar_paths,
+)
+
+logger = get_logger("artifact_store")
+
+_MB = 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    path TEXT PRIMARY KEY,
+    directory TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    bytes INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL,
+    pinned INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+
+def _artifact_files(path: Path) -> List[Path]:
+    """产物包含的所有文件：图层的组成文件及其压缩版本、旁路文件、旁路锁文件和规范化标记"""
+    files = layer_components(path)
+    files.extend(v for f in list(files) for v in variants(f))
+    files.extend(
+        f
+        for f in (
+            sidecar_paths(path)[1],
+            sidecar_lock_path(path),
+            canonical_marker_path(path),
+        )
+        if f.exists()
+    )
+    return files
+
+
+def _artifact_size(path: Path) -> int:
+    if path.is_dir():
+        return sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(path)
+            for name in names
+        )
+    return sum(f.stat().st_size for f in _artifact_files(path))
+
+
+def _remove_artifact(path: Path):
+    if path.is_dir():
+        shutil.rmtree(path, ignore_errors=True)
+        return
+    for f in _artifact_files(path):
+        try:
+            f.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class ArtifactStore:
+    """
+    产物存储
+
+    - register：产物写出后登记，随后检查配额
+    - touch：产物被读取时更新最近使用时间
+    - pin / unpin：固定的产物不参与淘汰
+    - in_use：上下文内的产物不参与淘汰（如正在执行的工具的输入）
+    """
+
+    def __init__(self, db_path: Path, quota_bytes: int, ttl_seconds: Optional[float]):
+        self.db_path = Path(db_path)
+        self.quota_bytes = quota_bytes
+        self.ttl_seconds = ttl_seconds
+        ensure_folder_exists(self.db_path.parent)
+        self._lock = threading.Lock()
+        # 正在使用的产物路径 -> 引用计数（仅当前进程）
+        self._in_use: Counter = Counter()
+        with self._connect() as conn:
+            conn.execute(_SCHEMA)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_artifacts_access ON artifacts (last_access)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        """打开连接，正常退出时提交事务，最终关闭连接"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _key(path: Path) -> str:
+        return str(Path(path).resolve())
+
+    def register(self, path: Path, kind: str = "output", pinned: bool = False):
+        """登记产物（已存在时更新大小和使用时间），然后按配额和保留期限淘汰"""
+        path = Path(path)
+        if not path.exists():
+            return
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO artifacts VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET bytes = excluded.bytes, "
+                "last_access = excluded.last_access, "
+                "pinned = MAX(artifacts.pinned, excluded.pinned)",
+                (
+                    self._key(path),
+                    self._key(path.parent),
+                    kind,
+                    _artifact_size(path),
+                    now,
+                    now,
+                    int(pinned),
+                ),
+            )
+        # 刚登记的产物本身不参与这次淘汰
+        with self.in_use([path]):
+            self.evict()
+
+    def touch(self, paths: Iterable[Path]):
+        """更新产物的最近使用时间；路径位于已登记的目录产物（如上传解压目录）内时更新该目录"""
+        now = time.time()
+        keys = [(now, key, key, os.sep) for key in map(self._key, paths)]
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "UPDATE artifacts SET last_access = ? WHERE path = ? "
+                "OR substr(?, 1, length(path) + 1) = path || ?",
+                keys,
+            )
+
+    def _is_in_use(self, key: str) -> bool:
+        """产物本身或其中的文件正在使用（调用方持有 self._lock）"""
+        prefix = key + os.sep
+        return any(k == key or k.startswith(prefix) for k in self._in_use)
+
+    def pin(self, path: Path, pinned: bool = True):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "UPDATE artifacts SET pinned = ? WHERE path = ?",
+                (int(pinned), self._key(path)),
+            )
+
+    def unpin(self, path: Path):
+        self.pin(path, pinned=False)
+
+    @contextmanager
+    def in_use(self, paths: Iterable[Path]):
+        """上下文内这些产物不会被淘汰，并在进入时更新其使用时间"""
+        paths = list(paths)
+        keys = [self._key(p) for p in paths]
+        with self._lock:
+            self._in_use.update(keys)
+        try:
+            self.touch(paths)
+            yield
+        finally:
+            with self._lock:
+                self._in_use.subtract(keys)
+                self._in_use += Counter()  # 去掉计数为 0 的键
+
+    def evict(self) -> List[str]:
+        """
+        删除超过保留期限的产物，以及超出配额部分中最近最少使用的产物
+
+        Returns:
+            List[str]: 被删除的产物路径
+        """
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            rows = conn.execute(
+                "SELECT path, bytes, last_access FROM artifacts "
+                "WHERE pinned = 0 ORDER BY last_access"
+            ).fetchall()
+            (total,) = conn.execute(
+                "SELECT COALESCE(SUM(bytes), 0) FROM artifacts"
+            ).fetchone()
+            evicted = []
+            for path, size, last_access in rows:
+                expired = self.ttl_seconds and now - last_access > self.ttl_seconds
+                if total <= self.quota_bytes and not expired:
+                    # 按使用时间排序，其后的产物既未过期也无需为配额腾出空间
+                    break
+                if self._is_in_use(path):
+                    continue
+                _remove_artifact(Path(path))
+                evicted.append(path)
+                total -= size
+            conn.executemany("DELETE FROM artifacts WHERE path = ?", [(p,) for p in evicted])
+        if evicted:
+            logger.info(
+                f"已淘汰 {len(evicted)} 个产物，当前占用 {total / _MB:.1f} MB，"
+                f"配额 {self.quota_bytes / _MB:.0f} MB"
+            )
+        return evicted
+
+    def usage(self) -> Dict[str, Dict[str, float]]:
+        """各目录的产物数量、占用空间和固定产物数量（同时清理文件已被外部删除的记录）"""
+        with self._lock, self._connect() as conn:
+            paths = [p for (p,) in conn.execute("SELECT path FROM artifacts")]
+            conn.executemany(
+                "DELETE FROM artifacts WHERE path = ?",
+                [(p,) for p in paths if not os.path.exists(p)],
+            )
+            rows = conn.execute(
+                "SELECT directory, COUNT(*), SUM(bytes), SUM(pinned), MIN(last_access) "
+                "FROM artifacts GROUP BY directory ORDER BY SUM(bytes) DESC"
+            ).fetchall()
+        return {
+            directory: {
+                "artifacts": count,
+                "mb": round(size / _MB, 2),
+                "pinned": pinned,
+                "oldest_access": oldest,
+            }
+            for directory, count, size, pinned, oldest in rows
+        }
+
+
+_instance: Optional[ArtifactStore] = None
+_instance_lock = threading.Lock()
+
+
+def get_artifact_store() -> Optional[ArtifactStore]:
+    """获取全局产物存储，配置 artifacts.enabled 为 false 时返回 None"""
+    global _instance
+    if not ConfigManager.get("artifacts.enabled", True):
+        return None
+    with _instance_lock:
+        if _instance is None:
+            ttl_hours = ConfigManager.get("artifacts.ttl_hours", 168)
+            _instance = ArtifactStore(
+                ConfigManager.get("artifacts.path", "data/uploads/cache/artifacts.sqlite"),
+                quota_bytes=ConfigManager.get("artifacts.quota_mb", 10240) * _MB,
+                ttl_seconds=ttl_hours * 3600 if ttl_hours else None,
+            )
+    return _instance
+
+
+def register_artifact(path: Path, kind: str = "output", pinned: bool = False):
+    """登记产物，失败时只记录警告，不影响调用方"""
+    store = get_artifact_store()
+    if store is None:
+        return
+    try:
+        store.register(path, kind=kind, pinned=pinned)
+    except Exception as e:
+        logger.warning(f"产物登记失败: {path}，{e}")
+
+
+def touch_artifacts(paths: Iterable[Path]):
+    """更新产物的最近使用时间（如复用已有结果时）"""
+    store = get_artifact_store()
+    if store is None:
+        return
+    try:
+        store.touch(paths)
+    except Exception as e:
+        logger.warning(f"产物使用时间更新失败: {e}")
+
+
+@contextmanager
+def artifacts_in_use(paths: Iterable[Path]):
+    """标记产物正在使用；产物存储关闭时为空操作"""
+    store = get_artifact_store()
+    if store is None:
+        yield
+        return
+    with store.in_use(list(paths)):
+        yield
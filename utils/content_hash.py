@@ -0,0 +1,73 @@
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, Tuple
+from utils.vector_io import layer_components
+
+_CHUNK_SIZE = 1 << 20
+
+_cache: Dict[str, Tuple[tuple, str]] = {}
+_lock = threading.Lock()
+
+
+def content_hash(path: Path) -> str:
+    """
+    计算图层内容哈希：按块流式读取所有组成文件的 blake2b 摘要。
+
+    结果按组成文件的大小和修改时间缓存，文件未变化时不会重新读取；
+    文件内容相同的图层（如重复上传、不同文件名的相同结果）得到相同哈希。
+
+    Args:
+        path: 图层主文件路径
+
+    Returns:
+        str: 十六进制内容哈希
+    """
+    files = layer_components(path)
+    if not files:
+        raise FileNotFoundError(f"图层文件不存在: {path}")
+    stats = [f.stat() for f in files]
+    signature = tuple(
+        (f.name, st.st_size, st.st_mtime_ns) for f, st in zip(files, stats)
+    )
+    key = str(Path(path).resolve())
+    with _lock:
+        cached = _cache.get(key)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    h = hashlib.blake2b(digest_size=20)
+    for f in files:
+        h.update(f.name[len(Path(path).stem):].lower().encode("utf-8"))
+        with f.open("rb") as src:
+            for chunk in iter(lambda: src.read(_CHUNK_SIZE), b""):
+                h.update(chunk)
+    digest = h.hexdigest()
+    with _lock:
+        _cache[key] = (signature, digest)
+    return digest
+
+
+def file_hash(path: Path) -> str:
+    """
+    计算单个文件的内容哈希（不含图层的其他组成文件和旁路文件），用作静态文件的 ETag。
+
+    与 content_hash 一样按文件大小和修改时间缓存。
+    """
+    path = Path(path)
+    st = path.stat()
+    signature = (st.st_size, st.st_mtime_ns)
+    key = "file:" + str(path.resolve())
+    with _lock:
+        cached = _cache.get(key)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    h = hashlib.blake2b(digest_size=20)
+    with path.open("rb") as src:
+        for chunk in iter(lambda: src.read(_CHUNK_SIZE), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    with _lock:
+        _cache[key] = (signature, digest)
+    return digest
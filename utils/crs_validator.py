@@ -2,6 +2,7 @@ from shapely import Polygon
 from shapely.ops import transform
 import pyproj
 from utils.logger import get_logger
+from utils.metrics import span
 import geopandas as gpd
 
 logger = get_logger("CRSValidator")
@@ -28,7 +29,8 @@ class CRSValidator:
         if not target_crs:
             raise ValueError("目标 CRS 未定义。")
         if gdf.crs.to_string() != target_crs:
-            gdf = gdf.to_crs(target_crs)
+            with span("reproject", features=len(gdf)):
+                gdf = gdf.to_crs(target_crs)
         return gdf
 
     @staticmethod
@@ -1,11 +1,30 @@
 import os
+import re
 import shutil
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Tuple
 import zipfile
 from utils.logger import get_logger
 
+try:
+    import fcntl
+
+    msvcrt = None
+except ImportError:  # Windows
+    import msvcrt
+
+    fcntl = None
+
 logger = get_logger("file_handler")
 
+# 唯一名称分配的计数：(目录, 文件名主干, 扩展名) -> 已分配的最大后缀，按最近使用顺序淘汰
+_NAME_COUNTERS: "OrderedDict[Tuple[str, str, str], int]" = OrderedDict()
+_NAME_LOCK = threading.Lock()
+_MAX_NAME_COUNTERS = 4096
+
 
 def ensure_folder_exists(folder_path):
     """
@@ -13,8 +32,8 @@ def ensure_folder_exists(folder_path):
     """
     if not folder_path:
         raise ValueError("文件夹路径不能为空")
-    if not os.path.exists(folder_path):
-        os.makedirs(folder_path)
+    # 多个 worker 可能同时首次创建同一目录，exist_ok 避免先检查再创建的竞争
+    os.makedirs(folder_path, exist_ok=True)
 
 
 def ensure_file_exists(file_path):
@@ -28,29 +47,130 @@ def ensure_file_exists(file_path):
     return file_path
 
 
+def _max_suffix(directory: Path, base_name: str, extension: str) -> int:
+    """扫描一次目录，返回已有的 {base_name}_{n}{extension} 中最大的 n（没有时为 0）"""
+    pattern = re.compile(rf"^{re.escape(base_name)}_(\d+){re.escape(extension)}$")
+    largest = 0
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                match = pattern.match(entry.name)
+                if match:
+                    largest = max(largest, int(match.group(1)))
+    except FileNotFoundError:
+        pass
+    return largest
+
+
+def _reserve_file(path: Path):
+    """以独占方式创建空文件占位，已存在时抛出 FileExistsError（跨进程原子操作）"""
+    os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+
+
+def _allocate(directory: Path, original_filename: str, create) -> Path:
+    """
+    按 {stem}_{n}{suffix} 规则分配未被占用的名称，并用 create 原子地占用它
+
+    同一名称在进程内维护递增计数（首次遇到重名时扫描一次目录取已有最大后缀），
+    不再从 _1 开始逐个探测；create 失败（已被其他进程占用）时继续尝试下一个后缀。
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    base_name = Path(original_filename).stem
+    extension = Path(original_filename).suffix
+    key = (str(directory.resolve()), base_name, extension)
+
+    with _NAME_LOCK:
+        counter = _NAME_COUNTERS.pop(key, None)
+        if counter is None:
+            file_path = directory / original_filename
+            try:
+                create(file_path)
+                # 原名可用：记下该名称已被占用，下次调用时再扫描目录确定后缀
+                _NAME_COUNTERS[key] = 0
+                return file_path
+            except FileExistsError:
+                pass
+        if not counter:
+            counter = _max_suffix(directory, base_name, extension)
+        while True:
+            counter += 1
+            file_path = directory / f"{base_name}_{counter}{extension}"
+            # 计数已跳过进程内分配过的名称，通常一次即可成功
+            try:
+                create(file_path)
+                break
+            except FileExistsError:
+                continue
+        _NAME_COUNTERS[key] = counter
+        while len(_NAME_COUNTERS) > _MAX_NAME_COUNTERS:
+            _NAME_COUNTERS.popitem(last=False)
+
+    return file_path
+
+
 def get_unique_filename(directory: Path, original_filename: str) -> Path:
     """
-    生成唯一的文件名，如果文件已存在，则添加_{n}后缀，n从1开始递增
+    生成唯一的文件名，如果文件已存在，则添加_{n}后缀
+
+    返回前以 O_EXCL 创建同名空文件占位，多个进程/线程同时调用也不会得到相同的文件名；
+    写出结果时直接覆盖该占位文件（write_vector 会原子替换）。
 
     Args:
         directory: 目标目录
         original_filename: 原始文件名
 
     Returns:
-        Path: 唯一的文件路径
+        Path: 唯一的文件路径（已创建空的占位文件）
     """
-    base_name = Path(original_filename).stem
-    extension = Path(original_filename).suffix
-    counter = 1
-    new_filename = original_filename
-    file_path = directory / new_filename
+    return _allocate(directory, original_filename, _reserve_file)
 
-    while file_path.exists():
-        new_filename = f"{base_name}_{counter}{extension}"
-        file_path = directory / new_filename
-        counter += 1
 
-    return file_path
+def get_unique_dirname(directory: Path, dir_name: str) -> Path:
+    """生成并创建唯一的子目录，规则同 get_unique_filename（mkdir 本身是原子操作）"""
+    return _allocate(directory, dir_name, os.mkdir)
+
+
+def discard_placeholder(path: Path):
+    """删除 get_unique_filename 留下的、未被写入的空占位文件"""
+    try:
+        path = Path(path)
+        if path.is_file() and path.stat().st_size == 0:
+            path.unlink()
+    except OSError:
+        pass
+
+
+@contextmanager
+def file_lock(lock_path: Path):
+    """
+    跨进程文件锁（阻塞直到获得锁），用于多个 worker 进程读改写同一个共享文件
+
+    POSIX 使用 fcntl.flock，Windows 使用 msvcrt.locking；同一进程的不同线程之间同样互斥。
+    """
+    lock_path = Path(lock_path)
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    # LK_LOCK 只重试约 10 秒，超时后继续等待
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
 
 def extract_zip(zip_path: Path, extract_to: Path) -> Path:
     """解压ZIP文件，处理中文编码和文件名冲突，并返回实际解压目录。
@@ -64,11 +184,8 @@ def extract_zip(zip_path: Path, extract_to: Path) -> Path:
     """
     # 1. 确定解压目录名（基于zip文件名），并处理重名
     dir_name = zip_path.stem
-    # get_unique_filename 会找到一个不存在的路径，我们用它作为新目录
-    actual_extract_dir = get_unique_filename(extract_to, dir_name)
-
-    # 2. 创建实际的解压目录
-    actual_extract_dir.mkdir(parents=True, exist_ok=True)
+    # 2. 原子地创建实际的解压目录，多个 worker 同时上传同名文件也不会解压到同一目录
+    actual_extract_dir = get_unique_dirname(extract_to, dir_name)
     resolved_extract_dir = actual_extract_dir.resolve()
 
     def decode_filename(raw_name: bytes) -> str:
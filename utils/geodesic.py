@@ -0,0 +1,166 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Tuple
+import numpy as np
+import pyproj
+import shapely
+from config.config import ConfigManager
+from utils.logger import get_logger
+from utils.parallel import resolve_workers
+
+logger = get_logger("geodesic")
+
+
+@lru_cache(maxsize=8)
+def _get_geod(a: float, f: float) -> pyproj.Geod:
+    return pyproj.Geod(a=a, f=f)
+
+
+def _ring_areas(
+    lon: np.ndarray,
+    lat: np.ndarray,
+    starts: np.ndarray,
+    ends: np.ndarray,
+    a: float,
+    f: float,
+) -> np.ndarray:
+    """逐环计算椭球面积（有符号），可在子进程中执行"""
+    geod = _get_geod(a, f)
+    areas = np.empty(len(starts))
+    for i, (s, e) in enumerate(zip(starts, ends)):
+        areas[i] = geod.polygon_area_perimeter(lon[s:e], lat[s:e])[0]
+    return areas
+
+
+def _to_lonlat(coords: np.ndarray, transformer) -> Tuple[np.ndarray, np.ndarray]:
+    """将坐标数组转换为经纬度，地理坐标系下直接使用原坐标"""
+    if transformer is None:
+        return coords[:, 0], coords[:, 1]
+    lon, lat = transformer.transform(coords[:, 0], coords[:, 1])
+    return np.asarray(lon), np.asarray(lat)
+
+
+def _segment_lengths(
+    geod: pyproj.Geod, lon: np.ndarray, lat: np.ndarray, owner: np.ndarray, n: int
+) -> np.ndarray:
+    """向量化计算所有线段的测地线长度，并按所属几何汇总（跨环/跨部件的线段不计入）"""
+    if len(lon) < 2:
+        return np.zeros(n)
+    seg = np.asarray(geod.line_lengths(lon, lat))
+    same = owner[1:] == owner[:-1]
+    return np.bincount(owner[:-1][same], weights=seg[same], minlength=n)
+
+
+def geodesic_measures(
+    geoms: np.ndarray,
+    crs,
+    need_area: bool = True,
+    need_length: bool = True,
+    batch_size: int = None,
+    workers: int = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    直接基于经纬度坐标计算椭球面积与测地线长度，不对整个图层执行 to_crs。
+
+    按几何分批提取坐标数组：线段长度用 Geod.line_lengths 向量化计算，
+    面积逐环调用 Geod.polygon_area_perimeter（外环减内环）；要素数超过阈值时分批并行计算面积。
+
+    Args:
+        geoms: shapely 几何数组
+        crs: 几何所在坐标系，投影坐标系只对当前批次的坐标数组转换为经纬度
+        need_area: 是否计算面积（仅面要素有值，其余为0）
+        need_length: 是否计算长度（线要素为长度，面要素为周长）
+        batch_size: 每批几何数量，默认从配置获取或使用50000
+        workers: 并行进程数，默认从配置获取或使用4，在任务调度器子进程中固定为1
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (面积 m², 长度 m)，未计算的项为 None
+    """
+    crs = pyproj.CRS.from_user_input(crs)
+    geod = crs.get_geod()
+    if geod is None:
+        raise ValueError("输入数据坐标系缺少椭球定义，无法进行测地线计算。")
+    transformer = None
+    if not crs.is_geographic:
+        transformer = pyproj.Transformer.from_crs(crs, crs.geodetic_crs, always_xy=True)
+
+    n = len(geoms)
+    batch_size = batch_size or ConfigManager.get("geodesic.batch_size", 50000)
+    workers = resolve_workers(workers, "geodesic.workers", 4)
+    threshold = ConfigManager.get("geodesic.parallel_threshold", 200000)
+    parallel = n >= threshold and workers > 1
+
+    area = np.zeros(n) if need_area else None
+    length = np.zeros(n) if need_length else None
+    pending = []
+    executor = ProcessPoolExecutor(max_workers=workers) if parallel else None
+
+    def _collect(item):
+        offset, m, ring_geom, exterior, result = item
+        ring_area = np.abs(result.result() if executor is not None else result)
+        area[offset : offset + m] = np.bincount(
+            ring_geom, weights=np.where(exterior, ring_area, -ring_area), minlength=m
+        )
+
+    try:
+        for offset in range(0, n, batch_size):
+            batch = geoms[offset : offset + batch_size]
+            m = len(batch)
+            parts, part_geom = shapely.get_parts(batch, return_index=True)
+            part_types = shapely.get_type_id(parts)
+
+            # 面要素：按环展开，每个面部件的第一个环为外环
+            polygon_parts = np.flatnonzero(part_types == 3)
+            rings, ring_part = shapely.get_rings(parts[polygon_parts], return_index=True)
+            ring_geom = part_geom[polygon_parts][ring_part]
+            exterior = np.r_[True, ring_part[1:] != ring_part[:-1]][: len(rings)]
+            ring_coords, coord_ring = shapely.get_coordinates(rings, return_index=True)
+            ring_lon, ring_lat = _to_lonlat(ring_coords, transformer)
+
+            if need_length:
+                # 面要素周长（含内环）
+                length[offset : offset + m] += np.bincount(
+                    ring_geom,
+                    weights=_segment_lengths(
+                        geod, ring_lon, ring_lat, coord_ring, len(rings)
+                    ),
+                    minlength=m,
+                )
+                # 线要素长度
+                line_parts = np.flatnonzero(np.isin(part_types, (1, 2)))
+                line_coords, coord_line = shapely.get_coordinates(
+                    parts[line_parts], return_index=True
+                )
+                line_lon, line_lat = _to_lonlat(line_coords, transformer)
+                length[offset : offset + m] += np.bincount(
+                    part_geom[line_parts],
+                    weights=_segment_lengths(
+                        geod, line_lon, line_lat, coord_line, len(line_parts)
+                    ),
+                    minlength=m,
+                )
+
+            if need_area and len(rings):
+                ring_ids = np.arange(len(rings))
+                starts = np.searchsorted(coord_ring, ring_ids, side="left")
+                ends = np.searchsorted(coord_ring, ring_ids, side="right")
+                args = (ring_lon, ring_lat, starts, ends, geod.a, geod.f)
+                if executor is not None:
+                    future = executor.submit(_ring_areas, *args)
+                else:
+                    future = _ring_areas(*args)
+                pending.append((offset, m, ring_geom, exterior, future))
+                # 限制在途批次数量，避免所有批次的坐标同时驻留内存
+                if len(pending) > 2 * workers:
+                    _collect(pending.pop(0))
+
+        for item in pending:
+            _collect(item)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    logger.debug(
+        "测地线计算完成，共 %s 个要素，分 %s 批，并行: %s", n, -(-n // batch_size), parallel
+    )
+    return area, length
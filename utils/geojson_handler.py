@@ -1,8 +1,13 @@
 import json
 import os
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 import geopandas as gpd
+import pandas as pd
+from config.config import ConfigManager
 from utils.logger import get_logger
+from utils.metrics import span
+from utils.profiler import record_frame
+from utils.topojson import round_coordinates, to_topojson
 
 logger = get_logger("geojson_handler")
 
@@ -33,4 +38,56 @@ def save_geojson(gdf: gpd.GeoDataFrame, output_path: str):
         os.makedirs(output_dir)
 
     gdf.to_file(output_path, driver="GeoJSON")
-    return output_path
\ No newline at end of file
+    return output_path
+
+
+def attributes_to_geojson(df: pd.DataFrame) -> str:
+    """构造轻量级 GeoJSON（无 geometry，仅 properties），用于统计表等纯属性结果"""
+    with span("serialize", features=len(df)) as s:
+        geojson = {
+            "type": "FeatureCollection",
+            "features": [
+                {"type": "Feature", "geometry": None, "properties": record}
+                for record in df.to_dict(orient="records")
+            ],
+        }
+        result = json.dumps(geojson, ensure_ascii=False, indent=2, default=str)
+        s.bytes = len(result)
+    return result
+
+
+def output_precision(gdf: gpd.GeoDataFrame) -> Optional[int]:
+    """返回前端输出的坐标小数位：地理坐标系取 output.precision.geographic，投影坐标系取 projected"""
+    if gdf.crs is None:
+        return None
+    key = "geographic" if gdf.crs.is_geographic else "projected"
+    return ConfigManager.get(f"output.precision.{key}")
+
+
+def to_geojson(gdf: gpd.GeoDataFrame, encoding: Optional[str] = None) -> str:
+    """
+    将 GeoDataFrame 序列化为返回前端的字符串并记录 serialize 阶段耗时
+
+    Args:
+        gdf: 要输出的数据
+        encoding: "geojson"（坐标按 output.precision 保留小数位）或 "topojson"
+            （公共边界只存一次，坐标量化并差分编码）；None 时取配置 output.encoding
+    """
+    encoding = encoding or ConfigManager.get("output.encoding", "geojson")
+    record_frame("serialize", gdf)
+    with span("serialize", features=len(gdf)) as s:
+        if encoding == "topojson":
+            result = to_topojson(gdf)
+        else:
+            decimals = output_precision(gdf)
+            if decimals is not None:
+                # 浅拷贝后替换几何列，不修改调用方的数据
+                gdf = gdf.copy(deep=False)
+                gdf[gdf.geometry.name] = gpd.GeoSeries(
+                    round_coordinates(gdf.geometry.to_numpy(), decimals),
+                    index=gdf.index,
+                    crs=gdf.crs,
+                )
+            result = gdf.to_json()
+        s.bytes = len(result)
+    return result
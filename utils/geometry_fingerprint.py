@@ -0,0 +1,31 @@
+import hashlib
+import numpy as np
+import shapely
+
+
+def geometry_fingerprints(geoms: np.ndarray) -> np.ndarray:
+    """
+    计算每个要素的几何指纹：规范化（normalize）后二维 WKB 的 blake2b 摘要。
+
+    规范化会统一环的起点和方向、部件顺序，因此坐标完全相同但顶点顺序不同的几何得到相同指纹。
+
+    Args:
+        geoms: shapely 几何数组
+
+    Returns:
+        np.ndarray: 与输入等长的十六进制指纹字符串数组
+    """
+    wkbs = shapely.to_wkb(shapely.normalize(geoms), output_dimension=2, byte_order=1)
+    return np.array(
+        [hashlib.blake2b(w, digest_size=16).hexdigest() for w in wkbs], dtype=object
+    )
+
+
+def fingerprint_digest(fingerprints: np.ndarray, *extra) -> str:
+    """将一组指纹（按顺序）及附加参数合并为一个摘要，用于标识整个图层"""
+    h = hashlib.blake2b(digest_size=16)
+    for fp in fingerprints:
+        h.update(fp.encode("ascii"))
+    for item in extra:
+        h.update(str(item).encode("utf-8"))
+    return h.hexdigest()
@@ -0,0 +1,291 @@
+# 图层目录
+# 在入库和工具写出结果时记录图层元数据（坐标系、字段、要素数、范围、几何类型、内容哈希）及来源（由哪个工具、
+# 以什么参数、从哪些输入生成），保存在本地 SQLite 中。
+# 校验字段/几何类型和回答“图层里有什么”时直接查目录，不再打开整个图层；图层文件变化后自动重新扫描。
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from config.config import ConfigManager
+from utils.content_hash import content_hash
+from utils.file_handler import ensure_folder_exists
+from utils.logger import get_logger
+from utils.vector_io import layer_components, read_vector, sidecar_columns
+
+logger = get_logger("layer_catalog")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS layers (
+    path TEXT PRIMARY KEY,
+    signature TEXT NOT NULL,
+    layer_hash TEXT,
+    crs TEXT,
+    columns TEXT NOT NULL,
+    feature_count INTEGER NOT NULL,
+    bounds TEXT,
+    geometry_types TEXT NOT NULL,
+    tool TEXT,
+    params TEXT,
+    inputs TEXT,
+    updated REAL NOT NULL
+)
+"""
+
+_FIELDS = (
+    "path",
+    "signature",
+    "layer_hash",
+    "crs",
+    "columns",
+    "feature_count",
+    "bounds",
+    "geometry_types",
+    "tool",
+    "params",
+    "inputs",
+    "updated",
+)
+_JSON_FIELDS = ("columns", "bounds", "geometry_types", "params", "inputs")
+
+
+def _signature(path: Path) -> str:
+    """图层各组成文件（.shp/.shx/.dbf 等及属性旁路文件）的大小和修改时间，任一变化即视为图层已变化"""
+    parts = []
+    for f in layer_components(path):
+        stat = f.stat()
+        parts.append([f.suffix, stat.st_size, stat.st_mtime_ns])
+    return json.dumps(parts)
+
+
+def _normalize_geometry_type(name: Optional[str]) -> Optional[str]:
+    """"3D Polygon"、"Polygon Z" 等统一为 "Polygon"，未知/混合类型返回 None"""
+    if not name:
+        return None
+    name = name.replace("3D ", "").split(" ")[0]
+    return None if name in ("Unknown", "Geometry", "GeometryCollection") else name
+
+
+def _scan(path: Path) -> Dict[str, Any]:
+    """读取图层元数据：优先只读文件头信息，不解码几何与属性"""
+    try:
+        import pyogrio
+
+        info = pyogrio.read_info(path, force_feature_count=True, force_total_bounds=True)
+        columns = dict(zip(info["fields"], (str(d) for d in info["dtypes"])))
+        geometry_type = _normalize_geometry_type(info["geometry_type"])
+        # 混合类型图层文件头中没有具体类型，记为空列表，由使用方按实际数据判断
+        geometry_types = [geometry_type] if geometry_type else []
+        bounds = info.get("total_bounds")
+        meta = {
+            "crs": info["crs"],
+            "feature_count": int(info["features"]),
+            "bounds": [float(b) for b in bounds] if bounds is not None else None,
+        }
+    except ImportError:
+        gdf = read_vector(path)
+        columns = {
+            c: str(t) for c, t in gdf.dtypes.items() if c != gdf.geometry.name
+        }
+        geometry_types = sorted(gdf.geometry.geom_type.dropna().unique().tolist())
+        meta = {
+            "crs": gdf.crs.to_string() if gdf.crs else None,
+            "feature_count": len(gdf),
+            "bounds": [float(b) for b in gdf.total_bounds] if len(gdf) else None,
+        }
+    # 旁路属性列对下游工具可见，一并登记
+    for column in sidecar_columns(path):
+        columns.setdefault(column, "sidecar")
+    return {**meta, "columns": columns, "geometry_types": geometry_types}
+
+
+class LayerCatalog:
+    """图层元数据与来源目录，按图层绝对路径索引"""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        ensure_folder_exists(self.db_path.parent)
+        self._lock = threading.Lock()
+        # 进程内缓存：路径 -> 记录，签名一致时不访问数据库
+        self._memo: Dict[str, Dict[str, Any]] = {}
+        with self._connect() as conn:
+            conn.execute(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """打开连接，正常退出时提交事务，最终关闭连接"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute(
+                f"SELECT {', '.join(_FIELDS)} FROM layers WHERE path = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        entry = dict(zip(_FIELDS, row))
+        for field in _JSON_FIELDS:
+            if entry[field] is not None:
+                entry[field] = json.loads(entry[field])
+        return entry
+
+    def _save(self, entry: Dict[str, Any]):
+        values = [
+            json.dumps(entry[f], ensure_ascii=False, default=str)
+            if f in _JSON_FIELDS and entry[f] is not None
+            else entry[f]
+            for f in _FIELDS
+        ]
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO layers VALUES ({', '.join('?' * len(_FIELDS))})",
+                values,
+            )
+            self._memo[entry["path"]] = entry
+
+    def record(
+        self,
+        path: Path,
+        tool: Optional[str] = None,
+        params: Optional[Dict[str, Any]] = None,
+        inputs: Optional[List[Path]] = None,
+    ) -> Dict[str, Any]:
+        """
+        扫描并登记图层（入库或工具写出结果后调用）
+
+        Args:
+            path: 图层路径
+            tool: 生成该图层的工具，入库时为 "ingest"
+            params: 工具参数
+            inputs: 输入图层路径，连同其内容哈希记录为来源
+        """
+        path = Path(path).resolve()
+        entry = {
+            "path": str(path),
+            "signature": _signature(path),
+            "layer_hash": None,
+            **_scan(path),
+            "tool": tool,
+            "params": params,
+            "inputs": [
+                {"path": str(Path(p).resolve()), "hash": _safe_hash(p)}
+                for p in inputs or []
+            ],
+            "updated": time.time(),
+        }
+        self._save(entry)
+        logger.debug("图层已登记: %s（%s）", path, tool)
+        return entry
+
+    def describe(self, path: Path, with_hash: bool = False) -> Dict[str, Any]:
+        """
+        查询图层元数据，未登记或图层已变化时重新扫描（保留原有来源信息）
+
+        Args:
+            path: 图层路径
+            with_hash: 是否确保包含内容哈希（未计算过时读取整个文件计算一次）
+        """
+        path = Path(path).resolve()
+        key, signature = str(path), _signature(path)
+        entry = self._memo.get(key)
+        if entry is None or entry["signature"] != signature:
+            entry = self._load(key)
+        if entry is None or entry["signature"] != signature:
+            lineage = entry or {}
+            entry = {
+                "path": key,
+                "signature": signature,
+                "layer_hash": None,
+                **_scan(path),
+                "tool": lineage.get("tool"),
+                "params": lineage.get("params"),
+                "inputs": lineage.get("inputs"),
+                "updated": time.time(),
+            }
+            self._save(entry)
+        elif key not in self._memo:
+            self._memo[key] = entry
+        if with_hash and entry["layer_hash"] is None:
+            entry = {**entry, "layer_hash": content_hash(path)}
+            self._save(entry)
+        return entry
+
+    def lineage(self, path: Path, depth: int = 10) -> List[Dict[str, Any]]:
+        """沿输入向上追溯图层来源，返回 [当前图层, 其输入, 输入的输入, ...]"""
+        chain, queue, seen = [], [str(Path(path).resolve())], set()
+        while queue and len(chain) < depth:
+            key = queue.pop(0)
+            if key in seen:
+                continue
+            seen.add(key)
+            entry = self._memo.get(key) or self._load(key)
+            if entry is None:
+                continue
+            chain.append(
+                {
+                    "path": key,
+                    "tool": entry["tool"],
+                    "params": entry["params"],
+                    "inputs": entry["inputs"],
+                }
+            )
+            queue.extend(i["path"] for i in entry["inputs"] or [])
+        return chain
+
+
+def _safe_hash(path: Path) -> Optional[str]:
+    try:
+        return content_hash(path)
+    except OSError:
+        return None
+
+
+_instance: Optional[LayerCatalog] = None
+_instance_lock = threading.Lock()
+
+
+def get_layer_catalog() -> Optional[LayerCatalog]:
+    """获取全局图层目录，配置 layer_catalog.enabled 为 false 时返回 None"""
+    global _instance
+    if not ConfigManager.get("layer_catalog.enabled", True):
+        return None
+    with _instance_lock:
+        if _instance is None:
+            _instance = LayerCatalog(
+                ConfigManager.get(
+                    "layer_catalog.path", "data/uploads/cache/layer_catalog.sqlite"
+                )
+            )
+    return _instance
+
+
+def describe_layer(path: Path) -> Dict[str, Any]:
+    """查询图层元数据；目录关闭时直接扫描文件"""
+    catalog = get_layer_catalog()
+    if catalog is None:
+        path = Path(path)
+        return {"path": str(path.resolve()), **_scan(path)}
+    return catalog.describe(path)
+
+
+def record_layer(
+    path: Path,
+    tool: Optional[str] = None,
+    params: Optional[Dict[str, Any]] = None,
+    inputs: Optional[List[Path]] = None,
+):
+    """登记图层，失败时只记录警告，不影响工具结果"""
+    catalog = get_layer_catalog()
+    if catalog is None:
+        return
+    try:
+        catalog.record(path, tool=tool, params=params, inputs=inputs)
+    except Exception as e:
+        logger.warning(f"图层登记失败: {path}，{e}")
@@ -1,39 +1,163 @@
+# 日志
+# 所有模块的日志记录先进入内存队列（QueueHandler），由每个进程一个后台线程（QueueListener）统一写到控制台和滚动日志文件，
+# 记录日志的线程不再等待磁盘写入。日志级别按模块在 config.yaml 的 logging 节配置。
 from datetime import datetime
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
+import threading
+from config.config import ConfigManager
 
 global_log_time = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
 
+_FORMAT = "[%(asctime)s] %(levelname)s - %(name)s - %(message)s"
+_DATEFMT = "%Y-%m-%d %H:%M:%S"
 
-def get_logger(name=__name__, log_dir=r"LOG", log_filename=f"{global_log_time}.log"):
-    logger = logging.getLogger(name)
+_LOCK = threading.RLock()
+_LOGGERS = set()
+_listener = None
+_listener_pid = None
+# 默认参数，configure_logging 按配置覆盖
+_settings = {"log_dir": r"LOG", "log_filename": f"{global_log_time}.log"}
+
+
+class _ProcessQueueHandler(logging.handlers.QueueHandler):
+    """
+    进程内共享的队列 handler
+
+    fork 出的子进程不会继承父进程的写日志线程，首次写日志时在子进程中重新创建队列和线程。
+    """
+
+    def emit(self, record):
+        if _listener_pid != os.getpid():
+            _start_listener()
+        super().emit(record)
+
+
+_queue_handler = _ProcessQueueHandler(queue.SimpleQueue())
+
+
+def _setting(key: str, default):
+    """读取 logging 节配置，配置尚未加载时使用默认值"""
+    if not ConfigManager.is_loaded():
+        return default
+    return ConfigManager.get(f"logging.{key}", default)
+
+
+def _build_handlers():
+    formatter = logging.Formatter(_FORMAT, datefmt=_DATEFMT)
+    handlers = []
 
-    if not logger.handlers:  # 防止重复添加 handler
-        logger.setLevel(logging.DEBUG)
+    # 控制台输出
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(formatter)
+    handlers.append(console_handler)
 
-        formatter = logging.Formatter(
-            "[%(asctime)s] %(levelname)s - %(name)s - %(message)s",
-            datefmt="%Y-%m-%d %H:%M:%S",
+    # 滚动日志文件：按大小或按时间
+    log_dir = _settings["log_dir"]
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+        log_filename = _settings["log_filename"]
+        if ConfigManager.is_loaded() and ConfigManager.get("server.workers", 1) > 1:
+            # 多进程部署时各进程写各自的日志文件，避免多个进程同时滚动同一个文件
+            stem, ext = os.path.splitext(log_filename)
+            log_filename = f"{stem}_{os.getpid()}{ext}"
+        full_log_path = os.path.join(log_dir, log_filename)
+        rotation = _setting("rotation", "size")
+        backup_count = _setting("backup_count", 10)
+        if rotation == "time":
+            file_handler = logging.handlers.TimedRotatingFileHandler(
+                full_log_path,
+                when=_setting("when", "midnight"),
+                backupCount=backup_count,
+                encoding="utf-8",
+            )
+        else:
+            file_handler = logging.handlers.RotatingFileHandler(
+                full_log_path,
+                maxBytes=_setting("max_bytes", 50 * 1024 * 1024),
+                backupCount=backup_count,
+                encoding="utf-8",
+            )
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+    return handlers
+
+
+def _start_listener():
+    """创建当前进程的日志队列和写日志线程；已存在时按当前配置替换输出 handler"""
+    global _listener, _listener_pid
+    with _LOCK:
+        if _listener is not None and _listener_pid == os.getpid():
+            old_handlers = _listener.handlers
+            _listener.handlers = tuple(_build_handlers())
+            for handler in old_handlers:
+                handler.close()
+            return
+        # fork 后父进程的队列状态不可靠，子进程使用新队列
+        _queue_handler.queue = queue.SimpleQueue()
+        _listener = logging.handlers.QueueListener(
+            _queue_handler.queue, *_build_handlers(), respect_handler_level=True
         )
+        _listener.start()
+        _listener_pid = os.getpid()
+
+
+def _stop_listener():
+    """进程退出时写完队列中剩余的日志"""
+    global _listener
+    with _LOCK:
+        if _listener is not None and _listener_pid == os.getpid():
+            _listener.stop()
+            _listener = None
+
+
+atexit.register(_stop_listener)
 
-        # 控制台输出
-        console_handler = logging.StreamHandler()
-        console_handler.setFormatter(formatter)
-        logger.addHandler(console_handler)
 
-        # 创建文件处理器
-        if log_dir:
-            # 确保日志目录存在
-            if not os.path.exists(log_dir):
-                os.makedirs(log_dir)
+def _level_for(name: str) -> int:
+    """模块日志级别：logging.levels 中最长匹配的前缀，否则为 logging.level"""
+    levels = _setting("levels", {}) or {}
+    level = _setting("level", "DEBUG")
+    best = -1
+    for prefix, value in levels.items():
+        if (name == prefix or name.startswith(prefix + ".")) and len(prefix) > best:
+            level, best = value, len(prefix)
+    return logging.getLevelName(str(level).upper())
 
-            full_log_path = os.path.join(log_dir, log_filename)
 
-            file_handler = logging.FileHandler(full_log_path, encoding="utf-8")
-            file_handler.setFormatter(formatter)
-            logger.addHandler(file_handler)
+def configure_logging():
+    """
+    按配置重新设置日志：文件滚动方式和各模块日志级别
+
+    在 ConfigManager 加载配置后调用（主进程启动时、子进程初始化时），
+    对之前已创建的 logger 同样生效。
+    """
+    with _LOCK:
+        _start_listener()
+        for name in _LOGGERS:
+            logging.getLogger(name).setLevel(_level_for(name))
+
+
+def get_logger(name=__name__, log_dir=r"LOG", log_filename=f"{global_log_time}.log"):
+    """
+    获取模块 logger
+
+    消息请使用 %-格式参数（logger.debug("读取 %s", path)），级别未开启时不会格式化。
+    log_dir / log_filename 只在首次创建写日志线程前生效，所有模块共用同一个日志文件。
+    """
+    logger = logging.getLogger(name)
 
-        # 禁用传播到根日志记录器
-        logger.propagate = False
+    with _LOCK:
+        if name not in _LOGGERS:  # 防止重复添加 handler
+            if _listener is None:
+                _settings.update(log_dir=log_dir, log_filename=log_filename)
+            logger.setLevel(_level_for(name))
+            logger.addHandler(_queue_handler)
+            # 禁用传播到根日志记录器
+            logger.propagate = False
+            _LOGGERS.add(name)
 
     return logger
@@ -0,0 +1,283 @@
+# 分阶段耗时统计
+# 工具和上传流程的各阶段（read/repair/reproject/compute/write/serialize）用 span 记录耗时、要素数和字节数，
+# 汇总为直方图/计数器，通过 /metrics 以 Prometheus 文本格式输出。
+# 多 worker 部署时各进程把累计数据定期写到共享目录中以进程区分的快照文件，输出时合并所有快照（含已退出的 worker），
+# 因此任意 worker 响应 /metrics 得到的都是全局汇总。
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from utils import profiler
+from utils.logger import get_logger
+
+logger = get_logger("metrics")
+
+# 耗时直方图的桶上界（秒）
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_HELP = {
+    "gw_stage_duration_seconds": ("histogram", "各工具各阶段耗时（秒）"),
+    "gw_stage_features_total": ("counter", "各工具各阶段处理的要素数"),
+    "gw_stage_bytes_total": ("counter", "各工具各阶段读写/序列化的字节数"),
+    "gw_tool_duration_seconds": ("histogram", "工具调用总耗时（秒）"),
+    "gw_tool_calls_total": ("counter", "工具调用次数"),
+}
+
+_LOCK = threading.Lock()
+# (指标名, 标签) -> [各桶计数..., 总和, 次数]
+_HISTOGRAMS: Dict[Tuple[str, Tuple], list] = {}
+# (指标名, 标签) -> 累计值
+_COUNTERS: Dict[Tuple[str, Tuple], float] = {}
+
+# 多进程模式下本进程的快照文件，None 表示只输出本进程的数据
+_SNAPSHOT_PATH: Optional[Path] = None
+_SNAPSHOT_PID: Optional[int] = None
+_DIRTY = threading.Event()
+
+# 当前执行的工具名，span 以此作为 tool 标签
+_CURRENT_TOOL = contextvars.ContextVar("gw_current_tool", default="unknown")
+
+
+class Span:
+    """一个阶段的测量结果，可在 with 块内补充 features / bytes"""
+
+    __slots__ = ("stage", "features", "bytes", "seconds")
+
+    def __init__(self, stage: str, features: Optional[int], nbytes: Optional[int]):
+        self.stage = stage
+        self.features = features
+        self.bytes = nbytes
+        self.seconds = 0.0
+
+
+def _observe(name: str, labels: Tuple, value: float):
+    entry = _HISTOGRAMS.get((name, labels))
+    if entry is None:
+        entry = _HISTOGRAMS[(name, labels)] = [0] * len(BUCKETS) + [0.0, 0]
+    for i, bound in enumerate(BUCKETS):
+        if value <= bound:
+            entry[i] += 1
+            break
+    entry[-2] += value
+    entry[-1] += 1
+    _DIRTY.set()
+
+
+def _inc(name: str, labels: Tuple, value: float):
+    _COUNTERS[(name, labels)] = _COUNTERS.get((name, labels), 0) + value
+    _DIRTY.set()
+
+
+def current_tool() -> str:
+    return _CURRENT_TOOL.get()
+
+
+@contextmanager
+def tool_context(tool: str):
+    """标记当前执行的工具，并记录调用次数（按成功/失败）和总耗时"""
+    token = _CURRENT_TOOL.set(tool)
+    start = time.perf_counter()
+    status = "error"
+    try:
+        yield
+        status = "ok"
+    finally:
+        elapsed = time.perf_counter() - start
+        _CURRENT_TOOL.reset(token)
+        with _LOCK:
+            _observe("gw_tool_duration_seconds", (("tool", tool),), elapsed)
+            _inc("gw_tool_calls_total", (("tool", tool), ("status", status)), 1)
+
+
+@contextmanager
+def span(stage: str, features: Optional[int] = None, nbytes: Optional[int] = None):
+    """
+    记录一个阶段的耗时
+
+    Example:
+        >>> with span("write", features=len(gdf)) as s:
+        ...     gdf.to_file(path)
+        ...     s.bytes = path.stat().st_size
+    """
+    s = Span(stage, features, nbytes)
+    start = time.perf_counter()
+    try:
+        # 开启内存分析时同时记录该阶段的内存分配
+        with profiler.stage(stage):
+            yield s
+    finally:
+        s.seconds = time.perf_counter() - start
+        labels = (("tool", current_tool()), ("stage", stage))
+        with _LOCK:
+            _observe("gw_stage_duration_seconds", labels, s.seconds)
+            if s.features is not None:
+                _inc("gw_stage_features_total", labels, s.features)
+            if s.bytes is not None:
+                _inc("gw_stage_bytes_total", labels, s.bytes)
+
+
+def drain() -> dict:
+    """取出并清空当前进程的统计数据（子进程把结果交给主进程合并）"""
+    with _LOCK:
+        snapshot = {"histograms": dict(_HISTOGRAMS), "counters": dict(_COUNTERS)}
+        _HISTOGRAMS.clear()
+        _COUNTERS.clear()
+    return snapshot
+
+
+def _merge_into(histograms: dict, counters: dict, snapshot: dict):
+    for key, entry in snapshot.get("histograms", {}).items():
+        current = histograms.get(key)
+        if current is None:
+            histograms[key] = list(entry)
+        else:
+            histograms[key] = [a + b for a, b in zip(current, entry)]
+    for key, value in snapshot.get("counters", {}).items():
+        counters[key] = counters.get(key, 0) + value
+
+
+def merge(snapshot: dict):
+    """合并其他进程 drain() 得到的统计数据"""
+    with _LOCK:
+        _merge_into(_HISTOGRAMS, _COUNTERS, snapshot)
+        if snapshot.get("histograms") or snapshot.get("counters"):
+            _DIRTY.set()
+
+
+# ----------------------------- 多进程汇总 -----------------------------
+def _dump(histograms: dict, counters: dict) -> str:
+    """(指标名, 标签) 元组键转为列表后序列化"""
+    return json.dumps(
+        {
+            "histograms": [[n, labels, e] for (n, labels), e in histograms.items()],
+            "counters": [[n, labels, v] for (n, labels), v in counters.items()],
+        },
+        ensure_ascii=False,
+    )
+
+
+def _load(text: str) -> dict:
+    data = json.loads(text)
+
+    def key(name, labels):
+        return name, tuple(tuple(item) for item in labels)
+
+    return {
+        "histograms": {key(n, l): e for n, l, e in data["histograms"]},
+        "counters": {key(n, l): v for n, l, v in data["counters"]},
+    }
+
+
+def flush():
+    """多进程模式下把本进程的累计数据写入快照文件（先写临时文件再替换，读取方不会读到半个文件）"""
+    # fork 出的任务子进程继承了快照路径，其数据由主进程合并，不写文件
+    if _SNAPSHOT_PATH is None or _SNAPSHOT_PID != os.getpid():
+        return
+    with _LOCK:
+        _DIRTY.clear()
+        text = _dump(_HISTOGRAMS, _COUNTERS)
+    tmp = _SNAPSHOT_PATH.with_suffix(".tmp")
+    try:
+        tmp.write_text(text, encoding="utf-8")
+        os.replace(tmp, _SNAPSHOT_PATH)
+    except OSError as e:
+        _DIRTY.set()
+        logger.warning(f"指标快照写入失败: {_SNAPSHOT_PATH}，{e}")
+
+
+def _flush_loop(interval: float):
+    while True:
+        time.sleep(interval)
+        if _DIRTY.is_set():
+            flush()
+
+
+def reset_multiprocess_dir(directory: Path):
+    """清空共享目录中上次运行留下的快照（在启动各 worker 之前由主进程调用）"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for f in directory.glob("*.json"):
+        f.unlink(missing_ok=True)
+
+
+def enable_multiprocess(directory: Path, interval: float = 5):
+    """
+    开启多进程汇总：本进程每隔 interval 秒（有新数据时）把累计数据写到 directory 下的快照文件，
+    render_prometheus 输出所有快照之和
+
+    快照文件名包含进程号和启动时间，worker 重启后即使进程号被复用也不会覆盖已退出 worker 的数据。
+    """
+    global _SNAPSHOT_PATH, _SNAPSHOT_PID
+    if _SNAPSHOT_PATH is not None and _SNAPSHOT_PID == os.getpid():
+        return
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    _SNAPSHOT_PID = os.getpid()
+    _SNAPSHOT_PATH = directory / f"{_SNAPSHOT_PID}_{time.time_ns()}.json"
+    threading.Thread(
+        target=_flush_loop, args=(interval,), name="metrics-flush", daemon=True
+    ).start()
+    flush()
+
+
+def _collect() -> Tuple[dict, dict]:
+    """当前要输出的数据：单进程为本进程数据，多进程模式为共享目录中所有快照之和"""
+    if _SNAPSHOT_PATH is None:
+        with _LOCK:
+            return {k: list(v) for k, v in _HISTOGRAMS.items()}, dict(_COUNTERS)
+    # 先写出本进程的最新数据，其他 worker 的快照最多滞后一个写入周期
+    flush()
+    histograms, counters = {}, {}
+    for f in sorted(_SNAPSHOT_PATH.parent.glob("*.json")):
+        try:
+            snapshot = _load(f.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logger.warning(f"指标快照读取失败: {f}，{e}")
+            continue
+        _merge_into(histograms, counters, snapshot)
+    return histograms, counters
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Tuple, extra: Tuple = ()) -> str:
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+def render_prometheus() -> str:
+    """以 Prometheus 文本格式输出所有指标（多进程模式下为所有 worker 的汇总）"""
+    histograms, counters = _collect()
+
+    lines = []
+    for name, (kind, help_text) in _HELP.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == "histogram":
+            for (metric, labels), entry in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(BUCKETS, entry):
+                    cumulative += count
+                    lines.append(
+                        f"{name}_bucket{_format_labels(labels, (('le', bound),))} {cumulative}"
+                    )
+                lines.append(
+                    f"{name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {entry[-1]}"
+                )
+                lines.append(f"{name}_sum{_format_labels(labels)} {entry[-2]}")
+                lines.append(f"{name}_count{_format_labels(labels)} {entry[-1]}")
+        else:
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
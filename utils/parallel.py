@@ -0,0 +1,32 @@
+# 工具内部进程池的并行度
+# 任务调度器按一个进程计入每个任务的进程数和内存预算；工具在调度器子进程中再启动自己的进程池时，
+# 额外的进程不受准入控制，并发的大任务会同时放大数倍内存占用。因此在调度器子进程中一律串行执行。
+from typing import Optional
+from config.config import ConfigManager
+from utils.logger import get_logger
+
+logger = get_logger("parallel")
+
+_IN_SCHEDULER_WORKER = False
+
+
+def mark_scheduler_worker():
+    """标记当前进程为任务调度器子进程（由子进程初始化函数调用）"""
+    global _IN_SCHEDULER_WORKER
+    _IN_SCHEDULER_WORKER = True
+
+
+def resolve_workers(workers: Optional[int], config_key: str, default: int) -> int:
+    """
+    确定工具内部进程池的进程数：参数优先，其次配置，调度器子进程中固定为 1
+
+    Args:
+        workers: 调用方指定的进程数，为空时从配置获取
+        config_key: 配置项，如 "dissolve.workers"
+        default: 配置缺失时的默认值
+    """
+    workers = workers or ConfigManager.get(config_key, default)
+    if _IN_SCHEDULER_WORKER and workers > 1:
+        logger.debug(f"在任务调度器子进程中执行，{config_key} 由 {workers} 改为 1")
+        return 1
+    return workers
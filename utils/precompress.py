@@ -0,0 +1,120 @@
+# 预压缩
+# 工具输出、入库展示文件等产物写出后，同时生成 .gz（安装了 brotli 时还有 .br）压缩版本，
+# 静态文件服务按 Accept-Encoding 直接返回压缩文件，请求时不再压缩。
+import gzip
+import os
+import shutil
+from pathlib import Path
+from typing import List, Optional
+from config.config import ConfigManager
+from utils.logger import get_logger
+from utils.vector_io import layer_components
+
+logger = get_logger("precompress")
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+_CHUNK_SIZE = 1 << 20
+
+# Content-Encoding -> 压缩文件后缀，按优先顺序排列
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+_DEFAULT_SUFFIXES = (".geojson", ".json", ".csv", ".shp", ".dbf")
+
+
+def variant_path(path: Path, encoding: str) -> Path:
+    """文件的压缩版本路径，如 a.geojson -> a.geojson.gz"""
+    path = Path(path)
+    return path.with_name(path.name + dict(ENCODINGS)[encoding])
+
+
+def variants(path: Path) -> List[Path]:
+    """已存在的压缩版本"""
+    return [
+        p for p in (variant_path(path, e) for e, _ in ENCODINGS) if p.exists()
+    ]
+
+
+def fresh_variant(path: Path, encoding: str) -> Optional[Path]:
+    """返回不早于原文件的压缩版本；原文件在压缩后被改写过时视为过期，返回 None"""
+    variant = variant_path(path, encoding)
+    try:
+        if variant.stat().st_mtime_ns >= Path(path).stat().st_mtime_ns:
+            return variant
+    except FileNotFoundError:
+        pass
+    return None
+
+
+def _compressible(path: Path) -> bool:
+    suffixes = ConfigManager.get("compression.suffixes", list(_DEFAULT_SUFFIXES))
+    if path.suffix.lower() not in suffixes:
+        return False
+    return path.stat().st_size >= ConfigManager.get("compression.min_bytes", 1024)
+
+
+def _compress(path: Path, encoding: str, tmp_path: Path):
+    with path.open("rb") as src:
+        if encoding == "gzip":
+            level = ConfigManager.get("compression.gzip_level", 6)
+            # mtime=0：相同内容得到相同的压缩文件
+            with gzip.GzipFile(tmp_path, "wb", compresslevel=level, mtime=0) as dst:
+                shutil.copyfileobj(src, dst, _CHUNK_SIZE)
+            return
+        compressor = brotli.Compressor(
+            quality=ConfigManager.get("compression.brotli_quality", 5)
+        )
+        with tmp_path.open("wb") as dst:
+            for chunk in iter(lambda: src.read(_CHUNK_SIZE), b""):
+                dst.write(compressor.process(chunk))
+            dst.write(compressor.finish())
+
+
+def precompress(path: Path) -> List[Path]:
+    """
+    为单个文件生成压缩版本（先写临时文件再替换）；压缩后没有变小的版本不保留
+
+    Returns:
+        List[Path]: 生成的压缩文件
+    """
+    path = Path(path)
+    if not path.is_file() or not _compressible(path):
+        return []
+    size = path.stat().st_size
+    written = []
+    for encoding, suffix in ENCODINGS:
+        if encoding == "br" and brotli is None:
+            continue
+        variant = variant_path(path, encoding)
+        tmp_path = variant.with_name(f"{variant.name}.{os.getpid()}.tmp")
+        try:
+            _compress(path, encoding, tmp_path)
+            if tmp_path.stat().st_size >= size:
+                tmp_path.unlink()
+                continue
+            os.replace(tmp_path, variant)
+        except OSError:
+            if tmp_path.exists():
+                tmp_path.unlink()
+            raise
+        written.append(variant)
+    return written
+
+
+def precompress_artifact(path: Path) -> List[Path]:
+    """为产物（图层的各组成文件或单个文件）生成压缩版本，失败时只记录警告"""
+    if not ConfigManager.get("compression.precompress", True):
+        return []
+    written = []
+    try:
+        for f in layer_components(path):
+            written.extend(precompress(f))
+    except Exception as e:
+        logger.warning(f"预压缩失败: {path}，{e}")
+        return written
+    if written:
+        logger.debug("已生成压缩版本: %s", [p.name for p in written])
+    return written
@@ -0,0 +1,263 @@
+# 工具调用内存分析
+# 开启后，对单次工具调用 / 上传处理逐阶段记录 tracemalloc 峰值与主要分配位置、进程峰值 RSS，
+# 以及各阶段 GeoDataFrame 的内存占用，每次调用写出一份 JSON 报告。
+# 通过配置 profiling.enabled 全局开启，或按请求（X-Profile 请求头）开启；关闭时每个阶段只多一次 ContextVar 读取。
+import contextvars
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from config.config import ConfigManager
+from utils.logger import get_logger
+
+logger = get_logger("profiler")
+
+try:
+    import psutil
+
+    _PROCESS = psutil.Process()
+except ImportError:
+    _PROCESS = None
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_MB = 1024 * 1024
+# 分析自身产生的分配不计入报告
+_IGNORE = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+)
+
+_CURRENT_PROFILE = contextvars.ContextVar("gw_current_profile", default=None)
+# 按请求开启/关闭分析，优先于配置
+_REQUESTED = contextvars.ContextVar("gw_profile_requested", default=None)
+
+
+def _rss() -> Dict[str, Optional[float]]:
+    """当前 RSS 与进程峰值 RSS（MB），无法获取时为 None"""
+    current = peak = None
+    if _PROCESS is not None:
+        info = _PROCESS.memory_info()
+        current = info.rss / _MB
+        # Windows 提供 peak_wset，其余平台用 getrusage
+        peak = getattr(info, "peak_wset", None)
+        peak = peak / _MB if peak else None
+    if peak is None and resource is not None:
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 单位为 KB，macOS 为字节
+        peak = maxrss / _MB if sys.platform == "darwin" else maxrss / 1024
+    return {
+        "rss_mb": round(current, 1) if current is not None else None,
+        "peak_rss_mb": round(peak, 1) if peak is not None else None,
+    }
+
+
+def frame_memory(df) -> Dict[str, Any]:
+    """
+    估算 (Geo)DataFrame 的内存占用（字节）
+
+    memory_usage(deep=True) 对几何列只统计对象指针，几何坐标按坐标数 × 维度 × 8 字节另行估算。
+    """
+    attrs = int(df.memory_usage(deep=True, index=True).sum())
+    result = {"rows": len(df), "attrs_bytes": attrs, "geometry_bytes": 0}
+    geometry = getattr(df, "geometry", None) if hasattr(df, "crs") else None
+    if geometry is not None:
+        import shapely
+
+        geoms = geometry.to_numpy()
+        coords = int(shapely.get_num_coordinates(geoms).sum())
+        dims = 3 if geometry.has_z.any() else 2
+        result["geometry_bytes"] = coords * dims * 8
+    result["total_mb"] = round((result["attrs_bytes"] + result["geometry_bytes"]) / _MB, 2)
+    return result
+
+
+class CallProfile:
+    """单次调用的分析结果，各阶段按执行顺序记录"""
+
+    def __init__(self, name: str, top_n: int):
+        self.name = name
+        self.top_n = top_n
+        self.started = datetime.now()
+        self.stages: List[Dict[str, Any]] = []
+        self.frames: List[Dict[str, Any]] = []
+        self.summary: Dict[str, Any] = {}
+        self.report_path: Optional[str] = None
+        self._depth = 0
+        # 整个调用期间的 tracemalloc 峰值（各阶段开始时会重置峰值，需在重置前累计）
+        self._peak = 0
+
+    def _update_peak(self) -> int:
+        current, peak = tracemalloc.get_traced_memory()
+        self._peak = max(self._peak, peak)
+        return current
+
+    @contextmanager
+    def stage(self, stage: str):
+        """记录一个阶段的分配峰值、净增内存和主要分配位置"""
+        # 嵌套阶段（如 compute 中的 reproject）只在最外层做快照，避免重复开销和峰值互相重置
+        if self._depth:
+            yield
+            return
+        self._depth += 1
+        before = tracemalloc.take_snapshot()
+        current_before = self._update_peak()
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            current_after, peak = tracemalloc.get_traced_memory()
+            self._peak = max(self._peak, peak)
+            after = tracemalloc.take_snapshot()
+            self._depth -= 1
+            self.stages.append(
+                {
+                    "stage": stage,
+                    "seconds": round(seconds, 4),
+                    "traced_peak_mb": round((peak - current_before) / _MB, 2),
+                    "traced_delta_mb": round((current_after - current_before) / _MB, 2),
+                    **_rss(),
+                    "top_allocations": self._top(after, before),
+                }
+            )
+
+    def _top(self, after, before) -> List[Dict[str, Any]]:
+        """两次快照之间净增最多的分配位置"""
+        return [
+            {
+                "site": str(stat.traceback),
+                "size_diff_mb": round(stat.size_diff / _MB, 3),
+                "count_diff": stat.count_diff,
+            }
+            for stat in after.filter_traces(_IGNORE).compare_to(
+                before.filter_traces(_IGNORE), "lineno"
+            )[: self.top_n]
+        ]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "call": self.name,
+            "pid": os.getpid(),
+            "started": self.started.isoformat(timespec="seconds"),
+            **_rss(),
+            **self.summary,
+            "stages": self.stages,
+            "frames": self.frames,
+        }
+
+
+def profiling_enabled() -> bool:
+    requested = _REQUESTED.get()
+    if requested is not None:
+        return requested
+    return bool(ConfigManager.get("profiling.enabled", False))
+
+
+@contextmanager
+def request_profiling(enabled: Optional[bool] = True):
+    """在当前上下文中按请求开启（或关闭）分析，None 表示沿用配置"""
+    token = _REQUESTED.set(enabled)
+    try:
+        yield
+    finally:
+        _REQUESTED.reset(token)
+
+
+def header_enabled(value: Optional[str]) -> Optional[bool]:
+    """解析 X-Profile 请求头，未提供时返回 None"""
+    if value is None:
+        return None
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def current_profile() -> Optional[CallProfile]:
+    return _CURRENT_PROFILE.get()
+
+
+@contextmanager
+def profile_call(name: str, enabled: Optional[bool] = None):
+    """
+    对一次调用进行内存分析，结束后写出 JSON 报告
+
+    Args:
+        name: 调用名称（工具名或 process_zip）
+        enabled: 是否分析，None 时按请求设置或配置 profiling.enabled 决定
+
+    Yields:
+        CallProfile 或 None（未开启时）；报告路径在结束后保存在 profile.report_path
+    """
+    if enabled is None:
+        enabled = profiling_enabled()
+    # 未开启或已处于外层分析中（如 process_zip 内调用工具）时不重复分析
+    if not enabled or _CURRENT_PROFILE.get() is not None:
+        yield None
+        return
+
+    profile = CallProfile(name, ConfigManager.get("profiling.top_n", 10))
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(ConfigManager.get("profiling.frames", 1))
+    token = _CURRENT_PROFILE.set(profile)
+    before = tracemalloc.take_snapshot()
+    current_before = profile._update_peak()
+    start = time.perf_counter()
+    try:
+        yield profile
+    finally:
+        _CURRENT_PROFILE.reset(token)
+        current_after = profile._update_peak()
+        profile.summary = {
+            "seconds": round(time.perf_counter() - start, 4),
+            "traced_peak_mb": round((profile._peak - current_before) / _MB, 2),
+            "traced_delta_mb": round((current_after - current_before) / _MB, 2),
+            # 调用结束时仍被持有的内存（如返回的 GeoJSON）来自哪里
+            "retained_allocations": profile._top(tracemalloc.take_snapshot(), before),
+        }
+        if started_tracing:
+            tracemalloc.stop()
+        profile.report_path = _write_report(profile)
+
+
+def stage(stage: str):
+    """当前调用开启了分析时记录阶段内存，否则为空操作"""
+    profile = _CURRENT_PROFILE.get()
+    if profile is None:
+        return nullcontext()
+    return profile.stage(stage)
+
+
+def record_frame(label: str, df):
+    """当前调用开启了分析时记录 (Geo)DataFrame 的内存占用"""
+    profile = _CURRENT_PROFILE.get()
+    if profile is None or df is None:
+        return
+    try:
+        profile.frames.append({"label": label, **frame_memory(df)})
+    except Exception as e:
+        logger.debug("无法估算 %s 的内存占用: %s", label, e)
+
+
+def _write_report(profile: CallProfile) -> Optional[str]:
+    report_dir = Path(ConfigManager.get("profiling.report_dir", "data/uploads/profiles"))
+    try:
+        report_dir.mkdir(parents=True, exist_ok=True)
+        stamp = profile.started.strftime("%Y%m%d_%H%M%S_%f")
+        path = report_dir / f"{profile.name}_{stamp}_{os.getpid()}.json"
+        path.write_text(
+            json.dumps(profile.to_dict(), ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+    except OSError as e:
+        logger.warning(f"写出内存分析报告失败: {e}")
+        return None
+    logger.info(f"内存分析报告已保存到: {path}")
+    return str(path)
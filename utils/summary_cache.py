@@ -0,0 +1,202 @@
+# 分组统计结果的物化缓存
+# 以 图层内容哈希 + 分组字段 + 统计字段 为键，把 aggregate_core 的统计表（原始单位）保存在本地 SQLite 中。
+# 单位换算在命中后进行，因此 km2/亩 查询可直接复用 m2 结果；
+# sum/count/min/max/mean 还可以从更细的分组（如 [省, 县]）上卷得到粗分组（[省]）的结果，不再读取图层。
+# 缓存的统计表保留分组字段为空的组（县为空的要素仍属于某个省），上卷结果才与直接计算一致；
+# 空分组键的行由调用方在输出前去掉。
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from io import StringIO
+from pathlib import Path
+from typing import Dict, List, Optional
+import pandas as pd
+from config.config import ConfigManager
+from utils.file_handler import ensure_folder_exists
+from utils.logger import get_logger
+
+logger = get_logger("summary_cache")
+
+# 可由细分组上卷的统计量 -> 上卷所需的统计量
+ROLLUP_STATS = {
+    "sum": ("sum",),
+    "count": ("count",),
+    "min": ("min",),
+    "max": ("max",),
+    "mean": ("sum", "count"),
+}
+
+# 缓存格式版本，低于此版本的缓存（未保留空分组键）在打开时清空
+_SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS summaries (
+    layer_path TEXT NOT NULL,
+    layer_hash TEXT NOT NULL,
+    group_key TEXT NOT NULL,
+    field TEXT NOT NULL,
+    stats TEXT NOT NULL,
+    data TEXT NOT NULL,
+    created REAL NOT NULL,
+    PRIMARY KEY (layer_hash, group_key, field)
+)
+"""
+
+
+def _group_key(group_fields: List[str]) -> str:
+    return json.dumps(list(group_fields), ensure_ascii=False)
+
+
+class SummaryCache:
+    """分组统计物化缓存，同一图层路径内容变化后旧结果自动删除"""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        ensure_folder_exists(self.db_path.parent)
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            if conn.execute("PRAGMA user_version").fetchone()[0] < _SCHEMA_VERSION:
+                conn.execute("DROP TABLE IF EXISTS summaries")
+                conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+            conn.execute(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """打开连接，正常退出时提交事务，最终关闭连接"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _entries(self, layer_hash: str, field: str) -> List[tuple]:
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT group_key, stats, data FROM summaries "
+                "WHERE layer_hash = ? AND field = ?",
+                (layer_hash, field),
+            ).fetchall()
+
+    @staticmethod
+    def _load(data: str) -> pd.DataFrame:
+        return pd.read_json(
+            StringIO(data), orient="split", dtype=False, convert_dates=False
+        )
+
+    def _lookup_field(
+        self, layer_hash: str, group_fields: List[str], field: str, names: List[str]
+    ) -> Optional[pd.DataFrame]:
+        """查找单个字段的统计结果：优先精确命中，其次从包含全部分组字段的细分组上卷"""
+        columns = [f"{field}_{name}" for name in names]
+        rollup = all(name in ROLLUP_STATS for name in names)
+        needed = {s for name in names for s in ROLLUP_STATS.get(name, ())}
+        candidates = []
+        for group_key, stats, data in self._entries(layer_hash, field):
+            cached_groups, cached_stats = json.loads(group_key), set(json.loads(stats))
+            if cached_groups == list(group_fields) and set(names) <= cached_stats:
+                return self._load(data)[list(group_fields) + columns]
+            if (
+                rollup
+                and set(group_fields) <= set(cached_groups)
+                and needed <= cached_stats
+            ):
+                candidates.append((len(cached_groups), data))
+        if not candidates:
+            return None
+
+        # 分组字段最少的缓存行数最少，上卷最快
+        table = self._load(min(candidates, key=lambda c: c[0])[1])
+        grouped = table.groupby(list(group_fields), sort=True, dropna=False)
+        result = pd.DataFrame(index=grouped.size().index)
+        for name in names:
+            if name == "mean":
+                result[f"{field}_mean"] = (
+                    grouped[f"{field}_sum"].sum() / grouped[f"{field}_count"].sum()
+                )
+            else:
+                agg = "sum" if name in ("sum", "count") else name
+                result[f"{field}_{name}"] = grouped[f"{field}_{name}"].agg(agg)
+        return result.reset_index()
+
+    def get(
+        self, layer_hash: str, group_fields: List[str], stats: Dict[str, List[str]]
+    ) -> Optional[pd.DataFrame]:
+        """
+        查询缓存的统计表（原始单位），任一字段未命中时返回 None
+
+        Returns:
+            pd.DataFrame: 分组字段 + {字段}_{统计量} 列，与 aggregate_core 计算结果的列顺序一致，
+                含分组字段为空的组
+        """
+        table = None
+        for field, names in stats.items():
+            part = self._lookup_field(layer_hash, group_fields, field, names)
+            if part is None:
+                return None
+            table = (
+                part
+                if table is None
+                else table.merge(part, on=list(group_fields), how="outer")
+            )
+        return table
+
+    def put(
+        self,
+        layer_path: Path,
+        layer_hash: str,
+        group_fields: List[str],
+        stats: Dict[str, List[str]],
+        table: pd.DataFrame,
+    ):
+        """保存统计表（原始单位，需保留分组字段为空的组），每个字段单独保存以便不同查询组合复用"""
+        layer_path = str(Path(layer_path).resolve())
+        group_key = _group_key(group_fields)
+        rows = []
+        for field, names in stats.items():
+            columns = list(group_fields) + [f"{field}_{name}" for name in names]
+            part = table[columns].copy()
+            for key in group_fields:
+                part[key] = part[key].astype(object)
+            rows.append(
+                (
+                    layer_path,
+                    layer_hash,
+                    group_key,
+                    field,
+                    json.dumps(names),
+                    part.to_json(orient="split", index=False, force_ascii=False),
+                    time.time(),
+                )
+            )
+        with self._lock, self._connect() as conn:
+            # 同一路径的图层内容已变化，旧的统计结果失效
+            conn.execute(
+                "DELETE FROM summaries WHERE layer_path = ? AND layer_hash != ?",
+                (layer_path, layer_hash),
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO summaries VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+            )
+        logger.debug("统计结果已缓存: %s，分组: %s", layer_path, group_fields)
+
+
+_instance: Optional[SummaryCache] = None
+_instance_lock = threading.Lock()
+
+
+def get_summary_cache() -> Optional[SummaryCache]:
+    """获取全局统计缓存，配置 summary_cache.enabled 为 false 时返回 None"""
+    global _instance
+    if not ConfigManager.get("summary_cache.enabled", True):
+        return None
+    with _instance_lock:
+        if _instance is None:
+            _instance = SummaryCache(
+                ConfigManager.get(
+                    "summary_cache.path", "data/uploads/cache/summary_cache.sqlite"
+                )
+            )
+    return _instance
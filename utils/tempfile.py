@@ -6,23 +6,42 @@ import atexit
 from config.config import ConfigManager
 
 
-# 全局变量，用于存储会话临时根目录
+# 全局变量，用于存储会话临时根目录（每个进程各一个）
 _SESSION_TEMP_ROOT = None
 _TRACKED_TEMP_FILES = set()
 _TRACKED_TEMP_DIRS = set()
 
 
 def _get_session_temp_root():
-    """获取或创建会话临时根目录"""
+    """
+    获取或创建当前进程的会话临时根目录
+
+    目录名带进程号：多个 worker 同一秒启动时不会共用根目录，
+    某个 worker 退出时的 cleanup_all 也不会删除其他 worker 正在使用的临时文件。
+    """
     global _SESSION_TEMP_ROOT
     if _SESSION_TEMP_ROOT is None:
         PROGRAM_START_TIME = datetime.now().strftime("%Y%m%d_%H%M%S")
         CONFIG_TEMP_DIR = ConfigManager.get("temp_dir") or tempfile.gettempdir()
-        _SESSION_TEMP_ROOT = os.path.join(CONFIG_TEMP_DIR, f"{PROGRAM_START_TIME}")
+        _SESSION_TEMP_ROOT = os.path.join(
+            CONFIG_TEMP_DIR, f"{PROGRAM_START_TIME}_{os.getpid()}"
+        )
         os.makedirs(_SESSION_TEMP_ROOT, exist_ok=True)
     return _SESSION_TEMP_ROOT
 
 
+def _reset_after_fork():
+    """fork 出的子进程使用自己的临时根目录，不追踪（也不在退出时删除）父进程的临时文件"""
+    global _SESSION_TEMP_ROOT
+    _SESSION_TEMP_ROOT = None
+    _TRACKED_TEMP_FILES.clear()
+    _TRACKED_TEMP_DIRS.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
 def mkd_temp(prefix="tmp", suffix="", dir=None):
     """
     创建临时子文件/子目录。如果未提供 `dir`，则创建一个可在程序退出时自动删除的临时文件并返回其路径。
@@ -32,22 +51,21 @@ def mkd_temp(prefix="tmp", suffix="", dir=None):
 
     注意：在 Windows 上，打开的临时文件不能被其他进程删除，因此我们使用 delete=False 并在退出时删除。
     """
-    if dir:
-        base_dir = dir
-        os.makedirs(base_dir, exist_ok=True)
+    base_dir = dir if dir else _get_session_temp_root()
+    os.makedirs(base_dir, exist_ok=True)
 
-        # 在指定目录下创建命名临时文件（而不是临时目录），便于直接用 open 写入。
-        tmp = tempfile.NamedTemporaryFile(
-            prefix=prefix, suffix=suffix, dir=base_dir, delete=False
-        )
-        tmp_path = tmp.name
-        try:
-            tmp.close()
-        except Exception:
-            pass
+    # 在指定目录下创建命名临时文件（而不是临时目录），便于直接用 open 写入。
+    tmp = tempfile.NamedTemporaryFile(
+        prefix=prefix, suffix=suffix, dir=base_dir, delete=False
+    )
+    tmp_path = tmp.name
+    try:
+        tmp.close()
+    except Exception:
+        pass
 
-        _TRACKED_TEMP_FILES.add(tmp_path)
-        return tmp_path
+    _TRACKED_TEMP_FILES.add(tmp_path)
+    return tmp_path
 
 
 def mkd_tempdir(prefix="tmp", suffix="", dir=None):
@@ -64,6 +82,33 @@ def mkd_tempdir(prefix="tmp", suffix="", dir=None):
     return tmp_dir
 
 
+def release_temp(path):
+    """
+    立即删除追踪的临时文件并停止追踪。
+
+    长时间运行的服务中，用完的临时文件应调用此函数释放，否则追踪集合会持续增长直到进程退出。
+    """
+    try:
+        if path and os.path.exists(path):
+            os.remove(path)
+    except Exception:
+        # 删除失败（文件被占用）时保留追踪，退出时再尝试
+        return
+    _TRACKED_TEMP_FILES.discard(path)
+
+
+def release_tempdir(path):
+    """立即删除追踪的临时目录及其内容并停止追踪（删除失败时保留追踪，退出时再尝试）"""
+    import shutil
+
+    try:
+        if path and os.path.exists(path):
+            shutil.rmtree(path)
+    except Exception:
+        return
+    _TRACKED_TEMP_DIRS.discard(path)
+
+
 def cleanup_all():
     """
     清理整个 SESSION_TEMP_ROOT 目录（慎用）
@@ -90,9 +135,9 @@ def cleanup_all():
         finally:
             _TRACKED_TEMP_DIRS.discard(d)
 
-    # 删除会话临时根目录下的其余内容（保守删除）
-    session_root = _get_session_temp_root()
-    if os.path.exists(session_root):
+    # 删除会话临时根目录下的其余内容（保守删除）；本进程未创建过根目录时无需清理
+    session_root = _SESSION_TEMP_ROOT
+    if session_root and os.path.exists(session_root):
         try:
             shutil.rmtree(session_root)
         except Exception:
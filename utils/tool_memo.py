@@ -0,0 +1,116 @@
+# 工具调用结果缓存
+# 以 工具名 + 规范化参数 + 保存路径 + 输入内容哈希 为键，把 (保存路径, GeoJSON, 输出文件签名) 保存在本地 SQLite 中。
+# 工具在任务调度器的子进程和多个服务 worker 中执行，进程内的字典无法跨进程复用结果，因此放在共享数据库中；
+# 相同调用在计算期间持有按键划分的文件锁，其他进程中的相同调用等待锁释放后直接读取结果。
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager, suppress
+from pathlib import Path
+from typing import Optional, Tuple
+from config.config import ConfigManager
+from utils.file_handler import ensure_folder_exists, file_lock
+from utils.logger import get_logger
+
+logger = get_logger("tool_memo")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS memo (
+    key TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    geojson TEXT NOT NULL,
+    signature TEXT NOT NULL,
+    last_access REAL NOT NULL
+)
+"""
+
+
+class ToolMemo:
+    """工具结果缓存，按最近使用顺序淘汰"""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        ensure_folder_exists(self.db_path.parent)
+        self.lock_dir = self.db_path.parent / f"{self.db_path.stem}_locks"
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """打开连接，正常退出时提交事务，最终关闭连接"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str) -> Optional[Tuple[str, str, tuple]]:
+        """查询缓存结果 (保存路径, GeoJSON, 输出文件签名)，并刷新最近使用时间"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT path, geojson, signature FROM memo WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE memo SET last_access = ? WHERE key = ?", (time.time(), key)
+            )
+        path, geojson, signature = row
+        return path, geojson, tuple(tuple(s) for s in json.loads(signature))
+
+    def put(self, key: str, path: str, geojson: str, signature: tuple):
+        """保存结果，超出 tool_memo.max_entries 时删除最久未使用的记录"""
+        max_entries = ConfigManager.get("tool_memo.max_entries", 64)
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO memo VALUES (?, ?, ?, ?, ?)",
+                (key, str(path), geojson, json.dumps(signature), time.time()),
+            )
+            conn.execute(
+                "DELETE FROM memo WHERE key NOT IN "
+                "(SELECT key FROM memo ORDER BY last_access DESC LIMIT ?)",
+                (max_entries,),
+            )
+
+    def delete(self, key: str):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM memo WHERE key = ?", (key,))
+
+    @contextmanager
+    def computing(self, key: str):
+        """
+        持有该键的跨进程文件锁，相同调用在其他线程或进程中等待
+
+        退出前删除锁文件，避免锁文件随调用次数累积；此时已在等待的调用拿到的是旧文件上的锁，
+        与之后新建锁文件的调用可能同时进入，但二者进入后都会先查到已保存的结果，不会重复计算。
+        """
+        lock_path = self.lock_dir / f"{key}.lock"
+        with file_lock(lock_path):
+            try:
+                yield
+            finally:
+                # Windows 下无法删除已打开的文件，保留即可
+                with suppress(OSError):
+                    lock_path.unlink()
+
+
+_instance: Optional[ToolMemo] = None
+_instance_lock = threading.Lock()
+
+
+def get_tool_memo() -> Optional[ToolMemo]:
+    """获取全局工具结果缓存，配置 tool_memo.enabled 为 false 时返回 None"""
+    global _instance
+    if not ConfigManager.get("tool_memo.enabled", True):
+        return None
+    with _instance_lock:
+        if _instance is None:
+            _instance = ToolMemo(
+                ConfigManager.get(
+                    "tool_memo.path", "data/uploads/cache/tool_memo.sqlite"
+                )
+            )
+    return _instance
@@ -0,0 +1,263 @@
+# TopoJSON 编码
+# 相邻地块的公共边界只存一次（弧段），坐标量化为整数网格并差分编码，显著减小覆盖型数据返回前端的体积。
+# 编码流程：量化坐标 -> 找出交汇点（多条边界在此分叉的顶点）-> 在交汇点处切分为弧段 -> 正反方向相同的弧段去重。
+# 交汇点检测用 numpy 对所有顶点批量完成，Python 循环只按环/弧段进行。
+import json
+from typing import Any, Dict, List, Optional
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+from config.config import ConfigManager
+
+
+class _Arcs:
+    """弧段表：正反方向相同的弧段只保存一次，反向引用记为 ~index"""
+
+    def __init__(self):
+        self.arcs: List[np.ndarray] = []
+        self._index: Dict[bytes, int] = {}
+
+    def add(self, points: np.ndarray) -> int:
+        key = points.tobytes()
+        index = self._index.get(key)
+        if index is not None:
+            return index
+        index = self._index.get(points[::-1].tobytes())
+        if index is not None:
+            return ~index
+        index = len(self.arcs)
+        self.arcs.append(points)
+        self._index[key] = index
+        return index
+
+    def encode(self) -> List[List[List[int]]]:
+        """差分编码：首点为量化坐标，其余为与前一点的差值"""
+        return [
+            np.concatenate([arc[:1], np.diff(arc, axis=0)]).tolist() for arc in self.arcs
+        ]
+
+
+class _Lines:
+    """收集所有环与折线的量化坐标，编码几何时按编号引用"""
+
+    def __init__(self, translate: np.ndarray, scale: np.ndarray):
+        self.translate = translate
+        self.scale = scale
+        self.points: List[np.ndarray] = []
+        self.closed: List[bool] = []
+
+    def quantize(self, coords: np.ndarray) -> np.ndarray:
+        return np.round((coords[:, :2] - self.translate) / self.scale).astype(np.int64)
+
+    def add(self, geom, closed: bool) -> int:
+        q = self.quantize(shapely.get_coordinates(geom))
+        # 量化后重合的相邻顶点只保留一个
+        if len(q) > 1:
+            q = q[np.concatenate([[True], np.any(np.diff(q, axis=0) != 0, axis=1)])]
+        if closed and len(q) > 1 and (q[0] == q[-1]).all():
+            # 环按不闭合的顶点序列处理，切分弧段时再闭合
+            q = q[:-1]
+        self.points.append(q)
+        self.closed.append(closed)
+        return len(self.points) - 1
+
+
+def _geometry_spec(geom, lines: _Lines) -> Optional[Dict[str, Any]]:
+    """将几何拆成环/折线（登记到 lines），返回引用其编号的几何描述"""
+    if geom is None or geom.is_empty:
+        return None
+    kind = geom.geom_type
+    if kind == "Polygon":
+        rings = [geom.exterior, *geom.interiors]
+        return {"type": kind, "arcs": [lines.add(r, True) for r in rings]}
+    if kind == "MultiPolygon":
+        return {
+            "type": kind,
+            "arcs": [
+                [lines.add(r, True) for r in (p.exterior, *p.interiors)]
+                for p in geom.geoms
+            ],
+        }
+    if kind in ("LineString", "LinearRing"):
+        return {"type": "LineString", "arcs": lines.add(geom, False)}
+    if kind == "MultiLineString":
+        return {"type": kind, "arcs": [lines.add(g, False) for g in geom.geoms]}
+    if kind == "Point":
+        return {"type": kind, "coordinates": lines.quantize(shapely.get_coordinates(geom))[0]}
+    if kind == "MultiPoint":
+        return {"type": kind, "coordinates": lines.quantize(shapely.get_coordinates(geom))}
+    # GeometryCollection
+    return {
+        "type": kind,
+        "geometries": [
+            spec for spec in (_geometry_spec(g, lines) for g in geom.geoms) if spec
+        ],
+    }
+
+
+def _junctions(lines: _Lines) -> List[np.ndarray]:
+    """
+    标记每条环/折线上的交汇点
+
+    同一顶点在不同位置出现时，若前后相邻顶点（无序）不完全相同，说明边界在此分叉，即为交汇点；
+    折线的端点总是交汇点。
+    """
+    if not lines.points:
+        return []
+    sizes = np.array([len(p) for p in lines.points])
+    points = np.concatenate(lines.points)
+    span = int(points[:, 1].max()) + 1 if len(points) else 1
+    keys = points[:, 0] * span + points[:, 1]
+
+    prev_keys = np.empty_like(keys)
+    next_keys = np.empty_like(keys)
+    endpoint = np.zeros(len(keys), dtype=bool)
+    start = 0
+    for size, closed in zip(sizes, lines.closed):
+        stop = start + size
+        part = keys[start:stop]
+        prev_keys[start:stop] = np.roll(part, 1)
+        next_keys[start:stop] = np.roll(part, -1)
+        if not closed and size:
+            endpoint[start] = endpoint[stop - 1] = True
+        start = stop
+
+    low = np.minimum(prev_keys, next_keys)
+    high = np.maximum(prev_keys, next_keys)
+    triples = np.unique(np.stack([keys, low, high], axis=1), axis=0)
+    distinct, counts = np.unique(triples[:, 0], return_counts=True)
+    junction_keys = np.union1d(distinct[counts > 1], keys[endpoint])
+    mask = np.isin(keys, junction_keys)
+    return np.split(mask, np.cumsum(sizes)[:-1])
+
+
+def _cut(points: np.ndarray, junction: np.ndarray, closed: bool, arcs: _Arcs) -> List[int]:
+    """在交汇点处将环/折线切分为弧段，返回弧段引用"""
+    if closed:
+        cuts = np.flatnonzero(junction)
+        if len(cuts) == 0:
+            # 没有交汇点的环（如孤立地块）：从最小顶点开始，相同的环不论起点和方向都能去重
+            start = int(np.lexsort((points[:, 1], points[:, 0]))[0])
+            ring = np.roll(points, -start, axis=0)
+            return [arcs.add(np.concatenate([ring, ring[:1]]))]
+        # 从第一个交汇点开始并闭合，切分点包括闭合后的终点
+        ring = np.roll(points, -cuts[0], axis=0)
+        points = np.concatenate([ring, ring[:1]])
+        cuts = np.append(cuts - cuts[0], len(ring))
+    else:
+        cuts = np.flatnonzero(junction)
+    return [
+        arcs.add(points[a : b + 1]) for a, b in zip(cuts[:-1], cuts[1:])
+    ] or [arcs.add(points)]
+
+
+def _resolve(spec: Optional[Dict[str, Any]], refs: List[List[int]]) -> Optional[Dict[str, Any]]:
+    """把几何描述中的环/折线编号替换为弧段引用"""
+    if spec is None:
+        return None
+    kind = spec["type"]
+    if kind == "Polygon":
+        return {"type": kind, "arcs": [refs[i] for i in spec["arcs"]]}
+    if kind == "MultiPolygon":
+        return {"type": kind, "arcs": [[refs[i] for i in p] for p in spec["arcs"]]}
+    if kind == "LineString":
+        return {"type": kind, "arcs": refs[spec["arcs"]]}
+    if kind == "MultiLineString":
+        return {"type": kind, "arcs": [refs[i] for i in spec["arcs"]]}
+    if kind in ("Point", "MultiPoint"):
+        return {"type": kind, "coordinates": spec["coordinates"].tolist()}
+    return {"type": kind, "geometries": [_resolve(g, refs) for g in spec["geometries"]]}
+
+
+def _properties(gdf: gpd.GeoDataFrame) -> List[Dict[str, Any]]:
+    """属性转为可 JSON 序列化的记录（缺失值为 null，时间为 ISO 字符串）"""
+    attrs = pd.DataFrame(gdf.drop(columns=gdf.geometry.name))
+    if attrs.columns.empty:
+        return [{} for _ in range(len(gdf))]
+    return json.loads(attrs.to_json(orient="records", date_format="iso", force_ascii=False))
+
+
+def encode_topology(
+    gdf: gpd.GeoDataFrame,
+    quantization: Optional[int] = None,
+    object_name: str = "features",
+) -> Dict[str, Any]:
+    """
+    将 GeoDataFrame 编码为 TopoJSON Topology
+
+    Args:
+        gdf: 输入数据（坐标系保持不变，前端按需要自行投影）
+        quantization: 每个方向的量化网格数，None 时取配置 output.quantization；
+            越大精度越高、体积越大，1e5 对县级范围的地块约为亚米级
+        object_name: objects 中的对象名
+
+    Returns:
+        dict: TopoJSON 对象
+    """
+    if quantization is None:
+        quantization = ConfigManager.get("output.quantization", 100000)
+    quantization = max(int(quantization), 2)
+    geoms = gdf.geometry.to_numpy()
+
+    bounds = shapely.total_bounds(geoms) if len(geoms) else np.full(4, np.nan)
+    if np.isnan(bounds).any():
+        translate, scale = np.zeros(2), np.ones(2)
+    else:
+        translate = bounds[:2]
+        extent = bounds[2:] - bounds[:2]
+        scale = np.where(extent > 0, extent / (quantization - 1), 1.0)
+
+    lines = _Lines(translate, scale)
+    specs = [_geometry_spec(g, lines) for g in geoms]
+    arcs = _Arcs()
+    refs = [
+        _cut(points, junction, closed, arcs)
+        for points, junction, closed in zip(lines.points, _junctions(lines), lines.closed)
+    ]
+    geometries = []
+    for fid, spec, properties in zip(gdf.index, specs, _properties(gdf)):
+        geometry = _resolve(spec, refs) or {"type": None}
+        geometry["id"] = fid.item() if hasattr(fid, "item") else fid
+        geometry["properties"] = properties
+        geometries.append(geometry)
+
+    topology = {
+        "type": "Topology",
+        "transform": {"scale": scale.tolist(), "translate": translate.tolist()},
+        "objects": {object_name: {"type": "GeometryCollection", "geometries": geometries}},
+        "arcs": arcs.encode(),
+    }
+    if not np.isnan(bounds).any():
+        topology["bbox"] = bounds.tolist()
+    return topology
+
+
+def to_topojson(
+    gdf: gpd.GeoDataFrame,
+    quantization: Optional[int] = None,
+    object_name: str = "features",
+) -> str:
+    """编码为紧凑的 TopoJSON 字符串（无多余空白）"""
+    return json.dumps(
+        encode_topology(gdf, quantization, object_name),
+        ensure_ascii=False,
+        separators=(",", ":"),
+        default=str,
+    )
+
+
+def round_coordinates(geoms: np.ndarray, decimals: int) -> np.ndarray:
+    """坐标保留 decimals 位小数（逐坐标舍入，不改变顶点数和拓扑关系），保留 Z 坐标"""
+    geoms = np.asarray(geoms, dtype=object)
+    result = geoms.copy()
+    has_z = shapely.has_z(geoms)
+
+    def rounder(coords):
+        return np.round(coords, decimals)
+
+    if (~has_z).any():
+        result[~has_z] = shapely.transform(geoms[~has_z], rounder)
+    if has_z.any():
+        result[has_z] = shapely.transform(geoms[has_z], rounder, include_z=True)
+    return result
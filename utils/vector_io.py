@@ -0,0 +1,367 @@
+# 矢量数据读取与属性旁路文件（sidecar）
+# 计算得到的属性列可以单独保存在与图层关联的 *.attrs.csv 中，无需为新增一列重写几何；
+# read_vector 读取图层时会自动合并旁路属性列，对下游工具透明。
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from shapely import make_valid
+from utils.crs_validator import CRSValidator
+from utils.file_handler import file_lock
+from utils.logger import get_logger
+from utils.metrics import span
+from utils.profiler import record_frame
+
+logger = get_logger("vector_io")
+
+# pyogrio + pyarrow 可用时，纯属性读取走 Arrow 批量通道，避免逐要素构造 Python 对象
+try:
+    import pyarrow  # noqa: F401
+    import pyogrio  # noqa: F401
+
+    _ARROW_READ = True
+except ImportError:
+    _ARROW_READ = False
+
+SIDECAR_SUFFIX = ".attrs.csv"
+SIDECAR_META_SUFFIX = ".attrs.json"
+# 入库时生成的规范化图层标记：已修复几何、已投影到项目坐标系
+CANONICAL_SUFFIX = ".canonical.json"
+# Shapefile 由多个同名文件组成
+SHAPEFILE_COMPONENTS = (".shp", ".shx", ".dbf", ".prj", ".cpg")
+
+
+def sidecar_paths(layer_path: Path):
+    """返回图层对应的旁路属性文件路径和元数据文件路径"""
+    layer_path = Path(layer_path)
+    return (
+        layer_path.with_name(layer_path.stem + SIDECAR_SUFFIX),
+        layer_path.with_name(layer_path.stem + SIDECAR_META_SUFFIX),
+    )
+
+
+def sidecar_lock_path(layer_path: Path) -> Path:
+    """旁路文件的跨进程锁文件，多个 worker 同时向同一图层写旁路列时串行执行"""
+    csv_path = sidecar_paths(layer_path)[0]
+    return csv_path.with_name(csv_path.name + ".lock")
+
+
+def layer_components(path: Path) -> List[Path]:
+    """返回图层的所有组成文件（含属性旁路文件），按固定顺序排列"""
+    path = Path(path)
+    if path.suffix.lower() == ".shp":
+        files = [path.with_suffix(s) for s in SHAPEFILE_COMPONENTS]
+    else:
+        files = [path]
+    files.append(sidecar_paths(path)[0])
+    return [f for f in files if f.exists()]
+
+
+def layer_bytes(path: Path) -> int:
+    """图层所有组成文件的总字节数"""
+    return sum(f.stat().st_size for f in layer_components(path))
+
+
+def _layer_signature(layer_path: Path) -> Dict[str, Any]:
+    """
+    以数据文件的大小和修改时间标识图层版本，图层被重写后旁路文件自动失效
+
+    Shapefile 的属性在 .dbf 中，只改写属性表时 .shp 不变，因此 .shx/.dbf 也计入签名。
+    """
+    layer_path = Path(layer_path)
+    stat = layer_path.stat()
+    signature = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if layer_path.suffix.lower() == ".shp":
+        for suffix in (".shx", ".dbf"):
+            part = layer_path.with_suffix(suffix)
+            if part.exists():
+                part_stat = part.stat()
+                signature[suffix[1:]] = [part_stat.st_size, part_stat.st_mtime_ns]
+    return signature
+
+
+def _load_sidecar_meta(layer_path: Path) -> Optional[dict]:
+    """读取旁路元数据，不存在或已失效时返回 None"""
+    csv_path, meta_path = sidecar_paths(layer_path)
+    if not csv_path.exists() or not meta_path.exists():
+        return None
+    with meta_path.open("r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("source") != _layer_signature(layer_path):
+        logger.warning(f"图层已被修改，忽略过期的属性旁路文件: {csv_path}")
+        return None
+    return meta
+
+
+def sidecar_columns(layer_path: Path) -> List[str]:
+    """图层有效旁路文件中的属性列名，没有时返回空列表"""
+    meta = _load_sidecar_meta(layer_path)
+    return list(meta["columns"]) if meta is not None else []
+
+
+def read_sidecar(
+    layer_path: Path, columns: Optional[List[str]] = None, rows: slice = None
+) -> Optional[pd.DataFrame]:
+    """
+    读取图层的旁路属性列
+
+    Args:
+        layer_path: 图层路径
+        columns: 只读取指定列，为空时读取全部
+        rows: 只读取指定范围的行
+
+    Returns:
+        pd.DataFrame: 按要素顺序排列的属性列，没有有效旁路文件时返回 None
+    """
+    meta = _load_sidecar_meta(layer_path)
+    if meta is None:
+        return None
+    usecols = [c for c in meta["columns"] if columns is None or c in columns]
+    if not usecols:
+        return None
+    csv_path, _ = sidecar_paths(layer_path)
+    kwargs = {}
+    if rows is not None:
+        start = rows.start or 0
+        kwargs["skiprows"] = range(1, start + 1)
+        if rows.stop is not None:
+            kwargs["nrows"] = max(rows.stop - start, 0)
+    return pd.read_csv(csv_path, usecols=usecols, encoding="utf-8-sig", **kwargs)
+
+
+def write_sidecar(
+    layer_path: Path, attrs: pd.DataFrame, units: Optional[Dict[str, str]] = None
+) -> Path:
+    """
+    将属性列写入图层的旁路文件，已有的旁路列会被合并（同名列覆盖）
+
+    Args:
+        layer_path: 关联的图层路径（不会被修改）
+        attrs: 与图层要素一一对应的属性列
+        units: 字段 -> 单位，记录到元数据中
+
+    Returns:
+        Path: 旁路属性文件路径
+    """
+    with file_lock(sidecar_lock_path(layer_path)):
+        return _write_sidecar(layer_path, attrs, units)
+
+
+def _write_sidecar(
+    layer_path: Path, attrs: pd.DataFrame, units: Optional[Dict[str, str]]
+) -> Path:
+    csv_path, meta_path = sidecar_paths(layer_path)
+    attrs = attrs.reset_index(drop=True)
+    meta = _load_sidecar_meta(layer_path)
+    if meta is not None:
+        existing = read_sidecar(layer_path)
+        if existing is not None and len(existing) == len(attrs):
+            attrs = pd.concat(
+                [existing.drop(columns=[c for c in attrs.columns if c in existing]), attrs],
+                axis=1,
+            )
+        units = {**meta.get("units", {}), **(units or {})}
+
+    # 先写临时文件再替换，避免读到写了一半的旁路文件
+    tmp_path = csv_path.with_name(csv_path.name + ".tmp")
+    attrs.to_csv(tmp_path, index=False, encoding="utf-8-sig")
+    os.replace(tmp_path, csv_path)
+    meta = {
+        "source": _layer_signature(layer_path),
+        "rows": len(attrs),
+        "columns": list(attrs.columns),
+        "units": units or {},
+    }
+    with meta_path.open("w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    logger.debug("属性旁路文件已更新: %s，字段: %s", csv_path, list(attrs.columns))
+    return csv_path
+
+
+def count_features(path: Path) -> int:
+    """读取图层要素数量，不解码几何与属性"""
+    try:
+        import pyogrio
+
+        return int(pyogrio.read_info(path)["features"])
+    except ImportError:
+        import fiona
+
+        with fiona.open(path) as src:
+            return len(src)
+
+
+def read_vector(
+    path: Path,
+    columns: Optional[List[str]] = None,
+    ignore_geometry: bool = False,
+    rows: slice = None,
+) -> Union[gpd.GeoDataFrame, pd.DataFrame]:
+    """
+    读取矢量图层并合并旁路属性列（旁路列优先于图层中的同名字段）
+
+    Args:
+        path: 图层路径
+        columns: 只读取指定属性列，为空时读取全部
+        ignore_geometry: 是否跳过几何解码，只返回属性表
+        rows: 只读取指定范围的要素
+
+    Returns:
+        GeoDataFrame，或 ignore_geometry 时的 DataFrame
+    """
+    with span("read") as s:
+        gdf = _read_vector(path, columns, ignore_geometry, rows)
+        s.features = len(gdf)
+        if rows is None:
+            s.bytes = layer_bytes(path)
+    record_frame(f"read {Path(path).name}", gdf)
+    return gdf
+
+
+def _read_vector(
+    path: Path,
+    columns: Optional[List[str]],
+    ignore_geometry: bool,
+    rows: Optional[slice],
+) -> Union[gpd.GeoDataFrame, pd.DataFrame]:
+    sidecar = read_sidecar(path, columns=columns, rows=rows)
+    kwargs = {}
+    if columns is not None:
+        kwargs["columns"] = [
+            c for c in columns if sidecar is None or c not in sidecar.columns
+        ]
+        if ignore_geometry and not kwargs["columns"]:
+            # 既不要几何也不需要图层中的属性列时无需读取图层（驱动也不支持这种读取）：
+            # 直接返回旁路列，或只按要素数返回空表
+            if sidecar is not None:
+                return sidecar
+            n = count_features(path)
+            return pd.DataFrame(index=pd.RangeIndex(len(range(n)[rows or slice(None)])))
+    if rows is not None:
+        kwargs["rows"] = rows
+    if ignore_geometry and _ARROW_READ:
+        kwargs.update(engine="pyogrio", use_arrow=True)
+    gdf = gpd.read_file(path, ignore_geometry=ignore_geometry, **kwargs)
+
+    if sidecar is not None:
+        if len(sidecar) != len(gdf):
+            logger.warning(
+                f"属性旁路文件行数({len(sidecar)})与图层要素数({len(gdf)})不一致，已忽略: {path}"
+            )
+            return gdf
+        sidecar.index = gdf.index
+        gdf = gdf.drop(columns=[c for c in sidecar.columns if c in gdf.columns])
+        for c in sidecar.columns:
+            gdf[c] = sidecar[c]
+    return gdf
+
+
+def write_vector(gdf: gpd.GeoDataFrame, path: Path, **kwargs) -> Path:
+    """
+    写出矢量图层并记录 write 阶段耗时
+
+    先写到同目录下的临时子目录，再逐个文件 os.replace 到目标位置（主文件最后替换），
+    其他进程不会读到写了一半的图层，也能直接覆盖 get_unique_filename 创建的占位文件。
+    """
+    target = Path(path)
+    record_frame(f"write {target.name}", gdf)
+    with span("write", features=len(gdf)) as s:
+        staging = Path(tempfile.mkdtemp(prefix=f".{target.stem}.", dir=target.parent))
+        try:
+            gdf.to_file(staging / target.name, **kwargs)
+            staged = sorted(staging.iterdir(), key=lambda f: f.name == target.name)
+            for f in staged:
+                os.replace(f, target.with_name(f.name))
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        s.bytes = layer_bytes(target)
+    return path
+
+
+# ===== 入库规范化 =====
+def canonical_marker_path(layer_path: Path) -> Path:
+    layer_path = Path(layer_path)
+    return layer_path.with_name(layer_path.stem + CANONICAL_SUFFIX)
+
+
+def canonical_crs(layer_path: Path) -> Optional[str]:
+    """图层是有效的规范化图层时返回其坐标系，否则（无标记或图层已被重写）返回 None"""
+    marker = canonical_marker_path(layer_path)
+    if not marker.exists():
+        return None
+    try:
+        with marker.open("r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("source") != _layer_signature(layer_path):
+            return None
+    except (OSError, ValueError):
+        return None
+    return meta.get("crs")
+
+
+def _normalize_dtypes(gdf: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
+    """
+    统一属性类型：布尔转为整数，混合类型的对象列转为字符串
+
+    字符串不转为数值：行政区划代码、地块编号等前导零和长编码转换后会失真。
+    字符串类型的列（pandas 3 默认的 str）已经统一，保持不变。
+    """
+    for column in gdf.columns:
+        if column == gdf.geometry.name:
+            continue
+        series = gdf[column]
+        if pd.api.types.is_bool_dtype(series.dtype):
+            # 可空布尔（boolean）含缺失值，转为可空整数
+            gdf[column] = series.astype(np.int32 if series.dtype == bool else "Int32")
+        elif pd.api.types.is_object_dtype(series.dtype):
+            gdf[column] = series.where(series.isna(), series.astype(str))
+    return gdf
+
+
+def write_canonical(gdf: gpd.GeoDataFrame, path: Path, crs: str) -> gpd.GeoDataFrame:
+    """
+    写出规范化图层：修复几何、投影到 crs、统一属性类型，并写入规范化标记
+
+    Returns:
+        gpd.GeoDataFrame: 规范化后的数据
+    """
+    if not gdf.crs:
+        raise ValueError("输入数据缺少坐标系定义。")
+    with span("repair", features=len(gdf)):
+        gdf["geometry"] = make_valid(gdf.geometry.to_numpy())
+    gdf = CRSValidator.ensure_projected_crs(gdf, crs)
+    gdf = _normalize_dtypes(gdf)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    write_vector(gdf, path)
+    with canonical_marker_path(path).open("w", encoding="utf-8") as f:
+        json.dump({"crs": crs, "source": _layer_signature(path)}, f)
+    return gdf
+
+
+def read_layer(
+    path: Path, target_crs: Optional[str], columns: Optional[List[str]] = None
+) -> gpd.GeoDataFrame:
+    """
+    读取图层用于计算：修复几何并投影到 target_crs（为 None 时保留原坐标系）
+
+    入库时已规范化（且坐标系一致）的图层直接返回，跳过修复和重投影。
+    """
+    gdf = read_vector(path, columns=columns)
+    crs = canonical_crs(path)
+    if crs is not None and target_crs in (None, crs):
+        return gdf
+    if gdf.empty:
+        return gdf
+    if not gdf.crs:
+        raise ValueError(f"输入数据缺少坐标系定义: {path}")
+    with span("repair", features=len(gdf)):
+        gdf["geometry"] = make_valid(gdf.geometry.to_numpy())
+    if target_crs is None:
+        return gdf
+    return CRSValidator.ensure_projected_crs(gdf, target_crs)